@@ -0,0 +1,294 @@
+import ast
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from functools import lru_cache
+
+import tracing
+import locate
+import profiles
+from dropdowns import profile_value
+from look_actions import build_actor_prompt, execute_actions, sanitize, strip_code_fences
+from profiles import DEFAULT_USER
+
+log = tracing.get_logger("actors")
+
+# tried cheapest first; a tier that has no confident answer hands over to the next
+TIERS = [t.strip() for t in os.getenv("AUTOJOB_ACTOR_TIERS", "template,local,remote").split(",") if t.strip()]
+# how clearly the top ranked element must beat the runner-up (0.5 is a tie, 1.0 no contest)
+TEMPLATE_MIN_CONFIDENCE = float(os.getenv("AUTOJOB_TEMPLATE_MIN_CONFIDENCE", "0.6"))
+# a GGUF model for llama.cpp; the local tier is skipped without one
+LOCAL_MODEL = os.getenv("AUTOJOB_LOCAL_MODEL", "")
+LOCAL_CTX = int(os.getenv("AUTOJOB_LOCAL_CTX", "8192"))
+LOCAL_MAX_TOKENS = 384
+# geometric mean token probability of the local model's answer
+LOCAL_MIN_CONFIDENCE = float(os.getenv("AUTOJOB_LOCAL_MIN_CONFIDENCE", "0.7"))
+
+# what the action asks for
+FILL = re.compile(r"\b(type|fill|enter|input|write|put)\b", re.I)
+CLICK = re.compile(r"\b(click|press|tap|select|check|tick|open|submit|choose|pick|apply|continue|next)\b", re.I)
+ENTER = re.compile(r"\b(press|hit)(ing)?( the)? enter\b", re.I)
+ENTER_ONLY = re.compile(r"^(press|hit)( the)? enter( key)?( to (select|confirm)\b.*)?\.?$", re.I)
+# key-by-key navigation and the like is left to the models
+UNSUPPORTED = re.compile(r"\b(arrow|scroll|tab|drag|hover|twice|times|escape|esc)\b", re.I)
+QUOTED = re.compile(r"[\"“]([^\"”]{1,120})[\"”]")
+EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+
+TEXT_TYPES = {"", "text", "email", "tel", "url", "number", "search"}
+CHOICE_ROLES = {"combobox", "listbox"}
+CLICK_ROLES = {"button", "link", "menuitem", "option", "tab", "switch"}
+
+# text fields the profile answers (dropdowns.FIELDS covers the choice-type ones);
+# whole words, most specific first, like dropdowns.FIELDS
+TEXT_FIELDS = [
+    (r"e-?mail", lambda p: p["contact_information"]["email"]),
+    (r"preferred (first )?name|nickname", lambda p: p["personal_information"]["preferred_name"]["first_name"]),
+    (r"first name|given name|forename", lambda p: p["personal_information"]["legal_name"]["first_name"]),
+    (r"middle name", lambda p: p["personal_information"]["legal_name"]["middle_name"]),
+    (r"last name|family name|surname", lambda p: p["personal_information"]["legal_name"]["last_name"]),
+    (r"full name|legal name|^name$|your name", lambda p: "{first_name} {last_name}".format(**p["personal_information"]["legal_name"])),
+    (r"phone( number)?|mobile|telephone|cell( phone)?", lambda p: p["contact_information"]["phone"]["phone_number"]),
+    (r"postal( code)?|zip( code)?", lambda p: p["contact_information"]["address"]["postal_code"]),
+    (r"linkedin", lambda p: p["socials"]["linkedin"]),
+    (r"github", lambda p: p["socials"]["github"]),
+    (r"website|portfolio|personal site", lambda p: p["socials"]["website"]),
+    (r"gpa|grade point( average)?", lambda p: p["education"][0]["gpa"]),
+    (r"date of birth|birth ?date|dob", lambda p: p["personal_information"]["date_of_birth"]),
+    (r"address|street", lambda p: p["contact_information"]["address"]["street"]),
+    (r"city|town", lambda p: p["contact_information"]["address"]["city"]),
+]
+TEXT_FIELDS = [(re.compile(rf"\b(?:{pattern})\b", re.I), get) for pattern, get in TEXT_FIELDS]
+
+# never in actor code, whichever tier wrote it
+FORBIDDEN_NAMES = {"exec", "eval", "compile", "open", "__import__", "globals", "locals", "getattr", "setattr"}
+
+
+class Answer:
+    def __init__(self, tier, word, code, confidence):
+        self.tier = tier
+        # the "relevant answer" line the neural graph shows
+        self.word = word
+        self.code = code
+        self.confidence = confidence
+
+
+def text_value(profile, label):
+    for pattern, get in TEXT_FIELDS:
+        if pattern.search(label):
+            try:
+                return get(profile) or None
+            except (KeyError, IndexError):
+                return None
+    return profile_value(profile, label)
+
+
+def check_code(code, nodes):
+    """Why generated code shouldn't run, or None if it looks fine."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return f"syntax error: {e.msg}"
+    for n in ast.walk(tree):
+        if isinstance(n, (ast.Import, ast.ImportFrom)):
+            return "imports"
+        if isinstance(n, ast.Name) and n.id in FORBIDDEN_NAMES:
+            return f"uses {n.id}"
+        if isinstance(n, ast.Attribute) and n.attr.startswith("__"):
+            return "dunder access"
+        if (isinstance(n, ast.Call) and isinstance(n.func, ast.Name) and n.func.id in ("node", "choose")
+                and n.args and isinstance(n.args[0], ast.Constant)
+                and str(n.args[0].value).lstrip("@") not in nodes):
+            return f"unknown node {n.args[0].value!r}"
+    return None
+
+
+def _split(text):
+    lines = strip_code_fences(text).split("\n")
+    if len(lines) < 2:
+        return None
+    return lines[0].strip(), "\n".join(lines[1:])
+
+
+# ---------------------------
+# Tiers
+# ---------------------------
+
+def template(action, keyword, html, ranked, nodes, user):
+    """Code for plain fills and clicks on an element the ranking is sure about."""
+    if ENTER_ONLY.match(action.strip()):
+        return Answer("template", "Enter", "ActionChains(driver).send_keys(Keys.ENTER).perform()", 0.95)
+    if not ranked or UNSUPPORTED.search(action):
+        return None
+
+    top, el = ranked[0]
+    runner_up = ranked[1][0] if len(ranked) > 1 else 0.0
+    confidence = top / (top + runner_up)
+    named = " ".join(el.fields[k] for k in ("label", "aria", "placeholder", "text") if el.fields.get(k))
+    # the critic's keyword should be what the element is actually called
+    likeness = locate.dice(locate.trigrams(keyword), locate.trigrams(named))
+    if set(locate.tokenize(keyword)) <= set(locate.tokenize(named)):
+        likeness = 1.0
+    if confidence < TEMPLATE_MIN_CONFIDENCE or likeness < 0.5:
+        return None
+
+    nid = nodes.add(el.locator)
+    kind = el.attrs.get("type", "").lower()
+    role = el.attrs.get("role", "").lower()
+    quoted = QUOTED.search(action) or EMAIL.search(action)
+    given = quoted.group(quoted.lastindex or 0) if quoted else None
+
+    if el.tag == "input" and kind == "file":
+        doc = "cover_letter" if re.search(r"cover letter", f"{action} {named}", re.I) else "resume"
+        return Answer("template", doc, f'upload_file(node("{nid}"), "{doc}")', confidence)
+
+    if el.tag == "select" or role in CHOICE_ROLES or el.attrs.get("aria-haspopup") == "listbox":
+        value = given or profile_value(profiles.get_profile(user), named)
+        if not value:
+            return None
+        return Answer("template", value, f'choose("{nid}", {json.dumps(value)})', confidence)
+
+    if kind in ("checkbox", "radio") or role in ("checkbox", "radio"):
+        if not CLICK.search(action):
+            return None
+        return Answer("template", named or keyword, f'safe_click(driver, node("{nid}"))', confidence)
+
+    if (el.tag == "input" and kind in TEXT_TYPES) or el.tag == "textarea" or role == "textbox":
+        if not FILL.search(action):
+            return None
+        value = given or text_value(profiles.get_profile(user), named)
+        if not value:
+            return None
+        lines = [
+            f'el = node("{nid}")',
+            "el.click()",
+            'el.send_keys(Keys.CONTROL, "a")',
+            "el.send_keys(Keys.DELETE)",
+            f"el.send_keys({json.dumps(value)})",
+        ]
+        if ENTER.search(action):
+            lines += ["time.sleep(0.1)", "el.send_keys(Keys.ENTER)"]
+        return Answer("template", value, "\n".join(lines), confidence)
+
+    if el.tag in ("button", "a") or kind in ("submit", "button") or role in CLICK_ROLES:
+        if not CLICK.search(action):
+            return None
+        return Answer("template", named or keyword, f'safe_click(driver, node("{nid}"))', confidence)
+
+    return None
+
+
+@lru_cache(maxsize=None)
+def local_model():
+    """The llama.cpp model, loaded once; None when not configured or installed."""
+    if not LOCAL_MODEL:
+        return None
+    try:
+        from llama_cpp import Llama
+    except ImportError:
+        log.warning("AUTOJOB_LOCAL_MODEL is set but llama-cpp-python isn't installed; skipping the local tier")
+        return None
+    with tracing.span("local_model_load", path=LOCAL_MODEL):
+        return Llama(model_path=LOCAL_MODEL, n_ctx=LOCAL_CTX, n_threads=os.cpu_count(), logits_all=True, verbose=False)
+
+
+def local(action, keyword, html, ranked, nodes, user):
+    """The actor prompt on a small CPU model, if it's sure and its code checks out."""
+    model = local_model()
+    if model is None:
+        return None
+
+    prompt = build_actor_prompt(sanitize(html), action, user)
+    with tracing.span("actor_call", model="local", prompt_chars=len(prompt)) as sp:
+        out = model.create_completion(prompt, max_tokens=LOCAL_MAX_TOKENS, temperature=0.1, logprobs=1)
+        choice = out["choices"][0]
+        logprobs = [lp for lp in (choice.get("logprobs") or {}).get("token_logprobs") or [] if lp is not None]
+        confidence = math.exp(sum(logprobs) / len(logprobs)) if logprobs else 0.0
+        sp["response_chars"] = len(choice["text"])
+        sp["confidence"] = round(confidence, 3)
+
+    split = _split(choice["text"])
+    if split is None or confidence < LOCAL_MIN_CONFIDENCE:
+        return None
+    problem = check_code(split[1], nodes)
+    if problem:
+        log.debug(f"local answer rejected: {problem}")
+        return None
+    return Answer("local", split[0], split[1], confidence)
+
+
+def remote(action, keyword, html, ranked, nodes, user):
+    """The large remote model, as before."""
+    response = execute_actions(html, action, user)
+    log.debug("actor response", extra={"fields": {"response": response}})
+    split = _split(response)
+    if split is None:
+        log.warning("actor response has < 2 lines, skipping execution")
+        return None
+    return Answer("remote", split[0], split[1], 1.0)
+
+
+GENERATORS = {"template": template, "local": local, "remote": remote}
+
+
+# ---------------------------
+# Routing
+# ---------------------------
+
+class Router:
+    """Asks the cheapest tier first and keeps score of how each one does.
+
+    The counts (shared by every run in the process) are what
+    TEMPLATE_MIN_CONFIDENCE and LOCAL_MIN_CONFIDENCE get tuned against.
+    """
+
+    def __init__(self, tiers=TIERS):
+        unknown = set(tiers) - set(GENERATORS)
+        if unknown:
+            raise ValueError(f"unknown actor tiers: {sorted(unknown)}")
+        self.tiers = tiers
+        self.counts = {tier: Counter() for tier in tiers}
+        self.lock = threading.Lock()
+
+    def _count(self, tier, outcome):
+        with self.lock:
+            self.counts[tier][outcome] += 1
+        tracing.metrics.incr(f"actor_{tier}_{outcome}_total")
+
+    def answers(self, action, keyword, html, ranked, nodes, user=DEFAULT_USER):
+        """Answers from the cheapest tier up.
+
+        The caller runs each in turn and asks for the next one (the next
+        tier up) only when running it failed.
+        """
+        for tier in self.tiers:
+            with tracing.span("actor_tier", tier=tier) as sp:
+                answer = GENERATORS[tier](action, keyword, html, ranked, nodes, user)
+                sp["answered"] = answer is not None
+            if answer is None:
+                self._count(tier, "declined")
+                continue
+            self._count(tier, "answered")
+            yield answer
+
+    def record(self, answer, ok):
+        """Whether the code from answer ran without an error."""
+        self._count(answer.tier, "ok" if ok else "failed")
+
+    def status(self):
+        with self.lock:
+            tiers = {}
+            for tier, counts in self.counts.items():
+                ran = counts["ok"] + counts["failed"]
+                tiers[tier] = {**counts, "success_rate": round(counts["ok"] / ran, 3) if ran else None}
+        return {
+            "tiers": tiers,
+            "template_min_confidence": TEMPLATE_MIN_CONFIDENCE,
+            "local_min_confidence": LOCAL_MIN_CONFIDENCE,
+            "local_model": LOCAL_MODEL or None,
+        }
+
+
+router = Router()
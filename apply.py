@@ -1,7 +1,5 @@
 from fastapi import FastAPI
 from pydantic import BaseModel
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import Select
@@ -17,48 +15,11 @@ import os
 
 from look_actions import get_actions
 from extraction import extract_info, safe_click
-
-# initializes selenium driver
-options = Options()
-options.add_argument("--disable-gpu")
-options.add_argument("--disable-blink-features=AutomationControlled")
-options.add_argument("--no-sandbox")
-options.add_argument("--disable-dev-shm-usage")
-options.add_argument("--start-maximized")
-options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                    "AppleWebKit/537.36 (KHTML, like Gecko) "
-                    "Chrome/114.0.0.0 Safari/537.36")
-options.add_argument("--disable-blink-features=AutomationControlled")
-options.add_experimental_option("excludeSwitches", ["enable-automation"])
-options.add_experimental_option("useAutomationExtension", False)
+from browser import get_driver
 
 app = FastAPI()
 
-def get_driver(options):
-    """Attempts to get a driver for Chrome, then Firefox, then Safari."""
-    # Try Chrome
-    try:
-        return webdriver.Chrome(options=options)
-    except Exception as e:
-        print(f"Chrome not available: {e}")
-
-    # Try Firefox
-    try:
-        options = webdriver.FirefoxOptions()
-        return webdriver.Firefox(options=options)
-    except Exception as e:
-        print(f"Firefox not available: {e}")
-
-    # Try Safari (macOS only)
-    if sys.platform == "darwin":
-        try:
-            return webdriver.Safari()
-        except Exception as e:
-            print(f"Safari not available: {e}")
-
-    raise Exception("No supported browser driver found.")
-
-driver = get_driver(options)
+driver = None
 
 def main():
     if len(sys.argv) < 2:
@@ -67,6 +28,9 @@ def main():
 
     url = sys.argv[1]
 
+    global driver
+    driver = get_driver()
+
     try:
         print(f"Opening {url}")
         driver.get(url)
@@ -1,10 +1,17 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, EmailStr
 from typing import Optional, List
-import uuid
+import json
+import zlib
 import csv
 import io
-import json
+import os
+import sys
+
+# datastore.py lives at the repo root, next to look.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from datastore import get_store, APPLICATION_COLUMNS
 
 
 app = FastAPI(title="autojob API")
@@ -15,8 +22,6 @@ class Applicant(BaseModel):
 	resume_url: Optional[str] = None
 	cover_letter: Optional[str] = None
 
-applications: List[dict] = []
-
 def apply_to_jobs(applicant_data: dict) -> List[dict]:
 	"""
 	Placeholder function that applies to jobs.
@@ -50,47 +55,147 @@ def json_to_csv(data: List[dict]) -> str:
 	return output.getvalue()
 
 
-@app.post("/info")
-def save_info():
-	# Save applicant info to a local file
-	applicant_data = get_info()
-	with open("applicant.json", "w") as f:
-		json.dump(applicant_data, f, indent=2)
-	return {"status": "applicant info saved"}
+class ApplyJobsRequest(BaseModel):
+	# defaults to the most recently saved applicant
+	applicant_id: Optional[str] = None
+
+
+def csv_rows(rows):
+	"""
+	Yields the CSV export one line at a time, header first.
+	"""
+	buffer = io.StringIO()
+	writer = csv.DictWriter(buffer, fieldnames=APPLICATION_COLUMNS)
+	writer.writeheader()
+	for row in rows:
+		writer.writerow(row)
+		yield buffer.getvalue()
+		buffer.seek(0)
+		buffer.truncate()
+	# header only, if there were no rows
+	if buffer.getvalue():
+		yield buffer.getvalue()
+
+
+def ndjson_rows(rows):
+	for row in rows:
+		yield json.dumps(row) + "\n"
+
+
+def chunked(lines, size=64 * 1024):
+	"""
+	Groups small lines into ~size byte chunks so we don't send a frame per row.
+	"""
+	parts, length = [], 0
+	for line in lines:
+		data = line.encode("utf-8")
+		parts.append(data)
+		length += len(data)
+		if length >= size:
+			yield b"".join(parts)
+			parts, length = [], 0
+	if parts:
+		yield b"".join(parts)
+
+
+def gzipped(chunks):
+	compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+	for chunk in chunks:
+		data = compressor.compress(chunk)
+		if data:
+			yield data
+	yield compressor.flush()
 
-def get_info() -> dict:
-	return "placeholder function to get applicant info"
+
+@app.post("/info")
+def save_info(applicant: Applicant):
+	# Save applicant info, keyed by email so re-submitting updates it
+	applicant_id = get_store().upsert_applicant(
+		applicant.name,
+		applicant.email,
+		applicant.resume_url,
+		applicant.cover_letter,
+	)
+	return {"status": "applicant info saved", "id": applicant_id}
 
 @app.get("/info")
 def info():
 	return {
 		"service": "autojob",
-		"routes": ["/info (POST)", "/apply (POST)"],
-		"version": "0.1",
+		"routes": ["/info (POST)", "/apply (POST)", "/applications (GET)", "/export (GET)"],
+		"version": "0.2",
 	}
 
 @app.post("/apply")
-def apply():
+def apply(req: Optional[ApplyJobsRequest] = None):
 	# Apply to jobs using saved applicant info
-	try:
-		# Load applicant info from file
-		with open("applicant.json", "r") as f:
-			applicant_data = json.load(f)
-	except FileNotFoundError:
+	store = get_store()
+	if req is not None and req.applicant_id:
+		applicant_data = store.get_applicant(req.applicant_id)
+	else:
+		applicant_data = store.latest_applicant()
+
+	if applicant_data is None:
 		return {"error": "No applicant info found. Please call POST /info first."}
 	
-	app_id = str(uuid.uuid4())
-	applicant_data.update({"id": app_id})
-	applications.append(applicant_data)
-	
 	# Apply to jobs and get results as JSON
 	job_applications = apply_to_jobs(applicant_data)
+
+	ids = store.add_applications(applicant_data["id"], [
+		{
+			"url": job["Link to application"],
+			"company": job["Company Name"],
+			"position": job["Position"],
+			"term": job["Term"],
+			"status": job["Status"],
+		}
+		for job in job_applications
+	])
 	
 	# Convert JSON to CSV
 	csv_output = json_to_csv(job_applications)
 	
 	return {
 		"status": "received",
-		"id": app_id,
+		"id": applicant_data["id"],
+		"application_ids": ids,
 		"csv_output": csv_output
-	}
\ No newline at end of file
+	}
+
+@app.get("/export")
+def export(
+	request: Request,
+	format: str = "csv",
+	applicant_id: Optional[str] = None,
+	status: Optional[str] = None,
+	company: Optional[str] = None,
+	term: Optional[str] = None,
+	since: Optional[str] = None,
+	until: Optional[str] = None,
+):
+	"""
+	Streams application rows as CSV or NDJSON, gzip-encoded when the client accepts it.
+	since/until are ISO timestamps compared against when the application was created.
+	"""
+	if format not in ("csv", "ndjson"):
+		raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+
+	rows = get_store().iter_applications(applicant_id, status, company, term, since, until)
+	lines = csv_rows(rows) if format == "csv" else ndjson_rows(rows)
+	body = chunked(lines)
+
+	media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+	headers = {"Content-Disposition": f'attachment; filename="applications.{format}"'}
+	if "gzip" in request.headers.get("accept-encoding", ""):
+		body = gzipped(body)
+		headers["Content-Encoding"] = "gzip"
+		headers["Vary"] = "Accept-Encoding"
+
+	return StreamingResponse(body, media_type=media_type, headers=headers)
+
+@app.get("/applications")
+def list_applications(applicant_id: Optional[str] = None, cursor: Optional[str] = None, limit: int = 50):
+	"""
+	One page of tracked applications, newest first. Pass next_cursor back as cursor for the next page.
+	"""
+	return get_store().list_applications(applicant_id, cursor, limit)
@@ -0,0 +1,80 @@
+"""
+Drives every dropdown on bench/pages/combobox.html through dropdowns.choose.
+
+Serves bench/pages on a local port, loads the page in a real browser and
+picks a value in each widget: a Workday-style button combobox, an async
+typeahead, a native select and a typeahead inside a shadow root. Prints
+what was picked, how many settle rounds it took and how long, and exits
+non-zero if any widget ends up with the wrong value.
+
+Usage:
+    python bench/combobox.py
+"""
+
+import functools
+import http.server
+import os
+import sys
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import tracing
+import capture
+import dropdowns
+import locate
+from browser import get_driver
+
+PAGES = os.path.join(ROOT, "bench", "pages")
+
+# field label -> (profile-style value, what the widget should end up showing)
+CASES = {
+    "Country": ("United States", "United States of America"),
+    "School or University": ("University of Utah", "University of Utah"),
+    "Country phone code": ("USA (+1)", "United States (+1)"),
+    "Highest degree": ("Bachelor of Applied Science", "Bachelor's Degree"),
+}
+ANSWER_KEYS = {
+    "Country": "country",
+    "School or University": "school",
+    "Country phone code": "phone_code",
+    "Highest degree": "degree",
+}
+
+
+def serve():
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=PAGES)
+    handler.log_message = lambda *args: None
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    tracing.set_level("WARNING")
+    server = serve()
+    driver = get_driver()
+    failures = 0
+    try:
+        driver.get(f"http://127.0.0.1:{server.server_port}/combobox.html")
+        index = locate.ElementIndex.from_html(capture.page_source(driver))
+
+        print(f"{'field':<24}{'ok':>4}{'rounds':>8}{'ms':>8}  picked")
+        for label, (value, expected) in CASES.items():
+            el = index.search(label, n=1)[0][1]
+            result = dropdowns.choose(driver, el.locator, value)
+            driver.switch_to.default_content()
+            shown = driver.execute_script("return window.answers()")[ANSWER_KEYS[label]]
+            ok = result["ok"] and shown == expected
+            failures += not ok
+            print(f"{label:<24}{'yes' if ok else 'NO':>4}{result['rounds']:>8}{result['ms']:>8}  {shown!r}"
+                  + ("" if ok else f" (wanted {expected!r}, {result['error']})"))
+    finally:
+        driver.quit()
+        server.shutdown()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Import-time benchmark for the server modules.
+
+Imports each module in a fresh interpreter with API credentials stripped from
+the environment, and reports wall time plus which heavy dependencies got
+pulled in. Those should only load when a run actually needs them.
+
+Usage:
+    python bench/import_time.py
+    python bench/import_time.py --repeat 5 --max-ms 500
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ["look", "look_actions", "extraction", "events", "history", "tracing"]
+# should stay out of sys.modules until first use
+HEAVY = ["selenium", "bs4", "openai", "moorcheh_sdk", "dotenv"]
+CREDENTIALS = ["OPENAI_API_KEY", "api_key"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+ms = (time.perf_counter() - start) * 1000
+print(json.dumps({{"ms": ms, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module):
+    env = {k: v for k, v in os.environ.items() if k not in CREDENTIALS}
+    proc = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY)],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return {"ms": None, "loaded": [], "error": proc.stderr.strip().splitlines()[-1]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-ms", type=float, help="fail if any module takes longer (best of --repeat)")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'module':<16}{'best ms':>10}  heavy deps loaded")
+    for module in MODULES:
+        runs = [measure(module) for _ in range(args.repeat)]
+        if any(r.get("error") for r in runs):
+            print(f"{module:<16}{'ERROR':>10}  {runs[0].get('error')}")
+            failed = True
+            continue
+        best = min(r["ms"] for r in runs)
+        loaded = ", ".join(runs[0]["loaded"]) or "-"
+        print(f"{module:<16}{best:>10.1f}  {loaded}")
+        if runs[0]["loaded"] or (args.max_ms is not None and best > args.max_ms):
+            failed = True
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Offline replay of the non-network stages of startApp over recorded runs.
+
+Re-drives parse, prune, critic/actor prompt building and extraction from
+screenshots/run_*/ (PNG + pruned soup) and the full page dumps
+(rbc_html.txt, voltair_html.txt), with canned critic and actor replies.
+Reports per-stage latency and peak memory, and can compare against a saved
+baseline so regressions show up without a browser or API keys. Also reports
+how much smaller the compact DOM serialization is than str(soup) and
+soup.prettify() over the same pages.
+
+Usage:
+    python bench/replay.py
+    python bench/replay.py --repeat 5 --save bench/baseline.json
+    python bench/replay.py --compare bench/baseline.json --tolerance 1.25
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import deque
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import tracing
+from look import select_html
+from look_actions import build_critic_prompt, build_actor_prompt, encode_image, sanitize, strip_code_fences
+from extraction import extract_info, extract_info_legacy
+from domcompact import compact
+
+PAGE_DUMPS = ["rbc_html.txt", "voltair_html.txt"]
+# canned actor reply, in the shape execute_actions returns
+STUB_ACTOR = "```python\nReplay\ntime.sleep(0.1)\n```"
+# frames replayed per page dump
+STEPS_PER_PAGE = 10
+
+
+def stub_critic(elements, step):
+    """Picks the next labelled field off the page, like the critic would."""
+    keywords = [
+        e["label"] or e["aria_label"] or e["placeholder"]
+        for e in elements
+        if e["semantic_type"] in ("text_input", "native_select", "custom_select_trigger")
+    ]
+    # pruned soups rarely keep their labels, so fall back to button text
+    keywords += [
+        e["text"] for e in elements
+        if e["semantic_type"] == "button" and 0 < len(e["text"]) <= 40
+    ]
+    keywords = [k for k in keywords if k]
+    if not keywords:
+        return "Scroll"
+    keyword = keywords[step % len(keywords)]
+    return f"Click on the {keyword} input and fill it in\n{keyword}"
+
+
+class Stages:
+    """Times each stage and tracks the peak traced memory it allocated."""
+
+    def __init__(self):
+        self.peaks = {}
+        self.sizes = {"raw": 0, "prettify": 0, "compact": 0}
+
+    def run(self, name, fn, *args):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        with tracing.span(name):
+            out = fn(*args)
+        peak = tracemalloc.get_traced_memory()[1] - before
+        self.peaks[name] = max(self.peaks.get(name, 0), peak)
+        return out
+
+
+def measure_sizes(stages, html):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    stages.sizes["raw"] += len(str(soup))
+    stages.sizes["prettify"] += len(soup.prettify())
+    stages.sizes["compact"] += len(stages.run("serialize", compact, soup).text)
+
+
+def replay_frame(stages, html, critic_reply, past_wants, screenshot=None):
+    if screenshot is not None:
+        stages.run("encode_image", encode_image, screenshot)
+    stages.run("critic_prompt", build_critic_prompt, list(past_wants))
+
+    lines = [l for l in critic_reply.split("\n") if l != ""]
+    if len(lines) < 2:
+        return
+    action, keyword = lines[0], lines[1]
+    past_wants.append(action)
+    if len(past_wants) > 10:
+        past_wants.popleft()
+
+    pruned_html, _, _ = stages.run("select_html", select_html, html, keyword)
+    stages.run("actor_prompt", build_actor_prompt, sanitize(pruned_html), action)
+    strip_code_fences(STUB_ACTOR).split("\n")
+
+
+def replay_page_dump(stages, path):
+    html = open(path, "r", encoding="utf-8").read()
+    measure_sizes(stages, html)
+    stages.run("extract_info", extract_info, html)
+    elements = stages.run("extract_info_legacy", extract_info_legacy, html)
+
+    past_wants = deque()
+    for step in range(STEPS_PER_PAGE):
+        replay_frame(stages, html, stub_critic(elements, step), past_wants)
+
+
+def replay_recorded_run(stages, run_dir):
+    past_wants = deque()
+    for soup_path in sorted(glob.glob(os.path.join(run_dir, "current_*_soup.txt"))):
+        html = open(soup_path, "r", encoding="utf-8").read()
+        screenshot = soup_path.replace("_soup.txt", ".png")
+        measure_sizes(stages, html)
+        elements = stages.run("extract_info_legacy", extract_info_legacy, html)
+        reply = stub_critic(elements, len(past_wants))
+        replay_frame(stages, html, reply, past_wants, screenshot if os.path.exists(screenshot) else None)
+
+
+def run(repeat):
+    tracing.metrics.reset()
+    stages = Stages()
+    tracemalloc.start()
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for dump in PAGE_DUMPS:
+            path = os.path.join(ROOT, dump)
+            if os.path.exists(path):
+                replay_page_dump(stages, path)
+        for run_dir in sorted(glob.glob(os.path.join(ROOT, "screenshots", "run_*"))):
+            replay_recorded_run(stages, run_dir)
+    wall = time.perf_counter() - start
+
+    tracemalloc.stop()
+
+    summary = tracing.metrics.summary()["spans"]
+    report = {
+        name: {
+            "count": s["count"],
+            "mean_ms": round(s["mean_ms"], 3),
+            "total_ms": round(s["total_ms"], 3),
+            "peak_kb": round(stages.peaks.get(name, 0) / 1024, 1),
+        }
+        for name, s in summary.items()
+    }
+    sizes = dict(stages.sizes)
+    for key in ("raw", "prettify"):
+        sizes[f"ratio_vs_{key}"] = round(sizes[key] / max(1, sizes["compact"]), 2)
+    return {"wall_s": round(wall, 3), "stages": report, "sizes": sizes}
+
+
+def print_report(result):
+    print(f"{'stage':<22}{'count':>8}{'mean ms':>12}{'total ms':>12}{'peak KB':>12}")
+    for name, s in sorted(result["stages"].items(), key=lambda kv: -kv[1]["total_ms"]):
+        print(f"{name:<22}{s['count']:>8}{s['mean_ms']:>12.3f}{s['total_ms']:>12.1f}{s['peak_kb']:>12.1f}")
+    print(f"wall time: {result['wall_s']} s")
+    sizes = result["sizes"]
+    print(f"DOM bytes: {sizes['raw']} raw, {sizes['prettify']} prettified, {sizes['compact']} compact "
+          f"({sizes['ratio_vs_raw']}x / {sizes['ratio_vs_prettify']}x smaller)")
+
+
+def compare(result, baseline, tolerance):
+    """Returns the stages whose mean latency or peak memory grew past tolerance."""
+    regressions = []
+    for name, base in baseline["stages"].items():
+        cur = result["stages"].get(name)
+        if cur is None:
+            continue
+        for key in ("mean_ms", "peak_kb"):
+            if base[key] > 0 and cur[key] > base[key] * tolerance:
+                regressions.append(f"{name}.{key}: {base[key]} -> {cur[key]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--save", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.25)
+    args = parser.parse_args()
+
+    # the replay measures the stages, not the debug logging around them
+    tracing.set_level("WARNING")
+
+    result = run(args.repeat)
+    print_report(result)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
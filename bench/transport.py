@@ -0,0 +1,195 @@
+"""
+WebDriver vs CDP for the calls a run makes every frame.
+
+Serves bench/pages and the recorded page dumps (rbc_html.txt,
+voltair_html.txt) on a local port, then times each operation both ways
+in one headless Chrome session:
+
+    capture     capture.CAPTURE over execute_script vs DOMSnapshot.captureSnapshot
+    screenshot  save_screenshot vs Page.captureScreenshot (viewport, and clipped to a field)
+    fill        find_element + click + send_keys vs Input.dispatchMouseEvent + Input.insertText
+    settle      readyState polling vs readyState + in-page network idle
+                (what waiting out late XHRs costs, not a speedup)
+
+Also checks that both captures give the same interactive elements, so
+the faster path isn't faster because it reads less.
+
+Usage:
+    python bench/transport.py
+    python bench/transport.py --repeat 20 --page rbc.html
+"""
+
+import argparse
+import functools
+import http.server
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import tracing
+import capture
+import cdp
+import locate
+from browser import get_driver
+
+PAGES = os.path.join(ROOT, "bench", "pages")
+# served as /<name> with an HTML content type
+DUMPS = {"rbc.html": "rbc_html.txt", "voltair.html": "voltair_html.txt"}
+TEXT = "University of Waterloo, Ontario, Canada"
+
+# page coordinates of an element, for a clipped screenshot
+RECT = """
+var r = arguments[0].getBoundingClientRect();
+return [r.left + window.scrollX, r.top + window.scrollY, r.width, r.height];
+"""
+
+
+class Handler(http.server.SimpleHTTPRequestHandler):
+    def do_GET(self):
+        name = self.path.lstrip("/").split("?")[0]
+        if name not in DUMPS:
+            return super().do_GET()
+        with open(os.path.join(ROOT, DUMPS[name]), "rb") as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve():
+    handler = functools.partial(Handler, directory=PAGES)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def interactive_locators(html):
+    return {el.locator for el in locate.ElementIndex.from_html(html).elements}
+
+
+def element_clip(driver, element, margin=8):
+    """A screenshot clip around an element, with a little context."""
+    x, y, width, height = driver.execute_script(RECT, element)
+    return max(x - margin, 0), max(y - margin, 0), width + 2 * margin, height + 2 * margin
+
+
+def first_text_field(driver):
+    from selenium.webdriver.common.by import By
+
+    for el in driver.find_elements(By.CSS_SELECTOR, "input:not([type]), input[type=text], input[type=email], textarea"):
+        if el.is_displayed() and el.is_enabled():
+            return el
+    return None
+
+
+def bench_page(driver, url, repeat, tmp):
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    rows = []
+
+    def load(idle):
+        driver.get(url)
+        WebDriverWait(driver, timeout=15).until(
+            lambda d: d.execute_script("return document.readyState") == "complete"
+        )
+        if idle:
+            cdp.wait_network_idle(driver)
+
+    rows.append(("settle", timed(lambda: load(False), max(repeat // 4, 1)),
+                 timed(lambda: load(True), max(repeat // 4, 1))))
+
+    wd_html = driver.execute_script(capture.CAPTURE)[0]
+    cdp_html = cdp.page_source(driver)[0]
+    wd_nodes, cdp_nodes = interactive_locators(wd_html), interactive_locators(cdp_html)
+    rows.append(("capture", timed(lambda: driver.execute_script(capture.CAPTURE), repeat),
+                 timed(lambda: cdp.page_source(driver), repeat)))
+
+    path = os.path.join(tmp, "shot.png")
+    rows.append(("screenshot", timed(lambda: driver.save_screenshot(path), repeat),
+                 timed(lambda: cdp.screenshot(driver, path), repeat)))
+
+    field = first_text_field(driver)
+    if field is not None:
+        clip = element_clip(driver, field)
+        rows.append(("screenshot (clip)", timed(lambda: field.screenshot(path), repeat),
+                     timed(lambda: cdp.screenshot(driver, path, clip), repeat)))
+
+        def fill_webdriver():
+            field.clear()
+            field.click()
+            field.send_keys(TEXT)
+
+        def fill_cdp():
+            field.clear()
+            cdp.click(driver, field)
+            # Input.insertText: the whole string in one call, no per-key events
+            driver.execute_cdp_cmd("Input.insertText", {"text": TEXT})
+
+        rows.append(("fill", timed(fill_webdriver, repeat), timed(fill_cdp, repeat)))
+
+    parity = {
+        "webdriver_bytes": len(wd_html),
+        "cdp_bytes": len(cdp_html),
+        "elements": len(wd_nodes),
+        "only_webdriver": len(wd_nodes - cdp_nodes),
+        "only_cdp": len(cdp_nodes - wd_nodes),
+    }
+    return rows, parity
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--page", action="append",
+                        help="page under bench/pages or a dump name (default: combobox.html and the dumps)")
+    args = parser.parse_args()
+
+    tracing.set_level("WARNING")
+    server = serve()
+    driver = get_driver(profile="throughput")
+    if not hasattr(driver, "execute_cdp_cmd"):
+        driver.quit()
+        server.shutdown()
+        sys.exit("CDP needs a Chromium-based browser")
+    cdp.attach(driver)
+
+    pages = args.page or ["combobox.html", *DUMPS]
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for page in pages:
+                rows, parity = bench_page(driver, f"http://127.0.0.1:{server.server_port}/{page}", args.repeat, tmp)
+                print(f"\n{page}  ({parity['elements']} interactive elements, "
+                      f"{parity['webdriver_bytes']} vs {parity['cdp_bytes']} bytes captured)")
+                if parity["only_webdriver"] or parity["only_cdp"]:
+                    print(f"  capture mismatch: {parity['only_webdriver']} elements only via WebDriver, "
+                          f"{parity['only_cdp']} only via CDP")
+                print(f"  {'operation':<20}{'webdriver ms':>14}{'cdp ms':>10}{'speedup':>10}")
+                for name, wd, dt in rows:
+                    print(f"  {name:<20}{wd:>14.1f}{dt:>10.1f}{wd / dt if dt else float('inf'):>9.2f}x")
+    finally:
+        driver.quit()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+from functools import lru_cache
+import os
+import sys
+
+import tracing
+import cdp
+
+log = tracing.get_logger("browser")
+
+# "interactive" is a visible, maximized browser for demos; "throughput" is a
+# headless one trimmed down so more bulk sessions fit on one machine
+PROFILES = ("interactive", "throughput")
+BULK_PROFILE = os.getenv("AUTOJOB_BULK_PROFILE", "throughput")
+VIEWPORT = os.getenv("AUTOJOB_VIEWPORT", "1366,900")
+# shared by every throughput session, so common ATS assets are fetched once
+CACHE_DIR = os.getenv("AUTOJOB_BROWSER_CACHE",
+                      os.path.join(os.path.expanduser("~"), ".cache", "autojob", "chrome"))
+RENDERER_LIMIT = int(os.getenv("AUTOJOB_RENDERER_LIMIT", "2"))
+# the critic needs to see the form, not its photos; PNG/SVG icons and sprites stay
+BLOCK_IMAGES = os.getenv("AUTOJOB_BLOCK_IMAGES", "1") == "1"
+IMAGE_PATTERNS = ["*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.avif*", "*.mp4*", "*.webm*"]
+# analytics, ads and session recorders; none of them are needed to apply
+BLOCKED_URLS = [
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*googlesyndication.com*", "*adservice.google.com*", "*connect.facebook.net*",
+    "*snap.licdn.com*", "*px.ads.linkedin.com*", "*bat.bing.com*", "*static.ads-twitter.com*",
+    "*analytics.tiktok.com*", "*hotjar.com*", "*fullstory.com*", "*clarity.ms*",
+    "*mouseflow.com*", "*segment.io*", "*cdn.segment.com*", "*nr-data.net*",
+    "*js-agent.newrelic.com*", "*quantserve.com*", "*scorecardresearch.com*",
+    "*optimizely.com*", "*crazyegg.com*", "*adroll.com*", "*criteo.com*",
+]
+
+
+@lru_cache(maxsize=None)
+def chrome_options():
+    """The Chrome options every run starts with, built on first use."""
+    from selenium.webdriver.chrome.options import Options
+
+    options = Options()
+    options.add_argument("--disable-gpu")
+    options.add_argument("--disable-blink-features=AutomationControlled")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--start-maximized")
+    options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+                        "AppleWebKit/537.36 (KHTML, like Gecko) "
+                        "Chrome/114.0.0.0 Safari/537.36")
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option("useAutomationExtension", False)
+    return options
+
+
+@lru_cache(maxsize=None)
+def throughput_options():
+    """Headless Chrome for bulk runs: fixed viewport, shared cache, fewer renderers."""
+    from selenium.webdriver.chrome.options import Options
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    options = Options()
+    options.add_argument("--headless=new")
+    options.add_argument(f"--window-size={VIEWPORT}")
+    options.add_argument(f"--disk-cache-dir={CACHE_DIR}")
+    options.add_argument(f"--renderer-process-limit={RENDERER_LIMIT}")
+    for arg in ("--disable-gpu", "--no-sandbox", "--disable-dev-shm-usage",
+                "--disable-blink-features=AutomationControlled", "--disable-extensions",
+                "--disable-background-networking", "--disable-component-update",
+                "--disable-default-apps", "--disable-sync", "--mute-audio",
+                "--no-first-run", "--hide-scrollbars"):
+        options.add_argument(arg)
+    # same UA as interactive runs; headless would otherwise announce itself
+    options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+                        "AppleWebKit/537.36 (KHTML, like Gecko) "
+                        "Chrome/114.0.0.0 Safari/537.36")
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option("useAutomationExtension", False)
+    return options
+
+
+def block_requests(driver):
+    """Drops analytics/ad requests (and photos, if BLOCK_IMAGES) for this session."""
+    urls = BLOCKED_URLS + (IMAGE_PATTERNS if BLOCK_IMAGES else [])
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": urls})
+    except Exception as e:
+        log.warning(f"request blocking unavailable: {type(e).__name__}: {e}")
+
+
+def get_driver(options=None, profile="interactive"):
+    """Attempts to get a driver for Chrome, then Firefox, then Safari.
+
+    profile picks the browser setup when no options are given; see PROFILES.
+    """
+    from selenium import webdriver
+
+    if profile not in PROFILES:
+        raise ValueError(f"unknown browser profile {profile!r}")
+    headless = profile == "throughput"
+    if options is None:
+        options = throughput_options() if headless else chrome_options()
+
+    # Try Chrome
+    try:
+        driver = webdriver.Chrome(options=options)
+        if headless:
+            block_requests(driver)
+        if cdp.active(driver):
+            cdp.attach(driver)
+        return driver
+    except Exception as e:
+        log.warning(f"Chrome not available: {e}")
+
+    # Try Firefox
+    try:
+        options = webdriver.FirefoxOptions()
+        if headless:
+            options.add_argument("-headless")
+            width, height = VIEWPORT.split(",")
+            options.add_argument(f"--width={width}")
+            options.add_argument(f"--height={height}")
+        return webdriver.Firefox(options=options)
+    except Exception as e:
+        log.warning(f"Firefox not available: {e}")
+
+    # Try Safari (macOS only)
+    if sys.platform == "darwin":
+        try:
+            return webdriver.Safari()
+        except Exception as e:
+            log.warning(f"Safari not available: {e}")
+
+    raise Exception("No supported browser driver found.")
+
+
+def exec_namespace(driver, **extra):
+    """Globals for running actor-generated Selenium code.
+
+    The actor is told every relevant Selenium name is already imported, so
+    they're imported here, once a run actually executes something.
+    """
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.common.keys import Keys
+    from selenium.webdriver.common.action_chains import ActionChains
+    from selenium.webdriver.support.ui import WebDriverWait, Select
+    from selenium.webdriver.support import expected_conditions as EC
+    import time
+
+    return {
+        "driver": driver,
+        "By": By,
+        "Keys": Keys,
+        "ActionChains": ActionChains,
+        "WebDriverWait": WebDriverWait,
+        "Select": Select,
+        "EC": EC,
+        "time": time,
+        **extra,
+    }
@@ -0,0 +1,174 @@
+from contextlib import contextmanager
+
+import tracing
+
+log = tracing.get_logger("capture")
+
+# a locator step that enters an iframe, and one that enters an open shadow root
+FRAME_SEP = " |> "
+SHADOW_SEP = " >>> "
+# wraps the contents of a shadow root in the merged DOM
+SHADOW_TAG = "aj-shadow"
+# stands in for the contents of a frame we aren't allowed to read
+CROSS_ORIGIN_TAG = "aj-cross-origin"
+# what WebDriver sessions start with, if the driver can't say
+DEFAULT_SCRIPT_TIMEOUT = 30
+
+# One round trip for the whole page, iframes and shadow roots included.
+# Same-origin frame documents are nested inside their <iframe>, open shadow
+# roots inside an <aj-shadow> under their host, and form fields carry their
+# live value/checked state, which page_source leaves out.
+CAPTURE = """
+var SKIP = {SCRIPT: 1, STYLE: 1, NOSCRIPT: 1, TEMPLATE: 1};
+var VOID = {AREA: 1, BASE: 1, BR: 1, COL: 1, EMBED: 1, HR: 1, IMG: 1, INPUT: 1, LINK: 1, META: 1, SOURCE: 1, TRACK: 1, WBR: 1};
+var out = [];
+var frames = 0, shadows = 0;
+
+function esc(s) {
+    return String(s).replace(/&/g, "&amp;").replace(/</g, "&lt;").replace(/>/g, "&gt;").replace(/"/g, "&quot;");
+}
+
+function walkChildren(parent) {
+    for (var c = parent.firstChild; c; c = c.nextSibling) walk(c);
+}
+
+function walk(node) {
+    if (node.nodeType === 3) { out.push(esc(node.nodeValue)); return; }
+    if (node.nodeType !== 1 || SKIP[node.tagName]) return;
+
+    var tag = node.tagName.toLowerCase();
+    var field = tag === "input" || tag === "textarea" || tag === "select";
+    out.push("<" + tag);
+    for (var i = 0; i < node.attributes.length; i++) {
+        var a = node.attributes[i];
+        if (field && (a.name === "value" || a.name === "checked")) continue;
+        out.push(" " + a.name + '="' + esc(a.value) + '"');
+    }
+    if (field) {
+        if (node.value) out.push(' value="' + esc(node.value) + '"');
+        if (node.checked) out.push(' checked=""');
+    }
+    out.push(">");
+    if (VOID[node.tagName]) return;
+
+    if (node.shadowRoot) {
+        shadows++;
+        out.push("<%(shadow)s>");
+        walkChildren(node.shadowRoot);
+        out.push("</%(shadow)s>");
+    }
+    if (tag === "iframe" || tag === "frame") {
+        frames++;
+        var doc = null;
+        try { doc = node.contentDocument; } catch (e) {}
+        if (doc && doc.documentElement) walk(doc.documentElement);
+        else out.push("<%(cross)s></%(cross)s>");
+    }
+    if (tag !== "textarea") walkChildren(node);
+    out.push("</" + tag + ">");
+}
+
+walk(document.documentElement);
+return [out.join(""), frames, shadows];
+""" % {"shadow": SHADOW_TAG, "cross": CROSS_ORIGIN_TAG}
+
+# walks a chain of open shadow roots from the current document
+PIERCE = """
+var steps = arguments[0], node = document;
+for (var i = 0; i < steps.length; i++) {
+    if (i > 0) node = node.shadowRoot;
+    node = node && node.querySelector(steps[i]);
+    if (!node) return null;
+}
+return node;
+"""
+
+
+def page_source(driver):
+    """The page, its same-origin iframes and open shadow roots as one document."""
+    # cdp builds on the constants above, so it can't be imported at the top
+    import cdp
+
+    with tracing.span("capture") as sp:
+        # node() may have left us inside an iframe last frame
+        driver.switch_to.default_content()
+        try:
+            if cdp.active(driver):
+                sp["transport"] = "cdp"
+                html, frames, shadows = cdp.page_source(driver)
+            else:
+                html, frames, shadows = driver.execute_script(CAPTURE)
+            sp["frames"], sp["shadow_roots"] = frames, shadows
+        except Exception as e:
+            log.warning(f"capture script failed, using page_source: {type(e).__name__}: {e}")
+            html = driver.page_source
+        sp["bytes"] = len(html)
+    return html
+
+
+def screenshot(driver, path):
+    """Saves the viewport as a PNG at path, over CDP when that transport is on."""
+    import cdp
+
+    if cdp.active(driver):
+        try:
+            return cdp.screenshot(driver, path)
+        except Exception as e:
+            log.warning(f"CDP screenshot failed, using WebDriver: {type(e).__name__}: {e}")
+    driver.save_screenshot(path)
+    return path
+
+
+def _find_in_context(driver, css):
+    from selenium.webdriver.common.by import By
+    from selenium.common.exceptions import NoSuchElementException
+
+    steps = css.split(SHADOW_SEP)
+    if len(steps) == 1:
+        return driver.find_element(By.CSS_SELECTOR, css)
+    element = driver.execute_script(PIERCE, steps)
+    if element is None:
+        raise NoSuchElementException(f"no element for {css!r}")
+    return element
+
+
+def enter_frame(driver, locator):
+    """Switches into the frame a locator points into; returns the rest of it."""
+    driver.switch_to.default_content()
+    steps = locator.split(FRAME_SEP)
+    for frame in steps[:-1]:
+        driver.switch_to.frame(_find_in_context(driver, frame))
+    return steps[-1]
+
+
+def frame_of(locator):
+    """The frame part of a locator ("" for the top document)."""
+    return locator.rpartition(FRAME_SEP)[0]
+
+
+def find(driver, locator):
+    """The live element for a locator built over captured HTML.
+
+    Switches into the locator's frame on the way, and leaves the driver
+    there so the caller can act on the element straight away. Plain CSS
+    locators just run against the top document.
+    """
+    return _find_in_context(driver, enter_frame(driver, locator))
+
+
+@contextmanager
+def script_timeout(driver, seconds):
+    """Sets the session's async script timeout for the block, then puts it back.
+
+    The timeout belongs to the whole session, so a long wait set for one
+    script would otherwise carry over to every later execute_async_script.
+    """
+    try:
+        previous = driver.timeouts.script
+    except Exception:
+        previous = DEFAULT_SCRIPT_TIMEOUT
+    driver.set_script_timeout(seconds)
+    try:
+        yield
+    finally:
+        driver.set_script_timeout(previous)
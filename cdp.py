@@ -0,0 +1,294 @@
+import base64
+import os
+
+import tracing
+from capture import SHADOW_TAG, CROSS_ORIGIN_TAG
+
+log = tracing.get_logger("cdp")
+
+# "webdriver" keeps every call on classic WebDriver; "cdp" routes page
+# capture, screenshots, load waits and safe_click's fallback click through
+# DevTools when the driver has it
+TRANSPORT = os.getenv("AUTOJOB_TRANSPORT", "webdriver")
+IDLE_MS = int(os.getenv("AUTOJOB_NETWORK_IDLE_MS", "500"))
+IDLE_TIMEOUT_MS = int(os.getenv("AUTOJOB_NETWORK_IDLE_TIMEOUT_MS", "10000"))
+
+SKIP = {"SCRIPT", "STYLE", "NOSCRIPT", "TEMPLATE"}
+VOID = {"AREA", "BASE", "BR", "COL", "EMBED", "HR", "IMG", "INPUT", "LINK", "META", "SOURCE", "TRACK", "WBR"}
+
+# Counts fetch/XHR requests in flight; installed before any page script runs
+INFLIGHT = """
+(function () {
+    if (window.__ajInflight !== undefined) return;
+    window.__ajInflight = 0;
+    try { performance.setResourceTimingBufferSize(5000); } catch (e) {}
+    function done() { window.__ajInflight = Math.max(0, window.__ajInflight - 1); }
+    var send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        window.__ajInflight++;
+        this.addEventListener("loadend", done);
+        try { return send.apply(this, arguments); } catch (e) { done(); throw e; }
+    };
+    if (window.fetch) {
+        var fetch = window.fetch;
+        window.fetch = function () {
+            window.__ajInflight++;
+            var p;
+            try { p = fetch.apply(this, arguments); } catch (e) { done(); throw e; }
+            p.then(done, done);
+            return p;
+        };
+    }
+})();
+"""
+
+# Resolves once nothing is in flight and no resource has finished for idle ms
+NETWORK_IDLE = """
+new Promise(function (resolve) {
+    var idle = %d, timeout = %d, start = performance.now(), last = start;
+    var seen = performance.getEntriesByType("resource").length;
+    (function poll() {
+        var now = performance.now();
+        var n = performance.getEntriesByType("resource").length;
+        var inflight = window.__ajInflight || 0;
+        if (n !== seen || inflight > 0) { seen = n; last = now; }
+        if (now - last >= idle || now - start >= timeout) {
+            resolve({idle: now - last >= idle, ms: Math.round(now - start), requests: n, inflight: inflight});
+        } else {
+            setTimeout(poll, 50);
+        }
+    })();
+})
+"""
+
+# the element's centre in top-level viewport pixels, or null inside a cross-origin frame
+CENTER = """
+var el = arguments[0];
+el.scrollIntoView({block: "center", inline: "center"});
+var r = el.getBoundingClientRect(), x = r.left + r.width / 2, y = r.top + r.height / 2;
+var w = el.ownerDocument.defaultView;
+while (w !== w.top) {
+    var f;
+    try { f = w.frameElement; } catch (e) { return null; }
+    if (!f) return null;
+    var fr = f.getBoundingClientRect();
+    x += fr.left + f.clientLeft;
+    y += fr.top + f.clientTop;
+    w = w.parent;
+}
+return [x, y];
+"""
+
+
+def active(driver):
+    """Whether this driver's calls should go over CDP."""
+    return TRANSPORT == "cdp" and hasattr(driver, "execute_cdp_cmd")
+
+
+def attach(driver):
+    """Per-session setup: the in-flight request counter wait_network_idle reads."""
+    try:
+        driver.execute_cdp_cmd("Page.enable", {})
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": INFLIGHT})
+    except Exception as e:
+        log.warning(f"CDP attach failed: {type(e).__name__}: {e}")
+
+
+def evaluate(driver, expression, await_promise=False):
+    """Runtime.evaluate in the top document; returns the value or raises."""
+    reply = driver.execute_cdp_cmd("Runtime.evaluate", {
+        "expression": expression,
+        "returnByValue": True,
+        "awaitPromise": await_promise,
+    })
+    if reply.get("exceptionDetails"):
+        details = reply["exceptionDetails"]
+        raise RuntimeError(details.get("exception", {}).get("description") or details.get("text"))
+    return reply.get("result", {}).get("value")
+
+
+def wait_network_idle(driver, idle_ms=IDLE_MS, timeout_ms=IDLE_TIMEOUT_MS):
+    """Blocks until the page has gone idle_ms without network activity.
+
+    One round trip: the wait runs in the page as a promise. Returns what it
+    saw ({idle, ms, requests, inflight}); idle is False if it timed out.
+    """
+    with tracing.span("network_idle") as sp:
+        result = evaluate(driver, NETWORK_IDLE % (idle_ms, timeout_ms), await_promise=True) or {}
+        sp.update({k: result.get(k) for k in ("idle", "requests", "inflight")})
+    if not result.get("idle"):
+        log.debug(f"network still busy after {timeout_ms} ms", extra={"fields": result})
+    return result
+
+
+def _rare(data):
+    """RareStringData / RareIntegerData as {node index: value}."""
+    return dict(zip(data.get("index", []), data.get("value", []))) if data else {}
+
+
+def _esc(s):
+    return s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+
+
+class _Document:
+    def __init__(self, doc, strings):
+        nodes = doc["nodes"]
+        self.strings = strings
+        self.type = nodes["nodeType"]
+        self.name = nodes["nodeName"]
+        self.value = nodes["nodeValue"]
+        self.attrs = nodes["attributes"]
+        self.shadow = _rare(nodes.get("shadowRootType"))
+        self.input_value = _rare(nodes.get("inputValue"))
+        self.checked = set(nodes.get("inputChecked", {}).get("index", []))
+        self.selected = set(nodes.get("optionSelected", {}).get("index", []))
+        self.content = _rare(nodes.get("contentDocumentIndex"))
+        self.children = [[] for _ in self.type]
+        for i, parent in enumerate(nodes["parentIndex"]):
+            if parent >= 0:
+                self.children[parent].append(i)
+
+    def s(self, i):
+        return self.strings[i] if i >= 0 else ""
+
+    def attr(self, i, key):
+        pairs = self.attrs[i]
+        for k in range(0, len(pairs), 2):
+            if self.s(pairs[k]) == key:
+                return self.s(pairs[k + 1])
+        return None
+
+    def text(self, i):
+        if self.type[i] == 3:
+            return self.s(self.value[i])
+        return "".join(self.text(c) for c in self.children[i])
+
+    def select_value(self, i):
+        # what HTMLSelectElement.value gives: the first selected option's value
+        stack = list(reversed(self.children[i]))
+        while stack:
+            c = stack.pop()
+            if c in self.selected:
+                value = self.attr(c, "value")
+                return value if value is not None else " ".join(self.text(c).split())
+            stack.extend(reversed(self.children[c]))
+        return ""
+
+
+def serialize(snapshot):
+    """A DOMSnapshot.captureSnapshot result as capture.CAPTURE's merged HTML.
+
+    Returns (html, frames, shadow_roots), markup-for-markup what the
+    capture script would produce, so locators and the compactor can't tell
+    which transport read the page. Frames the renderer had in process are
+    nested (cross-origin ones included); out-of-process frames get the
+    cross-origin placeholder.
+    """
+    docs = [_Document(d, snapshot["strings"]) for d in snapshot["documents"]]
+    out = []
+    counts = {"frames": 0, "shadows": 0}
+
+    def walk_document(d):
+        doc = docs[d]
+        for c in doc.children[0]:
+            if doc.type[c] == 1:
+                walk(doc, c)
+
+    def walk(doc, i):
+        kind = doc.type[i]
+        if kind == 3:
+            out.append(_esc(doc.s(doc.value[i])))
+            return
+        name = doc.s(doc.name[i])
+        # ::before/::after and friends come through as element nodes too
+        if kind != 1 or name.upper() in SKIP or name.startswith("::"):
+            return
+
+        tag = name.lower()
+        field = tag in ("input", "textarea", "select")
+        out.append("<" + tag)
+        pairs = doc.attrs[i]
+        for k in range(0, len(pairs), 2):
+            key = doc.s(pairs[k])
+            if field and key in ("value", "checked"):
+                continue
+            out.append(f' {key}="{_esc(doc.s(pairs[k + 1]))}"')
+        if field:
+            value = doc.select_value(i) if tag == "select" else doc.s(doc.input_value.get(i, -1))
+            if value:
+                out.append(f' value="{_esc(value)}"')
+            if i in doc.checked:
+                out.append(' checked=""')
+        out.append(">")
+        if name.upper() in VOID:
+            return
+
+        light = []
+        for c in doc.children[i]:
+            if doc.type[c] != 11:
+                light.append(c)
+            elif doc.s(doc.shadow.get(c, -1)) == "open":
+                # closed and user-agent roots can't be reached by a locator anyway
+                counts["shadows"] += 1
+                out.append(f"<{SHADOW_TAG}>")
+                for s in doc.children[c]:
+                    walk(doc, s)
+                out.append(f"</{SHADOW_TAG}>")
+        if tag in ("iframe", "frame"):
+            counts["frames"] += 1
+            if i in doc.content:
+                walk_document(doc.content[i])
+            else:
+                out.append(f"<{CROSS_ORIGIN_TAG}></{CROSS_ORIGIN_TAG}>")
+        if tag != "textarea":
+            for c in light:
+                walk(doc, c)
+        out.append(f"</{tag}>")
+
+    walk_document(0)
+    return "".join(out), counts["frames"], counts["shadows"]
+
+
+def page_source(driver):
+    """capture.page_source over DOMSnapshot: one call, no page script."""
+    snapshot = driver.execute_cdp_cmd("DOMSnapshot.captureSnapshot", {
+        "computedStyles": [],
+        "includeDOMRects": False,
+        "includePaintOrder": False,
+    })
+    return serialize(snapshot)
+
+
+def screenshot(driver, path, clip=None):
+    """Writes a PNG of the viewport, or of clip=(x, y, width, height) in page pixels."""
+    params = {"format": "png", "fromSurface": True}
+    if clip:
+        x, y, width, height = clip
+        params["clip"] = {"x": x, "y": y, "width": max(width, 1), "height": max(height, 1), "scale": 1}
+        params["captureBeyondViewport"] = True
+    data = driver.execute_cdp_cmd("Page.captureScreenshot", params)["data"]
+    with open(path, "wb") as f:
+        f.write(base64.b64decode(data))
+    return path
+
+
+def click_at(driver, x, y):
+    """A trusted left click at top-level viewport coordinates."""
+    driver.execute_cdp_cmd("Input.dispatchMouseEvent", {"type": "mouseMoved", "x": x, "y": y})
+    for kind in ("mousePressed", "mouseReleased"):
+        driver.execute_cdp_cmd("Input.dispatchMouseEvent", {
+            "type": kind, "x": x, "y": y, "button": "left", "clickCount": 1,
+        })
+
+
+def click(driver, element):
+    """Clicks an element with real input events; falls back to element.click().
+
+    The fallback covers elements inside cross-origin frames, whose position
+    in the top-level viewport the page can't tell us.
+    """
+    center = driver.execute_script(CENTER, element)
+    if center is None:
+        element.click()
+        return
+    click_at(driver, *center)
@@ -0,0 +1,97 @@
+from urllib.parse import urlsplit
+from datetime import datetime, timezone
+import json
+import os
+
+import tracing
+
+log = tracing.get_logger("checkpoints")
+
+SCREENSHOT_DIR = "./screenshots"
+# take a checkpoint every N frames (0 turns checkpointing off)
+EVERY = int(os.getenv("AUTOJOB_CHECKPOINT_EVERY", "1"))
+
+DUMP_STORAGE = """
+var out = {};
+for (var i = 0; i < window.localStorage.length; i++) {
+    var key = window.localStorage.key(i);
+    out[key] = window.localStorage.getItem(key);
+}
+return out;
+"""
+
+LOAD_STORAGE = """
+var items = arguments[0];
+for (var key in items) { window.localStorage.setItem(key, items[key]); }
+"""
+
+
+def path_for(run_id: str) -> str:
+    if not (run_id.isascii() and run_id.isdigit()):
+        raise ValueError(f"bad run id {run_id!r}")
+    return os.path.join(SCREENSHOT_DIR, f"run_{run_id}", "checkpoint.json")
+
+
+def save(driver, run_id: str, state: dict):
+    """Snapshots the browser session plus the loop state at the start of a frame."""
+    with tracing.span("checkpoint"):
+        try:
+            local_storage = driver.execute_script(DUMP_STORAGE)
+        except Exception:
+            # about:blank, file:// pages and some sandboxed frames have no localStorage
+            local_storage = {}
+
+        checkpoint = {
+            **state,
+            "url": driver.current_url,
+            "cookies": driver.get_cookies(),
+            "local_storage": local_storage,
+            "saved_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+        path = path_for(run_id)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp, path)
+
+
+def load(run_id: str):
+    try:
+        with open(path_for(run_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def restore(driver, checkpoint: dict):
+    """Puts a fresh browser back into the checkpointed session.
+
+    Cookies and localStorage can only be set on their own origin, so we load
+    the origin first, seed it, then navigate to the saved page.
+    """
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    url = checkpoint["url"]
+    parts = urlsplit(url)
+    driver.get(f"{parts.scheme}://{parts.netloc}/")
+
+    host = parts.hostname or ""
+    for cookie in checkpoint.get("cookies", []):
+        domain = (cookie.get("domain") or "").lstrip(".")
+        if domain and not host.endswith(domain):
+            continue
+        # Selenium rejects the sameSite values some browsers report
+        cookie = {k: v for k, v in cookie.items() if k != "sameSite"}
+        try:
+            driver.add_cookie(cookie)
+        except Exception as e:
+            log.debug(f"skipping cookie {cookie.get('name')}: {e}")
+
+    if checkpoint.get("local_storage"):
+        driver.execute_script(LOAD_STORAGE, checkpoint["local_storage"])
+
+    driver.get(url)
+    WebDriverWait(driver, timeout=15).until(
+        lambda d: d.execute_script("return document.readyState") == "complete"
+    )
@@ -0,0 +1,190 @@
+import os
+import re
+import time
+
+import tracing
+
+log = tracing.get_logger("consent")
+
+# "reject" takes the necessary-only option when a banner offers one,
+# "accept" accepts, "off" leaves banners to the critic like before
+POLICY = os.getenv("AUTOJOB_CONSENT", "reject")
+# a banner can have a second layer ("are you sure?", a preference centre)
+MAX_PASSES = 3
+SETTLE = 0.3
+
+# consent-management platforms by their own button ids/classes
+CMPS = [
+    {"name": "onetrust", "reject": "#onetrust-reject-all-handler, .ot-pc-refuse-all-handler",
+     "accept": "#onetrust-accept-btn-handler, #accept-recommended-btn-handler"},
+    {"name": "cookiebot", "reject": "#CybotCookiebotDialogBodyButtonDecline",
+     "accept": "#CybotCookiebotDialogBodyLevelButtonLevelOptinAllowAll, #CybotCookiebotDialogBodyButtonAccept"},
+    {"name": "trustarc", "reject": "#truste-consent-required",
+     "accept": "#truste-consent-button, .trustarc-agree-btn"},
+    {"name": "didomi", "reject": "#didomi-notice-disagree-button",
+     "accept": "#didomi-notice-agree-button"},
+    {"name": "quantcast", "reject": ".qc-cmp2-summary-buttons button[mode=secondary]",
+     "accept": ".qc-cmp2-summary-buttons button[mode=primary]"},
+    {"name": "usercentrics", "reject": "button[data-testid=uc-deny-all-button]",
+     "accept": "button[data-testid=uc-accept-all-button]"},
+    {"name": "osano", "reject": ".osano-cm-denyAll", "accept": ".osano-cm-accept-all"},
+    {"name": "cookieyes", "reject": ".cky-btn-reject", "accept": ".cky-btn-accept"},
+    {"name": "complianz", "reject": ".cmplz-btn.cmplz-deny", "accept": ".cmplz-btn.cmplz-accept"},
+    {"name": "iubenda", "reject": ".iubenda-cs-reject-btn", "accept": ".iubenda-cs-accept-btn"},
+    {"name": "termly", "reject": "[data-tid=banner-decline]", "accept": "[data-tid=banner-accept]"},
+    {"name": "cookie-notice", "reject": "#cn-refuse-cookie", "accept": "#cn-accept-cookie"},
+]
+
+# whole button labels only, so "Accept and submit" is never a consent button;
+# no bare "yes"/"ok", which ATS privacy and background-check questions use
+REJECT_TEXT = (
+    r"^(reject|decline|deny|refuse|disagree)( all| all cookies| cookies| optional cookies| non-essential cookies)?$"
+    r"|^(use |allow |accept )?(only )?(strictly )?(necessary|essential|required)( cookies)?( only)?$"
+    r"|^continue without accepting$|^(tout )?refuser( tout)?$|^alle ablehnen$|^rechazar( todo)?$"
+)
+ACCEPT_TEXT = (
+    r"^(accept|allow|agree|i agree|i accept|got it|understood)( all| all cookies| cookies|, i agree)?[.!]?$"
+    r"|^accept (&|and) (close|continue)$|^(tout )?accepter( tout)?$|^j'accepte$|^alle akzeptieren$|^aceptar( todo)?$"
+)
+# cross-origin CMP frames the page script can't reach into
+FRAMES = ("iframe[id^='sp_message_iframe'], iframe[src*='consent'], iframe[src*='trustarc'], "
+          "iframe[title*='consent' i], iframe[title*='cookie' i]")
+
+# what a banner's container must say before its buttons get pressed: the
+# application's own consent blocks (data privacy, background checks) don't
+# talk about cookies
+BANNER_TEXT = r"cookie|témoin"
+
+# cheap check on the captured HTML before spending a script call: a CMP's
+# banner markup or banner wording, not the "Cookie policy" footer link and
+# "consent" text nearly every ATS page has; CMP ids only as attributes,
+# since their stylesheets name them too
+LIKELY = re.compile(r"(id|class|data-tid)=\"[^\"]*(onetrust-banner-sdk|onetrust-accept-btn|CybotCookiebotDialog"
+                    r"|truste-consent-button|didomi-notice|qc-cmp2-ui|uc-banner|osano-cm-dialog|cky-consent"
+                    r"|cmplz-cookiebanner|iubenda-cs-banner|sp_message_iframe|cn-accept-cookie|banner-accept)"
+                    r"|(use|uses|use of) cookies|(accept|allow|reject|decline|refuse|deny) (all |optional |non-essential )?cookies"
+                    r"|cookie consent|témoins", re.I)
+
+# Finds a visible consent banner and clicks its button, in one call: known
+# CMP buttons first, then cookie/consent containers and dialogs that talk
+# about cookies and have a button whose whole label reads as reject/accept,
+# then their close icon. Looks inside open shadow roots too. Returns what it
+# clicked, or how many consent iframes it couldn't look into. args: CMPS,
+# policy, reject and accept patterns, frame selector, banner text pattern.
+DISMISS = """
+var cmps = arguments[0], policy = arguments[1], frameSel = arguments[4], banner = new RegExp(arguments[5], "i");
+var patterns = {reject: new RegExp(arguments[2], "i"), accept: new RegExp(arguments[3], "i")};
+var order = policy === "accept" ? ["accept", "reject"] : ["reject", "accept"];
+var CONTAINERS = "[id*=cookie i], [class*=cookie i], [id*=consent i], [class*=consent i], [id*=gdpr i], " +
+    "[class*=gdpr i], [aria-label*=cookie i], [aria-label*=consent i], [role=dialog], [role=alertdialog], [aria-modal=true]";
+var BUTTONS = "button, a, [role=button], input[type=button], input[type=submit]";
+var CLOSE = "[aria-label*=close i], [aria-label*=dismiss i], [title*=close i]";
+
+function visible(e) {
+    var r = e.getBoundingClientRect();
+    if (r.width === 0 || r.height === 0) return false;
+    var st = getComputedStyle(e);
+    return st.visibility !== "hidden" && st.display !== "none" && st.opacity !== "0";
+}
+function label(e) {
+    return (e.innerText || e.value || e.getAttribute("aria-label") || "").replace(/\\s+/g, " ").trim();
+}
+var roots = [document], all = document.querySelectorAll("*");
+for (var i = 0; i < all.length; i++) if (all[i].shadowRoot) roots.push(all[i].shadowRoot);
+function first(sel) {
+    for (var i = 0; i < roots.length; i++) {
+        var found = roots[i].querySelectorAll(sel);
+        for (var j = 0; j < found.length; j++) if (visible(found[j])) return found[j];
+    }
+    return null;
+}
+function press(e, cmp, action) {
+    var text = label(e).slice(0, 60);
+    e.click();
+    return {clicked: true, cmp: cmp, action: action, button: text};
+}
+
+for (var c = 0; c < cmps.length; c++) {
+    for (var a = 0; a < order.length; a++) {
+        var known = first(cmps[c][order[a]]);
+        if (known) return press(known, cmps[c].name, order[a]);
+    }
+}
+
+for (var r = 0; r < roots.length; r++) {
+    var boxes = roots[r].querySelectorAll(CONTAINERS);
+    for (var b = 0; b < boxes.length; b++) {
+        var box = boxes[b], text = box.innerText || "";
+        if (text.length > 4000 || !banner.test(text) || !visible(box)) continue;
+        var buttons = box.querySelectorAll(BUTTONS);
+        for (var a = 0; a < order.length; a++) {
+            for (var k = 0; k < buttons.length; k++) {
+                if (patterns[order[a]].test(label(buttons[k])) && visible(buttons[k])) {
+                    return press(buttons[k], "heuristic", order[a]);
+                }
+            }
+        }
+        var close = box.querySelector(CLOSE);
+        if (close && visible(close)) return press(close, "heuristic", "close");
+    }
+}
+return {clicked: false, frames: document.querySelectorAll(frameSel).length};
+"""
+
+
+def likely(html):
+    """Whether the captured page might be showing a consent banner."""
+    return POLICY != "off" and LIKELY.search(html) is not None
+
+
+def _run(driver):
+    return driver.execute_script(DISMISS, CMPS, POLICY, REJECT_TEXT, ACCEPT_TEXT, FRAMES, BANNER_TEXT)
+
+
+def _run_in_frames(driver):
+    from selenium.webdriver.common.by import By
+
+    for frame in driver.find_elements(By.CSS_SELECTOR, FRAMES):
+        try:
+            driver.switch_to.frame(frame)
+            result = _run(driver)
+        finally:
+            driver.switch_to.default_content()
+        if result["clicked"]:
+            result["cmp"] += " (iframe)"
+            return result
+    return {"clicked": False}
+
+
+def dismiss(driver):
+    """Clicks through whatever consent banner is showing, without the models.
+
+    Runs in the top document, then in any consent iframes if nothing was
+    found there. Returns the clicks it made (empty if there was no banner
+    or POLICY is "off"); never raises, a banner is never worth a run.
+    """
+    if POLICY == "off":
+        return []
+
+    clicked = []
+    with tracing.span("consent") as sp:
+        try:
+            driver.switch_to.default_content()
+            for _ in range(MAX_PASSES):
+                result = _run(driver)
+                if not result["clicked"] and result["frames"]:
+                    result = _run_in_frames(driver)
+                # a button that doesn't make its banner go away won't next time either
+                if not result["clicked"] or result in clicked:
+                    break
+                clicked.append(result)
+                time.sleep(SETTLE)
+        except Exception as e:
+            log.warning(f"consent dismissal failed: {type(e).__name__}: {e}")
+            driver.switch_to.default_content()
+        sp["clicked"] = len(clicked)
+
+    for result in clicked:
+        log.info(f"dismissed {result['cmp']} consent banner ({result['action']}: {result['button']!r})")
+        tracing.metrics.incr("consent_dismissed_total")
+    return clicked
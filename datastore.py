@@ -0,0 +1,362 @@
+from datetime import datetime, timezone
+import threading
+import sqlite3
+import queue
+import json
+import uuid
+import os
+
+import tracing
+
+log = tracing.get_logger("datastore")
+
+DB_PATH = os.getenv("AUTOJOB_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "autojob.db"))
+# queued writes are committed together once this many pile up...
+BATCH_SIZE = int(os.getenv("AUTOJOB_DB_BATCH", "200"))
+# ...or after this long, whichever comes first
+FLUSH_INTERVAL = float(os.getenv("AUTOJOB_DB_FLUSH_MS", "100")) / 1000
+# run statuses that never got an application in, so the url may be tried again:
+# the form wasn't finished ("incomplete"), the run got stuck ("stalled") or crashed
+RETRYABLE = ("failed", "incomplete", "stalled")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS applicants (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    resume_url TEXT,
+    cover_letter TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS applicants_email ON applicants(email);
+
+CREATE TABLE IF NOT EXISTS applications (
+    id TEXT PRIMARY KEY,
+    applicant_id TEXT NOT NULL REFERENCES applicants(id),
+    url TEXT NOT NULL,
+    company TEXT,
+    position TEXT,
+    term TEXT,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS applications_applicant ON applications(applicant_id, created_at, id);
+CREATE INDEX IF NOT EXISTS applications_url ON applications(applicant_id, url);
+CREATE INDEX IF NOT EXISTS applications_status ON applications(status, created_at);
+CREATE INDEX IF NOT EXISTS applications_company ON applications(company, created_at);
+
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    application_id TEXT NOT NULL REFERENCES applications(id),
+    ts TEXT NOT NULL,
+    status TEXT NOT NULL,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS results_application ON results(application_id, id);
+"""
+
+APPLICATION_COLUMNS = ["id", "applicant_id", "url", "company", "position", "term", "status", "created_at", "updated_at"]
+
+
+def now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def new_id():
+    return str(uuid.uuid4())
+
+
+class Datastore:
+    """SQLite (WAL mode) store for applicants, applications and results.
+
+    Reads use one connection per thread. Writes go through a queue drained by
+    a single writer thread that commits them in batches, so request handlers
+    never wait on fsync.
+    """
+
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self.local = threading.local()
+        self.writes = queue.Queue()
+        self.writer = None
+        self.writer_lock = threading.Lock()
+
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+    def _connect(self, check_same_thread=True):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=check_same_thread)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    @property
+    def conn(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = self._connect()
+        return conn
+
+    # ---------------------------
+    # Writes
+    # ---------------------------
+
+    def _ensure_writer(self):
+        with self.writer_lock:
+            if self.writer is None or not self.writer.is_alive():
+                self.writer = threading.Thread(target=self._write_loop, daemon=True)
+                self.writer.start()
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            batch = [self.writes.get()]
+            try:
+                while len(batch) < BATCH_SIZE:
+                    batch.append(self.writes.get(timeout=FLUSH_INTERVAL))
+            except queue.Empty:
+                pass
+
+            waiters = [item for item in batch if isinstance(item, threading.Event)]
+            writes = [item for item in batch if not isinstance(item, threading.Event)]
+            with tracing.span("db_flush", statements=len(writes)):
+                try:
+                    with conn:
+                        for sql, params in writes:
+                            conn.executemany(sql, params)
+                except Exception as e:
+                    # the batch rolled back as a whole; one bad row shouldn't
+                    # take other jobs' writes with it
+                    log.warning(f"batched write failed, retrying row by row: {type(e).__name__}: {e}")
+                    self._write_rows(conn, writes)
+            for event in waiters:
+                event.set()
+
+    def _write_rows(self, conn, writes):
+        """Commits each row on its own, in order, dropping only the ones that fail."""
+        dropped = 0
+        for sql, params in writes:
+            for row in params:
+                try:
+                    with conn:
+                        conn.execute(sql, row)
+                except Exception as e:
+                    dropped += 1
+                    log.error(f"dropped write: {type(e).__name__}: {e}",
+                              extra={"fields": {"sql": sql.split("(")[0].strip(), "row": repr(row)[:200]}})
+        if dropped:
+            tracing.metrics.incr("db_writes_dropped_total", dropped)
+
+    def write(self, sql: str, rows: list):
+        """Queues rows for sql; they are committed with the next batch."""
+        self._ensure_writer()
+        self.writes.put((sql, rows))
+
+    def flush(self, timeout: float = 10):
+        """Blocks until everything queued so far has been committed."""
+        self._ensure_writer()
+        done = threading.Event()
+        self.writes.put(done)
+        return done.wait(timeout)
+
+    # ---------------------------
+    # Applicants
+    # ---------------------------
+
+    def upsert_applicant(self, name, email, resume_url=None, cover_letter=None) -> str:
+        """Creates or updates the applicant with this email and returns its id.
+
+        Done synchronously, since the caller needs the id straight away.
+        """
+        ts = now()
+        with self.conn as conn:
+            row = conn.execute("SELECT id FROM applicants WHERE email = ?", (email,)).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE applicants SET name = ?, resume_url = ?, cover_letter = ?, updated_at = ? WHERE id = ?",
+                    (name, resume_url, cover_letter, ts, row["id"]),
+                )
+                return row["id"]
+
+            applicant_id = new_id()
+            conn.execute(
+                "INSERT INTO applicants (id, name, email, resume_url, cover_letter, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (applicant_id, name, email, resume_url, cover_letter, ts, ts),
+            )
+            return applicant_id
+
+    def get_applicant(self, applicant_id: str):
+        row = self.conn.execute("SELECT * FROM applicants WHERE id = ?", (applicant_id,)).fetchone()
+        return dict(row) if row else None
+
+    def latest_applicant(self):
+        row = self.conn.execute("SELECT * FROM applicants ORDER BY updated_at DESC LIMIT 1").fetchone()
+        return dict(row) if row else None
+
+    # ---------------------------
+    # Applications and results
+    # ---------------------------
+
+    def add_applications(self, applicant_id: str, rows: list[dict]) -> list[str]:
+        """Queues application rows (url, company, position, term, status)."""
+        ts = now()
+        ids = [row.get("id") or new_id() for row in rows]
+        self.write(
+            "INSERT INTO applications (id, applicant_id, url, company, position, term, status, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (app_id, applicant_id, row["url"], row.get("company"), row.get("position"),
+                 row.get("term"), row.get("status", "queued"), ts, ts)
+                for app_id, row in zip(ids, rows)
+            ],
+        )
+        return ids
+
+    def add_result(self, application_id: str, status: str, detail=None):
+        """Queues a result for an application and updates its status."""
+        ts = now()
+        if detail is not None and not isinstance(detail, str):
+            detail = json.dumps(detail)
+        self.write(
+            "INSERT INTO results (application_id, ts, status, detail) VALUES (?, ?, ?, ?)",
+            [(application_id, ts, status, detail)],
+        )
+        self.write(
+            "UPDATE applications SET status = ?, updated_at = ? WHERE id = ?",
+            [(status, ts, application_id)],
+        )
+
+    def fail_orphans(self) -> int:
+        """Marks queued/running applications failed; returns how many.
+
+        Bulk jobs and runs only live in the process that started them, so
+        at startup any row still waiting on one never gets its result, and
+        would block its url from being applied to again.
+        """
+        ts = now()
+        with self.conn as conn:
+            rows = conn.execute(
+                "SELECT id FROM applications WHERE status IN ('queued', 'running')"
+            ).fetchall()
+            conn.executemany(
+                "INSERT INTO results (application_id, ts, status, detail) VALUES (?, ?, 'failed', ?)",
+                [(row["id"], ts, json.dumps({"reason": "server restarted"})) for row in rows],
+            )
+            conn.execute(
+                "UPDATE applications SET status = 'failed', updated_at = ? WHERE status IN ('queued', 'running')",
+                (ts,),
+            )
+        return len(rows)
+
+    def applied_urls(self, applicant_id: str, urls: list[str]) -> set[str]:
+        """The subset of urls this applicant already has a live application for.
+
+        Runs that ended without submitting (see RETRYABLE) don't count, so
+        those can be retried.
+        """
+        found = set()
+        # stay well under SQLite's bound-parameter limit
+        for i in range(0, len(urls), 500):
+            chunk = urls[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            retry = ",".join("?" * len(RETRYABLE))
+            rows = self.conn.execute(
+                f"SELECT DISTINCT url FROM applications WHERE applicant_id = ? AND status NOT IN ({retry}) AND url IN ({marks})",
+                (applicant_id, *RETRYABLE, *chunk),
+            )
+            found.update(row["url"] for row in rows)
+        return found
+
+    def list_applications(self, applicant_id=None, cursor=None, limit: int = 50):
+        """One page of applications, newest first.
+
+        cursor is the opaque next_cursor from the previous page; paging is
+        keyset-based so deep pages cost the same as the first one.
+        """
+        limit = max(1, min(limit, 500))
+        where, params = [], []
+        if applicant_id:
+            where.append("applicant_id = ?")
+            params.append(applicant_id)
+        if cursor:
+            created_at, app_id = cursor.split("|", 1)
+            where.append("(created_at, id) < (?, ?)")
+            params += [created_at, app_id]
+
+        sql = "SELECT * FROM applications"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        rows = [dict(r) for r in self.conn.execute(sql, params)]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = f"{rows[-1]['created_at']}|{rows[-1]['id']}"
+        return {"items": rows, "next_cursor": next_cursor}
+
+    def iter_applications(self, applicant_id=None, status=None, company=None, term=None,
+                          since=None, until=None, chunk: int = 500):
+        """Yields matching applications oldest first, chunk rows at a time.
+
+        Uses its own connection, since a streaming response may resume the
+        generator on a different worker thread each time.
+        """
+        where, params = [], []
+        for column, value in (("applicant_id", applicant_id), ("status", status),
+                              ("company", company), ("term", term)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            where.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("created_at < ?")
+            params.append(until)
+
+        sql = "SELECT * FROM applications"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at, id"
+
+        conn = self._connect(check_same_thread=False)
+        try:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(row)
+        finally:
+            conn.close()
+
+    def results_for(self, application_id: str):
+        rows = self.conn.execute(
+            "SELECT * FROM results WHERE application_id = ? ORDER BY id", (application_id,)
+        )
+        return [dict(r) for r in rows]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> Datastore:
+    """The process-wide datastore, opened on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = Datastore()
+            orphans = _store.fail_orphans()
+            if orphans:
+                log.warning(f"marked {orphans} application(s) left queued or running by a previous server failed")
+        return _store
@@ -0,0 +1,91 @@
+import re
+
+import tracing
+from capture import CROSS_ORIGIN_TAG
+from locate import Locators, NodeMap
+
+# everything else (class, style, data-*, on*) is noise to the actor
+KEEP_ATTRS = {"id", "name", "type", "role", "for", "placeholder", "value", "href", "title", "alt"}
+DROP_TAGS = {"script", "style", "noscript", "svg", "meta", "link", "head", "template", "path", "canvas"}
+VOID_TAGS = {"input", "img", "br", "hr", "area", "base", "col", "embed", "source", "track", "wbr"}
+# attribute-free containers of these kinds add nothing but nesting
+WRAPPERS = {"div", "span", "section", "article", "main", "aside", "header", "footer", "nav", "font", "center"}
+MAX_TEXT = 200
+MAX_VALUE = 80
+
+_BARE = re.compile(r"^[\w./:#-]+$")
+
+
+def _attr(key, value):
+    if isinstance(value, list):
+        value = " ".join(value)
+    value = re.sub(r"\s+", " ", value).strip()[:MAX_VALUE]
+    if value and _BARE.match(value):
+        return f"{key}={value}"
+    return f'{key}="{value}"'
+
+
+class Compacted:
+    def __init__(self, text, nodes):
+        self.text = text
+        # short node id -> CSS selector for the live element
+        self.nodes = nodes
+
+    def __str__(self):
+        return self.text
+
+
+def compact(soup, locators=None) -> Compacted:
+    """Minified, actor-friendly rendering of a parsed page (or part of one).
+
+    Keeps only attributes that say what an element is (id, name, type, role,
+    aria-*, for, placeholder, value and a few more), drops scripts, styles
+    and empty elements, and unwraps attribute-free containers with a single
+    child. Interactive elements get a short @id that stays the same across
+    frames while their selector does; Compacted.nodes maps it back.
+    Pass the Locators of the whole page when compacting a pruned part of it.
+    """
+    from bs4 import Tag, NavigableString, Comment
+
+    with tracing.span("compact") as sp:
+        locators = locators or Locators(soup)
+        interactive = {id(el) for el in locators.interactive}
+        nodes = NodeMap()
+
+        def render(node):
+            if isinstance(node, Comment):
+                return ""
+            if isinstance(node, NavigableString):
+                text = re.sub(r"\s+", " ", str(node)).strip()
+                return text[:MAX_TEXT]
+            if not isinstance(node, Tag) or node.name in DROP_TAGS or node.name == CROSS_ORIGIN_TAG:
+                return ""
+            if node.get("aria-hidden") == "true" or node.get("type") == "hidden":
+                return ""
+
+            attrs = []
+            if id(node) in interactive:
+                attrs.append(f"@{nodes.add(locators.css(node))}")
+            for key, value in node.attrs.items():
+                if key in KEEP_ATTRS or key.startswith("aria-"):
+                    if key == "href" and str(value).startswith(("javascript:", "#")):
+                        continue
+                    attrs.append(_attr(key, value))
+
+            parts = [p for p in (render(child) for child in node.children) if p]
+            inner = " ".join(parts)
+
+            if node.name in VOID_TAGS:
+                return f"<{' '.join([node.name] + attrs)}>" if attrs or node.name == "input" else ""
+            if not attrs and not inner:
+                return ""
+            if not attrs and (node.name in WRAPPERS or node.name in ("[document]", "html", "body")):
+                # a bare container is just its children
+                if len(parts) == 1 or node.name not in ("div", "section"):
+                    return inner
+            return f"<{' '.join([node.name] + attrs)}>{inner}</{node.name}>"
+
+        text = render(soup)
+        sp["bytes"] = len(text)
+        sp["nodes"] = len(nodes)
+    return Compacted(text, nodes)
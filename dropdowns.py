@@ -0,0 +1,516 @@
+from collections import defaultdict
+import unicodedata
+import os
+import re
+
+import tracing
+import capture
+from locate import dice, trigrams
+
+log = tracing.get_logger("dropdowns")
+
+# set native selects from the profile without asking the models
+AUTOFILL = os.getenv("AUTOJOB_AUTOFILL_SELECTS", "1") == "1"
+
+# options below this score are left for the critic
+MIN_SCORE = 0.7
+# ...as are near-ties, where guessing wrong is worse than asking
+MIN_MARGIN = 0.05
+
+# spellings that mean the same thing -> one canonical phrase
+ALIASES = {
+    "united states": ["usa", "us", "u s", "u s a", "united states of america", "america"],
+    "united kingdom": ["uk", "u k", "gb", "great britain", "britain", "england"],
+    "canada": ["can"],
+    "mexico": ["mx", "mex"],
+    "india": ["in", "ind"],
+    "china": ["cn", "prc", "people s republic of china"],
+    "germany": ["de", "deutschland"],
+    "france": ["fr"],
+    "australia": ["au", "aus"],
+    "ontario": ["on", "ont"],
+    "quebec": ["qc"],
+    "british columbia": ["bc"],
+    "alberta": ["ab"],
+    "manitoba": ["mb"],
+    "saskatchewan": ["sk"],
+    "nova scotia": ["ns"],
+    "new brunswick": ["nb"],
+    "newfoundland and labrador": ["nl", "newfoundland"],
+    "prince edward island": ["pe", "pei"],
+    "california": ["calif"],
+    "new york": ["ny"],
+    "texas": ["tx"],
+    "washington": ["wa"],
+    "utah": ["ut"],
+    "bachelor": [
+        "bachelors", "bachelor s", "bsc", "b sc", "basc", "b a sc", "ba", "beng", "undergraduate degree",
+        "bachelor of science", "bachelor of arts", "bachelor of applied science", "bachelor of engineering",
+    ],
+    "master": ["masters", "master s", "msc", "m sc", "mba", "meng"],
+    "doctorate": ["phd", "ph d", "doctoral"],
+    "male": ["man", "m"],
+    "female": ["woman", "f"],
+    "white": ["caucasian", "european"],
+    "mobile": ["cell", "cellular", "cell phone", "mobile phone"],
+    "home": ["landline", "home phone"],
+    "yes": ["y", "true"],
+    "no": ["n", "false"],
+}
+# short codes ("on", "can", "m") only count as aliases when they are the whole answer
+IN_TEXT_OK = {"usa", "phd", "msc", "bsc", "mba"}
+SHORT_ONLY = {alias for aliases in ALIASES.values() for alias in aliases if len(alias) <= 3 and alias not in IN_TEXT_OK}
+
+PLACEHOLDERS = {"", "select", "select one", "please select", "choose", "choose one", "none selected", "select an option"}
+
+# label pattern -> where the answer lives in the profile, most specific first:
+# "authorized to work in the United States" is a visa question, not a state,
+# and "Sexual orientation" isn't asking for sex. Patterns match whole words
+# ("Ethnicity" has no city in it); stems spell out their endings with \w*
+FIELDS = [
+    (r"country code|phone code|dial(ing)? code", lambda p: p["contact_information"]["phone"]["country_code"]),
+    (r"phone type|device( type)?", lambda p: p["contact_information"]["phone"]["device_type"]),
+    (r"sponsor\w*", lambda p: p["residence_status"]["sponsorship"]),
+    (r"visa|authori[sz]\w*|work permit", lambda p: p["residence_status"]["visa_status"]),
+    (r"citizen\w*", lambda p: p["residence_status"]["citizenships"]),
+    (r"gender identity|identify as", lambda p: p["diversity"]["identity"]),
+    (r"lgbt\w*|orientation", lambda p: p["diversity"]["lgbtq"]),
+    (r"race|ethnic\w*", lambda p: p["diversity"]["race"]),
+    (r"disab\w*", lambda p: p["diversity"]["disability"]),
+    (r"gender|sex", lambda p: p["diversity"]["sex"]),
+    (r"hear about|source|referr\w*", lambda p: p["application_preferences"]["how_did_you_hear_about_us"]),
+    (r"worked for|previously (been )?employed|former employee", lambda p: p["application_preferences"]["has_worked_for_company_before"]),
+    (r"country", lambda p: p["contact_information"]["address"]["country"]),
+    (r"province|state|region", lambda p: p["contact_information"]["address"]["province"]),
+    (r"city", lambda p: p["contact_information"]["address"]["city"]),
+    (r"prefix|salutation|honorific", lambda p: p["personal_information"]["legal_name"]["prefix"]),
+    (r"degree", lambda p: p["education"][0]["degree_type"]),
+    (r"school|university|college|institution", lambda p: p["education"][0]["university"]),
+    (r"major|field of study|discipline|program", lambda p: p["education"][0]["major"]),
+    (r"graduat\w*|end date|completion", lambda p: p["education"][0]["end_date"]),
+    (r"year of study|current year|academic standing", lambda p: p["education"][0]["current_year"]),
+]
+FIELDS = [(re.compile(rf"\b(?:{pattern})\b", re.I), get) for pattern, get in FIELDS]
+
+_ALIAS_RE = re.compile(
+    r"\b(" + "|".join(
+        re.escape(alias)
+        for alias in sorted({a for v in ALIASES.values() for a in v if a not in SHORT_ONLY}, key=len, reverse=True)
+    ) + r")\b"
+)
+_CANONICAL = {alias: name for name, aliases in ALIASES.items() for alias in aliases}
+_YEAR = re.compile(r"\b(19|20)\d\d\b")
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode()
+    return " ".join(re.sub(r"[^a-z0-9+]+", " ", text.lower()).replace("+", " ").split())
+
+
+def canonical(text):
+    text = normalize(text)
+    if text in _CANONICAL:
+        return _CANONICAL[text]
+    return _ALIAS_RE.sub(lambda m: _CANONICAL[m.group(1)], text)
+
+
+def year_range(text):
+    """(low, high) years an option covers, e.g. "2025 - 2027" or "2026 or later"."""
+    years = [int(m.group(0)) for m in _YEAR.finditer(text)]
+    if not years:
+        return None
+    lowered = text.lower()
+    if len(years) >= 2:
+        return min(years), max(years)
+    if re.search(r"after|later|beyond|\+|onward", lowered):
+        return years[0], 9999
+    if re.search(r"before|earlier|prior", lowered):
+        return 0, years[0]
+    return years[0], years[0]
+
+
+def score(value, option):
+    """How well option text answers value, from 0 to 1."""
+    if normalize(value) == normalize(option) != "":
+        return 1.0
+    a, b = canonical(value), canonical(option)
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 0.98
+
+    value_year, option_range = year_range(value), year_range(option)
+    if value_year and option_range and value_year[0] == value_year[1]:
+        low, high = option_range
+        if low <= value_year[0] <= high:
+            return 0.95 if low == high else 0.9
+        return 0.0
+
+    ta, tb = set(a.split()), set(b.split())
+    overlap = len(ta & tb) / len(ta | tb)
+    # "No" vs "No, I will not need sponsorship"
+    if ta <= tb or tb <= ta:
+        overlap = max(overlap, 0.75)
+    return max(overlap, dice(trigrams(a), trigrams(b)))
+
+
+def best_option(value, options):
+    """Index of the option that best matches value, or None if none clearly does.
+
+    options are (text, disabled) pairs in document order.
+    """
+    ranked = sorted(
+        ((score(value, text), i) for i, (text, disabled) in enumerate(options)
+         if not disabled and normalize(text) not in PLACEHOLDERS),
+        reverse=True,
+    )
+    if not ranked or ranked[0][0] < MIN_SCORE:
+        return None
+    if len(ranked) > 1 and ranked[0][0] - ranked[1][0] < MIN_MARGIN:
+        return None
+    return ranked[0][1]
+
+
+def profile_value(profile, label):
+    for pattern, get in FIELDS:
+        if pattern.search(label):
+            try:
+                return get(profile) or None
+            except (KeyError, IndexError):
+                return None
+    return None
+
+
+# ---------------------------
+# Filling native <select>s
+# ---------------------------
+
+# sets every select in the current frame in one call; args: [[css, index], ...]
+SET_SELECTS = """
+var out = [];
+var items = arguments[0];
+for (var i = 0; i < items.length; i++) {
+    var steps = items[i][0].split(%r), node = document;
+    for (var j = 0; j < steps.length && node; j++) {
+        if (j > 0) node = node.shadowRoot;
+        node = node && node.querySelector(steps[j]);
+    }
+    if (!node || node.tagName !== "SELECT") { out.push(false); continue; }
+    node.selectedIndex = items[i][1];
+    node.dispatchEvent(new Event("input", {bubbles: true}));
+    node.dispatchEvent(new Event("change", {bubbles: true}));
+    out.push(true);
+}
+return out;
+""" % capture.SHADOW_SEP
+
+
+def plan_selects(index, profile, skip=()):
+    """[(element, option index, value)] for unanswered selects the profile can answer."""
+    choices = []
+    for el in index.elements:
+        if el.tag != "select" or el.locator in skip:
+            continue
+        options = el.node.find_all("option")
+        # captured pages carry the live value; plain page_source only the authored one
+        current = el.node.get("value")
+        if current is None:
+            chosen = [i for i, o in enumerate(options) if o.has_attr("selected")]
+        else:
+            chosen = [i for i, o in enumerate(options) if o.get("value", o.get_text(strip=True)) == current]
+        # somebody already answered this one (the first option is usually a placeholder)
+        if chosen and chosen[0] > 0:
+            continue
+
+        label = " ".join(el.fields[k] for k in ("label", "aria", "name", "nearby") if el.fields.get(k))
+        value = profile_value(profile, label)
+        if not value:
+            continue
+
+        choice = best_option(value, [(o.get_text(" ", strip=True), o.has_attr("disabled")) for o in options])
+        if choice is not None:
+            choices.append((el, choice, value))
+    return choices
+
+
+def fill_selects(driver, index, profile, skip=()):
+    """Sets every native select the profile can answer, one script call per frame.
+
+    Returns the elements that were set; pass their locators back as skip
+    next time so a select the page resets (or the critic changes) isn't
+    fought over.
+    """
+    choices = plan_selects(index, profile, skip)
+    if not choices:
+        return []
+
+    by_frame = defaultdict(list)
+    for el, choice, value in choices:
+        by_frame[capture.frame_of(el.locator)].append((el, choice, value))
+
+    done = []
+    with tracing.span("fill_selects", selects=len(choices)):
+        for frame, items in by_frame.items():
+            if frame:
+                capture.enter_frame(driver, items[0][0].locator)
+            args = [[el.locator.rpartition(capture.FRAME_SEP)[2], choice] for el, choice, _ in items]
+            for (el, choice, value), ok in zip(items, driver.execute_script(SET_SELECTS, args)):
+                if ok:
+                    done.append(el)
+                    log.info("filled select", extra={"fields": {"label": el.fields["label"], "value": value, "option": el.options[choice]}})
+        driver.switch_to.default_content()
+    tracing.metrics.incr("selects_filled_total", len(done))
+    return done
+
+
+# ---------------------------
+# ARIA comboboxes
+# ---------------------------
+
+# How long one combobox may take, typing and all
+COMBOBOX_TIMEOUT_MS = int(os.getenv("AUTOJOB_COMBOBOX_TIMEOUT_MS", "6000"))
+
+# Drives one combobox start to finish inside the page: open it, pick
+# straight away if the open list already has a clear match, otherwise type
+# each query a character at a time and let a MutationObserver say when the
+# list has settled after each keystroke, then click the best option and
+# confirm with Enter if the widget didn't close. Native selects are handled
+# too. args: locator steps, search queries, match variants, timeout, and
+# the match thresholds.
+COMBOBOX = """
+var steps = arguments[0], queries = arguments[1], variants = arguments[2], timeout = arguments[3];
+var MIN = arguments[4], MARGIN = arguments[5], done = arguments[arguments.length - 1];
+var start = Date.now(), typed = "", rounds = 0;
+
+function resolve() {
+    var node = document;
+    for (var i = 0; i < steps.length && node; i++) {
+        if (i > 0) node = node.shadowRoot;
+        node = node && node.querySelector(steps[i]);
+    }
+    return node;
+}
+function norm(s) {
+    return (s || "").normalize("NFKD").replace(/[\\u0300-\\u036f]/g, "").toLowerCase().replace(/[^a-z0-9]+/g, " ").trim();
+}
+function grams(s) {
+    var g = {}; s = "  " + s + " ";
+    for (var i = 0; i < s.length - 2; i++) g[s.substr(i, 3)] = 1;
+    return g;
+}
+function dice(a, b) {
+    var both = 0, na = 0, nb = 0, k;
+    for (k in a) { na++; if (b[k]) both++; }
+    for (k in b) nb++;
+    return na + nb ? 2 * both / (na + nb) : 0;
+}
+var wanted = variants.map(function (v) { return {text: v, grams: grams(v)}; });
+function score(text) {
+    var t = norm(text), best = 0, g = grams(t);
+    if (!t) return 0;
+    for (var i = 0; i < wanted.length; i++) {
+        var v = wanted[i].text;
+        if (t === v) return 1;
+        if (t.indexOf(v + " ") === 0 || v.indexOf(t + " ") === 0) best = Math.max(best, 0.85);
+        else if ((" " + t + " ").indexOf(" " + v + " ") >= 0) best = Math.max(best, 0.75);
+        best = Math.max(best, dice(g, wanted[i].grams));
+    }
+    return best;
+}
+function rank(items, text) {
+    var top = null, s = 0, second = 0;
+    for (var i = 0; i < items.length; i++) {
+        var v = score(text(items[i]));
+        if (v > s) { second = s; s = v; top = items[i]; } else if (v > second) second = v;
+    }
+    return {el: top, score: s, margin: s - second, count: items.length};
+}
+function clear(b) {
+    return b.el && b.score >= MIN && (b.margin >= MARGIN || b.score === 1 || b.count === 1);
+}
+function finish(ok, error, picked) {
+    done({ok: ok, error: error, option: picked ? picked.trim() : null, typed: typed,
+          rounds: rounds, ms: Date.now() - start});
+}
+
+var box = resolve();
+if (!box) return finish(false, "not found");
+
+if (box.tagName === "SELECT") {
+    var opts = Array.prototype.filter.call(box.options, function (o) {
+        var t = norm(o.text);
+        return !o.disabled && t && !/^(select|choose|please select)\\b/.test(t);
+    });
+    var b = rank(opts, function (o) { return o.text; });
+    if (!clear(b)) return finish(false, b.el ? "ambiguous" : "no match");
+    box.selectedIndex = b.el.index;
+    box.dispatchEvent(new Event("input", {bubbles: true}));
+    box.dispatchEvent(new Event("change", {bubbles: true}));
+    return finish(true, null, b.el.text);
+}
+
+var input = box.matches("input, textarea, [contenteditable]") ? box
+    : (box.querySelector("input, [contenteditable]") || box);
+var root = box.getRootNode ? box.getRootNode() : document;
+// button-style boxes open a full list; there is nothing to type into
+var typeable = input.tagName === "INPUT" || input.tagName === "TEXTAREA" || input.isContentEditable;
+
+function listbox() {
+    var ids = [box, input].map(function (el) {
+        return el.getAttribute("aria-controls") || el.getAttribute("aria-owns");
+    }).filter(Boolean);
+    for (var i = 0; i < ids.length; i++) {
+        var found = (root.getElementById ? root.getElementById(ids[i]) : null) || document.getElementById(ids[i]);
+        if (found) return found;
+    }
+    var all = document.querySelectorAll("[role=listbox]");
+    for (var j = 0; j < all.length; j++) if (all[j].offsetParent !== null) return all[j];
+    return null;
+}
+function options() {
+    var lb = listbox();
+    if (!lb) return [];
+    return Array.prototype.filter.call(lb.querySelectorAll("[role=option]"), function (o) {
+        return o.getAttribute("aria-disabled") !== "true";
+    });
+}
+function mouse(el, type) {
+    el.dispatchEvent(new MouseEvent(type, {bubbles: true, cancelable: true, view: window}));
+}
+function click(el) {
+    mouse(el, "mousedown"); mouse(el, "mouseup"); mouse(el, "click");
+}
+function key(name, code) {
+    var init = {key: name, code: name, keyCode: code, which: code, bubbles: true};
+    input.dispatchEvent(new KeyboardEvent("keydown", init));
+    input.dispatchEvent(new KeyboardEvent("keyup", init));
+}
+function setText(text) {
+    typed = text;
+    if (input.tagName === "INPUT" || input.tagName === "TEXTAREA") {
+        // the prototype setter, so React's value tracking sees the change
+        var proto = input.tagName === "INPUT" ? HTMLInputElement.prototype : HTMLTextAreaElement.prototype;
+        Object.getOwnPropertyDescriptor(proto, "value").set.call(input, text);
+    } else {
+        input.textContent = text;
+    }
+    input.dispatchEvent(new Event("input", {bubbles: true}));
+}
+// calls back once the page has been quiet for a moment (or never changed)
+function settle(next) {
+    rounds++;
+    var ended = false, timer = null;
+    var observer = new MutationObserver(function () {
+        clearTimeout(timer);
+        timer = setTimeout(end, 120);
+    });
+    observer.observe(document.documentElement, {childList: true, subtree: true, attributes: true, characterData: true});
+    if (root !== document) observer.observe(root, {childList: true, subtree: true, attributes: true});
+    timer = setTimeout(end, 250);
+    function end() {
+        if (ended) return;
+        ended = true;
+        observer.disconnect();
+        next();
+    }
+}
+function pick(b) {
+    var text = b.el.textContent;
+    b.el.scrollIntoView({block: "nearest"});
+    click(b.el);
+    settle(function () {
+        if (box.getAttribute("aria-expanded") === "true" && b.el.getAttribute("aria-selected") !== "true") {
+            key("Enter", 13);
+        }
+        finish(true, null, text);
+    });
+}
+
+var query = 0;
+function step() {
+    if (Date.now() - start > timeout) return finish(false, "timeout");
+    var b = rank(options(), function (o) { return o.textContent; });
+    if (clear(b)) return pick(b);
+
+    if (!typeable) return finish(false, b.el ? "ambiguous" : "no match");
+    var q = queries[query];
+    if (typed.length >= q.length) {
+        // this query is used up; try the next spelling from scratch
+        query++;
+        if (query >= queries.length) return finish(false, b.el ? "ambiguous" : "no match");
+        setText("");
+        q = queries[query];
+    }
+    setText(q.slice(0, Math.max(3, typed.length + 1)));
+    settle(step);
+}
+
+input.focus();
+click(box);
+settle(step);
+"""
+
+
+def combobox_terms(value):
+    """(queries to type, variants to match) for a profile value."""
+    name = canonical(value)
+    # what people type: the words, without "(+1)" style decorations
+    queries = [" ".join(re.sub(r"[^A-Za-z ]+", " ", text).split()) for text in (value, name.title())]
+    queries = list({q.lower(): q for q in reversed(queries) if q}.values())[::-1]
+    return queries or [value], list(dict.fromkeys([normalize(value), name]))
+
+
+def choose(driver, locator, value, timeout_ms=COMBOBOX_TIMEOUT_MS):
+    """Picks value in the combobox or select at locator in one round trip.
+
+    Returns the script's report: ok, the option picked, what was typed,
+    how many settle rounds it took and how long. Leaves the driver in the
+    element's frame.
+    """
+    queries, variants = combobox_terms(value)
+    css = capture.enter_frame(driver, locator)
+    with tracing.span("combobox", locator=locator) as sp, capture.script_timeout(driver, timeout_ms / 1000 + 2):
+        result = driver.execute_async_script(
+            COMBOBOX, css.split(capture.SHADOW_SEP), queries, variants, timeout_ms, MIN_SCORE, MIN_MARGIN
+        )
+        sp.update(result)
+    return result
+
+
+def plan_comboboxes(index, profile, skip=()):
+    """[(element, value)] for empty ARIA comboboxes the profile can answer."""
+    choices = []
+    for el in index.elements:
+        if el.locator in skip or el.attrs.get("role") != "combobox":
+            continue
+        # an input shows its answer as a value, a button-style box as its text
+        shown = el.attrs.get("value") or el.fields.get("text") or ""
+        if normalize(shown) not in PLACEHOLDERS:
+            continue
+        label = " ".join(el.fields[k] for k in ("label", "aria", "placeholder", "name", "nearby") if el.fields.get(k))
+        value = profile_value(profile, label)
+        if value:
+            choices.append((el, value))
+    return choices
+
+
+def fill_comboboxes(driver, index, profile, skip=()):
+    """Answers every empty combobox the profile can, one round trip each.
+
+    Returns the elements attempted, whether or not a match was found, so
+    the caller can leave them to the critic from then on.
+    """
+    attempted = []
+    for el, value in plan_comboboxes(index, profile, skip):
+        attempted.append(el)
+        try:
+            result = choose(driver, el.locator, value)
+        except Exception as e:
+            log.warning(f"combobox failed: {type(e).__name__}: {e}", extra={"fields": {"label": el.fields["label"]}})
+            continue
+        log.info("filled combobox" if result["ok"] else "combobox left for the critic",
+                 extra={"fields": {"label": el.fields["label"], "value": value, **result}})
+        if result["ok"]:
+            tracing.metrics.incr("comboboxes_filled_total")
+    driver.switch_to.default_content()
+    return attempted
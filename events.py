@@ -0,0 +1,194 @@
+from fastapi import WebSocket
+from collections import deque
+import asyncio
+import json
+import os
+
+from history import RingRegistry
+import tracing
+
+log = tracing.get_logger("events")
+
+# max events queued per websocket before we start dropping the oldest ones
+CLIENT_BUFFER = int(os.getenv("AUTOJOB_WS_BUFFER", "256"))
+# events published within this window are sent to a client as a single frame
+BATCH_WINDOW = float(os.getenv("AUTOJOB_WS_BATCH_MS", "50")) / 1000
+# per-run history kept around for reconnecting clients
+RING_SIZE = int(os.getenv("AUTOJOB_WS_RING", "1000"))
+# how many runs keep their ring buffer before the oldest is forgotten
+MAX_RUNS = int(os.getenv("AUTOJOB_WS_MAX_RUNS", "50"))
+# cap on events packed into one replay frame
+REPLAY_CHUNK = 200
+
+
+class _Client:
+    """A connected websocket plus its bounded outbox and run subscriptions.
+
+    Every client is drained by its own sender task, so one slow browser tab
+    can never hold up the others.
+    """
+
+    def __init__(self, websocket: WebSocket, maxlen: int, runs=None):
+        self.websocket = websocket
+        self.maxlen = maxlen
+        # empty set means "every run"
+        self.runs = set(runs or [])
+        self.outbox = deque()
+        self.wakeup = asyncio.Event()
+        self.dropped = 0
+        self.task = None
+        # held while frames go out, so a replay can't interleave with live sends
+        self.sending = asyncio.Lock()
+
+    def wants(self, run_id) -> bool:
+        return not self.runs or run_id in self.runs
+
+    def offer(self, message, coalesce_key=None):
+        # Events with a coalesce key (e.g. the current actor_word) only care
+        # about the latest value, so overwrite the pending one instead of queueing
+        if coalesce_key is not None:
+            for i, (key, _) in enumerate(self.outbox):
+                if key == coalesce_key:
+                    self.outbox[i] = (key, message)
+                    self.wakeup.set()
+                    return
+
+        if len(self.outbox) >= self.maxlen:
+            self.outbox.popleft()
+            self.dropped += 1
+
+        self.outbox.append((coalesce_key, message))
+        self.wakeup.set()
+
+
+class ConnectionManager:
+    def __init__(self, buffer_size: int = CLIENT_BUFFER):
+        self.buffer_size = buffer_size
+        self.clients: dict[WebSocket, _Client] = {}
+        self.rings = RingRegistry(RING_SIZE, MAX_RUNS)
+        self.loop = None
+
+    @property
+    def active_connections(self) -> list[WebSocket]:
+        return list(self.clients)
+
+    async def connect(self, websocket: WebSocket, runs=None, since=0):
+        """Registers a client and replays what it missed before going live.
+
+        since is the last seq seen, for every run in runs; or, for a client
+        following every run, a {run: last seq} dict of the runs to replay.
+        """
+        await websocket.accept()
+        # remember the server's loop so worker threads can hand events to it
+        self.loop = asyncio.get_running_loop()
+
+        client = _Client(websocket, self.buffer_size, runs)
+        self.clients[websocket] = client
+        await self._replay(client, since if isinstance(since, dict) else {run: since for run in client.runs})
+        client.task = asyncio.create_task(self._sender(client))
+
+    async def subscribe(self, websocket: WebSocket, run_id: str, since: int = 0):
+        client = self.clients.get(websocket)
+        if client is None:
+            return
+        # a client following every run already gets this one
+        if client.runs:
+            client.runs.add(run_id)
+        await self._replay(client, {run_id: since})
+
+    async def _replay(self, client: _Client, since_by_run: dict):
+        # Resuming clients get whatever the ring still holds past their last
+        # seq, sent straight away so it can't be trimmed by the outbox cap.
+        # The sender waits meanwhile: a live event going out mid-replay would
+        # make the client drop the older replayed ones as already seen
+        async with client.sending:
+            for run_id, since in since_by_run.items():
+                ring = self.rings.find(run_id)
+                if ring is None:
+                    continue
+                backlog = ring.since(since)
+                for i in range(0, len(backlog), REPLAY_CHUNK):
+                    await client.websocket.send_text(json.dumps({
+                        "type": "batch",
+                        "events": backlog[i:i + REPLAY_CHUNK],
+                    }))
+
+    def disconnect(self, websocket: WebSocket):
+        client = self.clients.pop(websocket, None)
+        if client is not None and client.task is not None:
+            client.task.cancel()
+
+    async def _sender(self, client: _Client):
+        while True:
+            await client.wakeup.wait()
+            # give the worker a moment to publish the rest of the burst
+            await asyncio.sleep(BATCH_WINDOW)
+            client.wakeup.clear()
+
+            async with client.sending:
+                frames = []
+                batch = []
+                while client.outbox:
+                    _, message = client.outbox.popleft()
+                    if isinstance(message, dict):
+                        batch.append(message)
+                        continue
+                    # plain text keeps its position relative to the events around it
+                    if batch:
+                        frames.append(json.dumps({"type": "batch", "events": batch}))
+                        batch = []
+                    frames.append(message)
+                if batch:
+                    frames.append(json.dumps({"type": "batch", "events": batch}))
+
+                try:
+                    for frame in frames:
+                        await client.websocket.send_text(frame)
+                except Exception as e:
+                    log.warning(f"Failed to send to websocket: {e}")
+                    self.clients.pop(client.websocket, None)
+                    return
+
+    def send_personal(self, websocket: WebSocket, message: str):
+        client = self.clients.get(websocket)
+        if client is not None:
+            client.offer(message)
+
+    def _fan_out(self, run_id, message, coalesce_key=None):
+        # only ever runs on the server loop, so no locking needed
+        for client in list(self.clients.values()):
+            if run_id is None or client.wants(run_id):
+                client.offer(message, coalesce_key)
+
+    async def broadcast(self, message: str, coalesce_key=None):
+        self.loop = asyncio.get_running_loop()
+        self._fan_out(None, message, coalesce_key)
+
+    def publish(self, run_id: str, event: dict, coalesce: bool = False):
+        """Thread-safe publish of one run event.
+
+        The event is stamped with the run ID and the run's next sequence
+        number and recorded in its ring buffer, then handed to the server loop
+        for fan-out to subscribers. Never blocks the caller.
+        """
+        event = self.rings.get(run_id).append({"run": run_id, **event})
+
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            return event
+
+        coalesce_key = (run_id, event.get("type")) if coalesce else None
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is loop:
+            self._fan_out(run_id, event, coalesce_key)
+        else:
+            loop.call_soon_threadsafe(self._fan_out, run_id, event, coalesce_key)
+        return event
+
+
+manager = ConnectionManager()
@@ -1,21 +1,19 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import Select
-from selenium.webdriver.common import *
-from selenium.webdriver.common.keys import Keys
-from bs4 import BeautifulSoup
-import sys
-import threading
 import time
 import re
-import json
-import os
+
+import tracing
+import capture
+import cdp
+from domcompact import compact
+
+log = tracing.get_logger("extraction")
+
+# bs4 and selenium are imported inside the functions that need them, so
+# importing this module stays cheap for the server and the bench scripts
 
 def extract_info(html):
+    from bs4 import BeautifulSoup
+
     soup = BeautifulSoup(html, "html.parser")
 
     useless_tags = [
@@ -26,9 +24,12 @@ def extract_info(html):
     for tag in soup(useless_tags):
         tag.decompose()
 
-    return [soup.prettify()]
+    # prettify() grew the page; the compact form is a tenth of the size
+    return [compact(soup).text]
 
 def extract_info_legacy(html):
+    from bs4 import BeautifulSoup
+
     soup = BeautifulSoup(html, "html.parser")
 
     # ---------------------------
@@ -304,46 +305,181 @@ def extract_info_legacy(html):
     return elements
 
 
-# for safely clicking buttons
-from selenium.webdriver.common.action_chains import ActionChains
-from selenium.webdriver.support import expected_conditions as EC
+# third-party widgets that float over forms and are safe to hide outright
+HIDE_OVERLAYS = [
+    "#intercom-container", ".intercom-lightweight-app", "#drift-widget-container",
+    "#drift-frame-controller", "#hubspot-messages-iframe-container", "#fc_frame",
+    ".zsiq_floatmain", "#launcher", "iframe[title*='chat' i]", "[id*='chat-widget' i]",
+    "#onetrust-consent-sdk", "#CybotCookiebotDialog", "#truste-consent-track",
+]
+# close buttons of anything else fixed over the page (modals, promos, banners)
+CLOSE_BUTTONS = [
+    "[aria-label*='close' i]", "[aria-label*='dismiss' i]", "[title*='close' i]",
+    "[data-dismiss]", "[data-bs-dismiss]", "button.close", ".modal-close",
+    "[data-testid*='close' i]",
+]
+MAX_DISMISSALS = 3
+
+# Everything a click needs in one round trip: wait for the element to be
+# visible and enabled, scroll it to the centre, hit-test it with
+# elementFromPoint, get rid of a known overlay in the way, then send the
+# pointer/mouse sequence and click(). Reports why it couldn't instead of
+# throwing. args: element, timeout, overlays to hide, close buttons, max dismissals.
+CLICK = """
+var el = arguments[0], timeout = arguments[1], hide = arguments[2].join(","), close = arguments[3].join(",");
+var maxDismiss = arguments[4], done = arguments[arguments.length - 1];
+var start = Date.now(), dismissed = [], attempts = 0;
+var win = el.ownerDocument.defaultView, root = el.getRootNode();
+if (!root.elementFromPoint) root = el.ownerDocument;
+
+function finish(r) {
+    r.ms = Date.now() - start;
+    r.dismissed = dismissed;
+    r.attempts = attempts;
+    done(r);
+}
+function describe(e) {
+    if (!e) return null;
+    var s = e.tagName.toLowerCase();
+    if (e.id) s += "#" + e.id;
+    if (typeof e.className === "string" && e.className.trim()) s += "." + e.className.trim().split(/\\s+/).slice(0, 2).join(".");
+    return s;
+}
+function visible(e) {
+    var r = e.getBoundingClientRect(), st = win.getComputedStyle(e);
+    return r.width > 0 && r.height > 0 && st.visibility !== "hidden" && st.display !== "none";
+}
+function shown(e) {
+    var st = win.getComputedStyle(e);
+    return st.display !== "none" && st.visibility !== "hidden" && e.getBoundingClientRect().width > 0;
+}
+function ours(top) {
+    if (top === el || el.contains(top)) return true;
+    // a styled label sitting over its own checkbox/radio
+    var label = top.closest && top.closest("label");
+    return !!(label && label.control === el);
+}
+function hit() {
+    var r = el.getBoundingClientRect(), blocker = null;
+    var points = [[0.5, 0.5], [0.25, 0.5], [0.75, 0.5], [0.5, 0.25], [0.5, 0.75]];
+    for (var i = 0; i < points.length; i++) {
+        var x = r.left + r.width * points[i][0], y = r.top + r.height * points[i][1];
+        if (x < 0 || y < 0 || x >= win.innerWidth || y >= win.innerHeight) continue;
+        var top = root.elementFromPoint(x, y);
+        if (top && ours(top)) return {x: x, y: y};
+        blocker = blocker || top;
+    }
+    return {blocker: blocker};
+}
+function overlayOf(e) {
+    for (var n = e; n && n.nodeType === 1; n = n.parentElement || (n.getRootNode() && n.getRootNode().host)) {
+        var pos = win.getComputedStyle(n).position;
+        if (pos === "fixed" || pos === "sticky" || n.getAttribute("aria-modal") === "true" || n.getAttribute("role") === "dialog") return n;
+    }
+    return null;
+}
+function dismiss(blocker) {
+    var known = blocker.closest && blocker.closest(hide);
+    if (known) {
+        known.style.setProperty("display", "none", "important");
+        dismissed.push({overlay: describe(known), how: "hidden"});
+        return true;
+    }
+    var overlay = overlayOf(blocker);
+    if (!overlay || overlay.contains(el)) return false;
+    var buttons = overlay.querySelectorAll(close);
+    for (var i = 0; i < buttons.length; i++) {
+        if (shown(buttons[i])) {
+            buttons[i].click();
+            dismissed.push({overlay: describe(overlay), how: "closed"});
+            return true;
+        }
+    }
+    return false;
+}
+function press(x, y) {
+    var opts = {bubbles: true, cancelable: true, composed: true, view: win, clientX: x, clientY: y, button: 0};
+    var Pointer = win.PointerEvent || win.MouseEvent;
+    el.dispatchEvent(new Pointer("pointerdown", opts));
+    el.dispatchEvent(new win.MouseEvent("mousedown", opts));
+    if (el.focus) el.focus({preventScroll: true});
+    el.dispatchEvent(new Pointer("pointerup", opts));
+    el.dispatchEvent(new win.MouseEvent("mouseup", opts));
+    el.click();
+}
+function attempt() {
+    attempts++;
+    if (!el.isConnected) return finish({ok: false, reason: "detached"});
+    var late = Date.now() - start > timeout;
+    if (!visible(el)) return late ? finish({ok: false, reason: "hidden"}) : setTimeout(attempt, 50);
+    if (el.disabled || el.getAttribute("aria-disabled") === "true") {
+        return late ? finish({ok: false, reason: "disabled"}) : setTimeout(attempt, 50);
+    }
+    el.scrollIntoView({behavior: "instant", block: "center", inline: "center"});
+    var h = hit();
+    if (h.x !== undefined) {
+        press(h.x, h.y);
+        return finish({ok: true, method: "script", at: [Math.round(h.x), Math.round(h.y)]});
+    }
+    // give overlays that are fading out (or one we just closed) a moment
+    if (h.blocker && dismissed.length < maxDismiss && dismiss(h.blocker)) return setTimeout(attempt, 150);
+    if (late) return finish({ok: false, reason: "occluded", blocker: describe(h.blocker)});
+    setTimeout(attempt, 100);
+}
+attempt();
+"""
+
 
 def safe_click(driver, element, timeout=10):
-    # Wait until element is actually clickable
-    WebDriverWait(driver, timeout).until(
-        EC.element_to_be_clickable(element)
-    )
-
-    # Scroll into view (centered)
-    driver.execute_script("""
-        arguments[0].scrollIntoView({
-            behavior: 'instant',
-            block: 'center',
-            inline: 'center'
-        });
-    """, element)
-
-    time.sleep(0.2)
-
-    try:
-        element.click()
-        return
-
-    except Exception:
-        pass
-
-    # Fallback 1 — click via JS (ignores overlays)
-    try:
-        driver.execute_script("arguments[0].click();", element)
-        return
-    except Exception:
-        pass
-
-    # Fallback 2 — ActionChains click
-    try:
-        ActionChains(driver).move_to_element(element).pause(0.1).click().perform()
-        return
-    except Exception:
-        pass
-
-    raise RuntimeError("safe_click failed for element")
+    """Clicks element, getting an overlay out of the way first if it has to.
+
+    The wait, scroll, hit test, overlay dismissal and click all happen in
+    one injected script; a native click (a WebDriver click, or real mouse
+    events over CDP when cdp.active) then ActionChains are only tried when
+    that script couldn't click. Returns a dict with ok,
+    method ("script", "native" or "actions"), ms, the overlays dismissed
+    and, when the script gave up, its reason and what was in the way.
+    Raises RuntimeError if nothing managed to click.
+    """
+    from selenium.webdriver.common.action_chains import ActionChains
+    from selenium.common.exceptions import JavascriptException, TimeoutException
+
+    start = time.perf_counter()
+    with tracing.span("click") as sp:
+        try:
+            with capture.script_timeout(driver, timeout + 2):
+                result = driver.execute_async_script(
+                    CLICK, element, int(timeout * 1000), HIDE_OVERLAYS, CLOSE_BUTTONS, MAX_DISMISSALS
+                )
+        except (JavascriptException, TimeoutException) as e:
+            result = {"ok": False, "reason": f"script error: {type(e).__name__}", "dismissed": []}
+
+        if not result["ok"]:
+            # the page may ignore synthetic events the script would send, and
+            # WebDriver's own interactability checks say more when it fails
+            log.debug(f"script click failed ({result['reason']}), trying native input",
+                      extra={"fields": {"blocker": result.get("blocker")}})
+            errors = []
+            # over CDP the "native" click is a trusted mouse press at the element's centre
+            native = (lambda: cdp.click(driver, element)) if cdp.active(driver) else element.click
+            for method, click in (("native", native),
+                                  ("actions", lambda: ActionChains(driver).move_to_element(element).click().perform())):
+                try:
+                    click()
+                    result.update(ok=True, method=method)
+                    break
+                except Exception as e:
+                    errors.append(f"{method}: {type(e).__name__}")
+
+        result["ms"] = round((time.perf_counter() - start) * 1000, 1)
+        sp.update({k: result.get(k) for k in ("ok", "method", "reason", "blocker")})
+        sp["dismissed"] = len(result.get("dismissed", []))
+    for overlay in result.get("dismissed", []):
+        log.info(f"dismissed overlay {overlay['overlay']} ({overlay['how']})")
+    tracing.metrics.incr(f"click_{result.get('method') or 'failed'}_total")
+
+    if not result["ok"]:
+        raise RuntimeError(f"safe_click failed: {result['reason']}"
+                           + (f", covered by {result['blocker']}" if result.get("blocker") else "")
+                           + f" ({'; '.join(errors)})")
+    return result
@@ -51,6 +51,11 @@ export default function App() {
   const criticTyping = useRef(false);
   const actorEndRef = useRef(null);
   const criticEndRef = useRef(null);
+  const runIdRef = useRef(null);
+  // last event seq seen, per run
+  const lastSeqRef = useRef({});
+  // the bulk job being watched, so a reconnect can replay its runs
+  const bulkJobRef = useRef(null);
 
   // ==================== TYPING EFFECT FOR HERO ====================
   useEffect(() => {
@@ -83,17 +88,22 @@ export default function App() {
   // ==================== HANDLERS ====================
   const handleSingleSubmit = async () => {
     if (!singleUrl.trim()) return;
-    setCurrentView("running");
     
     try {
-      await fetch("http://localhost:8000/apply", {
+      const res = await fetch("http://localhost:8000/apply", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ url: singleUrl }),
       });
+      const data = await res.json();
+      runIdRef.current = data.run || null;
+      bulkJobRef.current = null;
+      lastSeqRef.current = {};
     } catch (err) {
       console.error("Failed to POST /apply", err);
     }
+    // only start listening once we know which run to subscribe to
+    setCurrentView("running");
   };
 
   const handleBatchSubmit = async () => {
@@ -101,18 +111,22 @@ export default function App() {
     const urls = batchUrls.split("\n").filter(u => u.trim());
     if (urls.length === 0) return;
     
-    setCurrentView("running");
-    
-    // Submit first URL, queue the rest
+    // Queue every URL; the server de-duplicates and spreads them over browsers
     try {
-      await fetch("http://localhost:8000/apply", {
+      const res = await fetch("http://localhost:8000/apply_bulk", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ url: urls[0], batch: urls }),
+        body: JSON.stringify({ urls }),
       });
+      const data = await res.json();
+      // a bulk job spans many runs, so listen to all of them
+      runIdRef.current = null;
+      bulkJobRef.current = data.id || null;
+      lastSeqRef.current = {};
     } catch (err) {
-      console.error("Failed to POST batch /apply", err);
+      console.error("Failed to POST /apply_bulk", err);
     }
+    setCurrentView("running");
   };
 
   const handleProfileSave = async () => {
@@ -150,23 +164,46 @@ export default function App() {
   useEffect(() => {
     if (currentView !== "running") return;
 
+    const handleEvent = (data) => {
+      if (data.run && data.seq) {
+        // replayed and live events can overlap right after a reconnect
+        if (data.seq <= (lastSeqRef.current[data.run] || 0)) return;
+        lastSeqRef.current[data.run] = data.seq;
+      }
+
+      if (data.type === "actor_line" && data.ts && data.text) {
+        actorQueue.current.push({ ts: data.ts, text: data.text });
+        setActorLineCount(prev => prev + 1);
+      }
+
+      if (data.type === "critic_line" && data.line) {
+        criticQueue.current.push(data.line);
+        setCriticLineCount(prev => prev + 1);
+      }
+    };
+
     const connectWebSocket = () => {
-      const ws = new WebSocket("ws://localhost:8000/ws");
+      // subscribe to our run and resume after the last event we saw; when
+      // following every run, resume each one we saw plus the bulk job's others
+      let params = "";
+      if (runIdRef.current) {
+        params = `?run=${runIdRef.current}&since=${lastSeqRef.current[runIdRef.current] || 0}`;
+      } else {
+        const seen = Object.entries(lastSeqRef.current).map(([run, seq]) => `${run}:${seq}`).join(",");
+        params = `?seen=${seen}` + (bulkJobRef.current ? `&bulk=${bulkJobRef.current}` : "");
+      }
+      const ws = new WebSocket(`ws://localhost:8000/ws${params}`);
       
       ws.onopen = () => console.log("WebSocket connected");
       
       ws.onmessage = (event) => {
         try {
           const data = JSON.parse(event.data);
-          
-          if (data.type === "actor_line" && data.ts && data.text) {
-            actorQueue.current.push({ ts: data.ts, text: data.text });
-            setActorLineCount(prev => prev + 1);
-          }
-          
-          if (data.type === "critic_line" && data.line) {
-            criticQueue.current.push(data.line);
-            setCriticLineCount(prev => prev + 1);
+
+          if (data.type === "batch" && Array.isArray(data.events)) {
+            data.events.forEach(handleEvent);
+          } else {
+            handleEvent(data);
           }
         } catch (e) {
           // Ignore non-JSON
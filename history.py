@@ -0,0 +1,110 @@
+from collections import deque, OrderedDict
+import threading
+import os
+
+# entries kept per run for /get_actor and /get_critic
+HISTORY_CAP = int(os.getenv("AUTOJOB_HISTORY_CAP", "500"))
+# runs kept before the oldest run's history is dropped
+HISTORY_MAX_RUNS = int(os.getenv("AUTOJOB_HISTORY_MAX_RUNS", "50"))
+# largest page a client can ask for
+MAX_PAGE = 500
+
+
+class RingLog:
+    """Fixed-size, sequence-numbered event log.
+
+    Sequence numbers keep increasing after old entries fall off the end, so a
+    reader can always ask for "everything after seq N".
+    """
+
+    def __init__(self, maxlen: int):
+        self.entries = deque(maxlen=maxlen)
+        self.next_seq = 1
+        self.lock = threading.Lock()
+
+    def append(self, event: dict) -> dict:
+        with self.lock:
+            event["seq"] = self.next_seq
+            self.next_seq += 1
+            self.entries.append(event)
+        return event
+
+    def since(self, seq: int = 0, limit: int = None) -> list[dict]:
+        with self.lock:
+            out = [e for e in self.entries if e["seq"] > seq]
+        if limit is not None:
+            out = out[:limit]
+        return out
+
+    @property
+    def last_seq(self) -> int:
+        return self.next_seq - 1
+
+
+class RingRegistry:
+    """One RingLog per run, forgetting the oldest run past max_runs."""
+
+    def __init__(self, maxlen: int, max_runs: int):
+        self.maxlen = maxlen
+        self.max_runs = max_runs
+        self.rings: OrderedDict[str, RingLog] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, run_id: str) -> RingLog:
+        with self.lock:
+            ring = self.rings.get(run_id)
+            if ring is None:
+                ring = self.rings[run_id] = RingLog(self.maxlen)
+                while len(self.rings) > self.max_runs:
+                    self.rings.popitem(last=False)
+            return ring
+
+    def find(self, run_id: str):
+        with self.lock:
+            return self.rings.get(run_id)
+
+
+
+# the run that started last; rings are created by a run's first event, which
+# can come late, so ring order doesn't say which run is newest
+_latest_run = None
+
+
+def run_started(run_id: str):
+    """Makes run_id the default for history pages without a run."""
+    global _latest_run
+    _latest_run = run_id
+
+
+def latest_run():
+    return _latest_run
+
+
+def page(registry: RingRegistry, run_id=None, since: int = 0, limit: int = 100):
+    """Returns (etag, body) for one page of a run's history.
+
+    With no run_id the most recently started run is used. The ETag only
+    depends on the run, the cursor and the ring's last seq, so it can be
+    checked before anything is copied or serialized.
+    """
+    run_id = run_id or latest_run()
+    limit = max(1, min(limit, MAX_PAGE))
+    ring = registry.find(run_id) if run_id else None
+    last_seq = ring.last_seq if ring else 0
+
+    etag = f'W/"{run_id}-{last_seq}-{since}-{limit}"'
+
+    def body():
+        items = ring.since(since, limit) if ring else []
+        return {
+            "run": run_id,
+            "items": items,
+            "next_since": items[-1]["seq"] if items else since,
+            "last_seq": last_seq,
+        }
+
+    return etag, body
+
+
+actor_history = RingRegistry(HISTORY_CAP, HISTORY_MAX_RUNS)
+critic_history = RingRegistry(HISTORY_CAP, HISTORY_MAX_RUNS)
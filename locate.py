@@ -0,0 +1,389 @@
+from collections import Counter
+import math
+import zlib
+import os
+import re
+
+import tracing
+from capture import FRAME_SEP, SHADOW_SEP, SHADOW_TAG
+
+log = tracing.get_logger("locate")
+
+# candidates handed to the actor per frame
+TOP_N = int(os.getenv("AUTOJOB_LOCATE_TOP", "8"))
+# "rank" sends the actor ranked candidates; "prune" keeps the old keyword pruning
+MODE = os.getenv("AUTOJOB_LOCATE", "rank")
+
+INTERACTIVE_TAGS = {"input", "textarea", "select", "button"}
+INTERACTIVE_ATTRS = ("contenteditable", "onclick", "tabindex")
+INTERACTIVE_ROLES = {
+    "button", "combobox", "checkbox", "radio", "option",
+    "textbox", "listbox", "switch", "menuitem", "tab",
+}
+SKIP_TYPES = {"hidden"}
+# attributes that usually survive re-renders, best first
+STABLE_ATTRS = ("data-automation-id", "data-testid", "data-test", "data-qa", "name", "aria-label")
+# ids with long digit runs or hex blobs are usually generated per render
+GENERATED_ID = re.compile(r"\d{3,}|[0-9a-f]{8}|^:r|^ember|^react-", re.I)
+SIMPLE_ID = re.compile(r"^[A-Za-z][\w-]*$")
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+TRIGRAM_WEIGHT = 2.0
+MAX_NEARBY = 150
+# options listed per <select> in the actor's view
+MAX_OPTIONS = 20
+
+
+def clean_text(text):
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def tokenize(text):
+    # split camelCase and snake_case ids too: firstName, first_name -> first name
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", text or "")
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def trigrams(text):
+    text = f"  {' '.join(tokenize(text))} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def dice(a, b):
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+def _quote(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def short_hash(text):
+    n = zlib.crc32(text.encode("utf-8"))
+    out = ""
+    for _ in range(4):
+        n, r = divmod(n, 36)
+        out += "0123456789abcdefghijklmnopqrstuvwxyz"[r]
+    return out
+
+
+class NodeMap(dict):
+    """Short node ids -> locators.
+
+    An id is a hash of its locator, so it stays the same from frame to
+    frame for as long as the element's locator does.
+    """
+
+    def add(self, locator):
+        nid = short_hash(locator)
+        # the odd collision just gets rehashed
+        while nid in self and self[nid] != locator:
+            nid = short_hash(nid + locator)
+        self[nid] = locator
+        return nid
+
+
+class Element:
+    """One interactive element: what it's called and how to find it again."""
+
+    def __init__(self, tag, locator, fields, attrs, options=None, node=None):
+        self.tag = tag
+        self.locator = locator
+        # label, aria-label, placeholder, own text, name/id, nearby text
+        self.fields = fields
+        self.attrs = attrs
+        self.options = options or []
+        # the parsed tag, for callers that need more than the summary
+        self.node = node
+        self.tokens = []
+        for name, text in fields.items():
+            # what the element is called outweighs its id and the text around it
+            weight = 1 if name in ("name", "nearby") else 2
+            self.tokens += tokenize(text) * weight
+        self.grams = [trigrams(text) for name, text in fields.items() if name != "nearby" and text]
+
+    def render(self, nid):
+        """A one-line pseudo tag with only what the actor needs."""
+        parts = [self.tag, f"@{nid}"]
+        for key, value in self.attrs.items():
+            parts.append(f'{key}="{_quote(value)}"')
+        for key in ("label", "nearby"):
+            if self.fields.get(key):
+                parts.append(f'{key}="{_quote(self.fields[key])}"')
+        line = f"<{' '.join(parts)}>"
+        if self.options:
+            line += "".join(f"<option>{o}</option>" for o in self.options[:MAX_OPTIONS]) + f"</{self.tag}>"
+        elif self.fields.get("text"):
+            line += f"{self.fields['text']}</{self.tag}>"
+        return line
+
+
+class ElementIndex:
+    """BM25 plus trigram ranking over a page's interactive elements.
+
+    Built once per frame from the page source. search() returns the
+    elements best matching the critic's keyword, each with a CSS selector
+    that is unique on the page, so the actor never sees the rest of the DOM.
+    """
+
+    def __init__(self, elements):
+        self.elements = elements
+        self.df = Counter()
+        for el in elements:
+            self.df.update(set(el.tokens))
+        self.avg_len = sum(len(el.tokens) for el in elements) / max(1, len(elements))
+
+    @classmethod
+    def from_html(cls, html):
+        from bs4 import BeautifulSoup
+
+        return cls.from_soup(BeautifulSoup(html, "html.parser"))
+
+    @classmethod
+    def from_soup(cls, soup, locators=None):
+        with tracing.span("locate_index") as sp:
+            elements = _collect(soup, locators or Locators(soup))
+            sp["elements"] = len(elements)
+        return cls(elements)
+
+    def _bm25(self, query_tokens, el):
+        if not el.tokens:
+            return 0.0
+        counts = Counter(el.tokens)
+        n = len(self.elements)
+        score = 0.0
+        for token in query_tokens:
+            tf = counts.get(token)
+            if not tf:
+                continue
+            idf = math.log(1 + (n - self.df[token] + 0.5) / (self.df[token] + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * len(el.tokens) / self.avg_len)
+            score += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return score
+
+    def search(self, query, n=TOP_N):
+        query_tokens = set(tokenize(query))
+        query_grams = trigrams(query)
+        scored = []
+        for el in self.elements:
+            fuzzy = max((dice(query_grams, g) for g in el.grams), default=0.0)
+            # a few shared trigrams (count vs country) aren't a match
+            if fuzzy < 0.4:
+                fuzzy = 0.0
+            score = self._bm25(query_tokens, el) + TRIGRAM_WEIGHT * fuzzy
+            if score > 0:
+                scored.append((score, el))
+        scored.sort(key=lambda pair: -pair[0])
+        return scored[:n]
+
+
+class Page:
+    """One parse of a captured page, for everything that reads it in a frame.
+
+    The soup, its Locators and (built on first use) its ElementIndex, so
+    dropdown autofill and the actor's view don't each parse the page.
+    """
+
+    def __init__(self, html):
+        from bs4 import BeautifulSoup
+
+        with tracing.span("parse", bytes=len(html)):
+            self.soup = BeautifulSoup(html, "html.parser")
+        self.locators = Locators(self.soup)
+        self._index = None
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = ElementIndex.from_soup(self.soup, self.locators)
+        return self._index
+
+
+def render(results, keyword):
+    """The actor's view of the top results, and the node ids it may use."""
+    nodes = NodeMap()
+    lines = [f'<!-- page elements best matching "{keyword}", most likely first -->']
+    lines += [el.render(nodes.add(el.locator)) for _, el in results]
+    return "\n".join(lines), nodes
+
+
+# ---------------------------
+# Building the index
+# ---------------------------
+
+def _interactive(el):
+    # a plain predicate is several times faster than a soupsieve selector here
+    if el.name in INTERACTIVE_TAGS or (el.name == "a" and el.has_attr("href")):
+        return True
+    if any(el.has_attr(attr) for attr in INTERACTIVE_ATTRS):
+        return True
+    role = el.get("role")
+    return isinstance(role, str) and role.lower() in INTERACTIVE_ROLES
+
+
+class Locators:
+    """Unique CSS selectors for elements of one parsed page.
+
+    Prefers a stable id, then a unique data-automation-id, data-testid, name
+    or aria-label, then an nth-of-type path up to the nearest stable ancestor.
+    On captured pages (see capture.py) selectors are unique within their own
+    frame or shadow root and are prefixed with the steps that lead there.
+    """
+
+    def __init__(self, soup):
+        from bs4 import Tag
+
+        self.by_id = {}
+        self.counts = Counter()
+        self.interactive = []
+        # element -> the iframe or shadow wrapper it lives under (None: top document)
+        self.roots = {}
+        # element -> its :nth-of-type position, where it has same-tag siblings.
+        # Taken up front so selectors stay right after the soup is pruned.
+        self.nth = {}
+
+        def children(node):
+            kids = [c for c in node.children if isinstance(c, Tag)]
+            total, seen = Counter(c.name for c in kids), Counter()
+            for c in kids:
+                seen[c.name] += 1
+                if total[c.name] > 1:
+                    self.nth[id(c)] = seen[c.name]
+            return kids
+
+        # depth-first, so interactive elements come out in document order
+        stack = [(c, None) for c in reversed(children(soup))]
+        while stack:
+            el, root = stack.pop()
+            self.roots[id(el)] = root
+            if _interactive(el):
+                self.interactive.append(el)
+            for attr in ("id",) + STABLE_ATTRS:
+                value = el.get(attr)
+                if isinstance(value, str) and value:
+                    self.counts[(id(root), attr, value)] += 1
+                    if attr == "id":
+                        self.by_id.setdefault(value, el)
+
+            child_root = el if el.name in ("iframe", "frame", SHADOW_TAG) else root
+            stack.extend((c, child_root) for c in reversed(children(el)))
+
+    def _unique(self, el, attr, value):
+        return self.counts[(id(self.roots.get(id(el))), attr, value)] == 1
+
+    def stable_id(self, el):
+        el_id = el.get("id")
+        return (
+            isinstance(el_id, str) and el_id and self._unique(el, "id", el_id)
+            and not GENERATED_ID.search(el_id)
+        )
+
+    @staticmethod
+    def id_selector(el_id):
+        return f"#{el_id}" if SIMPLE_ID.match(el_id) else f'[id="{_quote(el_id)}"]'
+
+    def css(self, el):
+        root = self.roots.get(id(el))
+        inner = self._css_in_root(el, root)
+        if root is None:
+            return inner
+        if root.name == SHADOW_TAG:
+            return self.css(root.parent) + SHADOW_SEP + inner
+        return self.css(root) + FRAME_SEP + inner
+
+    def _css_in_root(self, el, root):
+        from bs4 import Tag
+
+        if self.stable_id(el):
+            return self.id_selector(el["id"])
+        for attr in STABLE_ATTRS:
+            value = el.get(attr)
+            if isinstance(value, str) and value and self._unique(el, attr, value):
+                return f'{el.name}[{attr}="{_quote(value)}"]'
+
+        path = []
+        node = el
+        while isinstance(node, Tag) and node is not root and node.name not in ("[document]", "html"):
+            if node is not el and self.stable_id(node):
+                path.insert(0, self.id_selector(node["id"]))
+                break
+            step = node.name
+            if id(node) in self.nth:
+                step += f":nth-of-type({self.nth[id(node)]})"
+            path.insert(0, step)
+            node = node.parent
+        return " > ".join(path)
+
+
+def _collect(soup, locators):
+    by_id = locators.by_id
+
+    labels_for = {}
+    for label in soup.find_all("label"):
+        if label.get("for"):
+            labels_for.setdefault(label["for"], clean_text(label.get_text(" ")))
+
+    def label_text(el):
+        if el.get("id") in labels_for:
+            return labels_for[el["id"]]
+        wrapping = el.find_parent("label")
+        if wrapping:
+            return clean_text(wrapping.get_text(" "))
+        ids = el.get("aria-labelledby")
+        if ids:
+            return clean_text(" ".join(by_id[i].get_text(" ") for i in ids.split() if i in by_id))
+        return ""
+
+    def nearby_text(el, own):
+        # the closest ancestor with a little text of its own, e.g. a field's caption
+        node = el.parent
+        for _ in range(3):
+            if node is None or node.name == "[document]":
+                break
+            text = clean_text(node.get_text(" "))
+            if len(text) > MAX_NEARBY:
+                break
+            if text and text != own:
+                return text
+            node = node.parent
+        return ""
+
+    elements = []
+    for el in locators.interactive:
+        if el.name == "input" and (el.get("type") or "").lower() in SKIP_TYPES:
+            continue
+        if el.has_attr("disabled") or el.get("aria-hidden") == "true":
+            continue
+
+        own = clean_text(el.get_text(" "))[:80] if el.name not in ("select", "textarea") else ""
+        if not own and el.name == "input" and el.get("type") in ("submit", "button"):
+            own = el.get("value") or ""
+        fields = {
+            "label": label_text(el),
+            "aria": el.get("aria-label") or "",
+            "placeholder": el.get("placeholder") or "",
+            "text": own,
+            "name": " ".join(v for v in (el.get("name"), el.get("id")) if isinstance(v, str)),
+            "nearby": "",
+        }
+        if not any(fields[k] for k in ("label", "aria", "placeholder", "text")):
+            fields["nearby"] = nearby_text(el, own)
+        if not any(fields.values()):
+            continue
+
+        attrs = {}
+        for key in ("type", "role", "aria-expanded", "aria-haspopup", "aria-checked", "placeholder", "aria-label"):
+            value = el.get(key)
+            if isinstance(value, str) and value:
+                attrs[key] = value
+        if el.name == "input" and el.get("value"):
+            attrs["value"] = el["value"]
+
+        options = []
+        if el.name == "select":
+            options = [clean_text(o.get_text()) for o in el.find_all("option")]
+
+        elements.append(Element(el.name, locators.css(el), fields, attrs, options, el))
+    return elements
@@ -1,15 +1,9 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from pydantic import BaseModel
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import Select
-from selenium.webdriver.common import *
-from selenium.webdriver.common.keys import Keys
-from bs4 import BeautifulSoup, Tag, NavigableString
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, Response, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel, Field
+from typing import Optional, List, Literal
 from collections import deque
-import sys
+from functools import partial
 import threading
 import time
 import re
@@ -18,8 +12,27 @@ import os
 import asyncio
 from datetime import datetime, timezone
 
-from look_actions import want_actions, execute_actions
-from extraction import extract_info, safe_click
+from look_actions import want_actions, parse_plan
+from extraction import safe_click
+from browser import get_driver, exec_namespace, BULK_PROFILE
+from events import manager
+import history
+import tracing
+import checkpoints
+import stall
+import locate
+import domcompact
+import capture
+import cdp
+import consent
+import actors
+import dropdowns
+import profiles
+from profiles import DEFAULT_USER
+from datastore import get_store
+from scheduler import Scheduler, BulkJob, normalize_url, limiter
+
+log = tracing.get_logger("look")
 
 from fastapi.middleware.cors import CORSMiddleware  # Add this import
 
@@ -33,100 +46,75 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: list[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except Exception as e:
-                print(f"Failed to send to websocket: {e}")
-
-    def broadcast_sync(self, message: str):
-        """Synchronous broadcast for use in threads - creates a new event loop"""
-        for connection in self.active_connections:
-            try:
-                asyncio.run(connection.send_text(message))
-            except RuntimeError:
-                # If there's already an event loop running, use it
-                try:
-                    loop = asyncio.get_event_loop()
-                    loop.create_task(connection.send_text(message))
-                except Exception as e:
-                    print(f"Broadcast error: {e}")
-            except Exception as e:
-                print(f"Failed to send to websocket: {e}")
-
-manager = ConnectionManager()
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    # ?run=<id>&since=<seq> subscribes to one run and replays what was missed;
+    # no run means every run, like before. A client following every run
+    # resumes with ?seen=<run>:<seq>,... and, for a bulk job, ?bulk=<job id>
+    # to also replay the job's runs it saw nothing of
+    params = websocket.query_params
+    run = params.get("run")
+    try:
+        if run:
+            since = int(params.get("since") or 0)
+        else:
+            since = {}
+            for item in filter(None, (params.get("seen") or "").split(",")):
+                seen_run, seq = item.rsplit(":", 1)
+                since[seen_run] = int(seq)
+            job = bulk_scheduler.get(params["bulk"]) if params.get("bulk") else None
+            for task in job.tasks if job else []:
+                if task.run:
+                    since.setdefault(task.run, 0)
+    except ValueError:
+        await websocket.close(code=1008)
+        return
+    await manager.connect(websocket, runs=[run] if run else None, since=since)
     try:
         while True:
-            # If you don't care about messages from client, you can still
-            # keep the loop alive by reading:
             data = await websocket.receive_text()
-            # Optional: echo or handle incoming data
-            await websocket.send_text(f"You said: {data}")
+            # clients can also subscribe after connecting:
+            # {"action": "subscribe", "run": "00061", "since": 12}
+            try:
+                msg = json.loads(data)
+            except ValueError:
+                msg = None
+            if isinstance(msg, dict) and msg.get("action") == "subscribe" and msg.get("run"):
+                try:
+                    since = int(msg.get("since") or 0)
+                except (TypeError, ValueError):
+                    manager.send_personal(websocket, json.dumps({
+                        "type": "error", "detail": f"since must be an integer seq, got {msg.get('since')!r}",
+                    }))
+                    continue
+                await manager.subscribe(websocket, str(msg["run"]), since)
+                continue
+            manager.send_personal(websocket, f"You said: {data}")
     except WebSocketDisconnect:
+        pass
+    finally:
+        # whatever ended the loop, the client's sender task goes with it
         manager.disconnect(websocket)
 
 class ApplyRequest(BaseModel):
     url: str
+    # which applicant profile to fill the form with
+    user: str = DEFAULT_USER
+    # run id to pick back up from its last checkpoint (url and user then come from it);
+    # digits only (422 otherwise), since it names a directory under screenshots/
+    resume: Optional[str] = Field(None, pattern=r"^[0-9]{1,5}$")
+    # browser setup for this run; "throughput" is headless and trimmed down
+    browser: Literal["interactive", "throughput"] = "interactive"
 
-# initializes selenium driver
-options = Options()
-options.add_argument("--disable-gpu")
-options.add_argument("--disable-blink-features=AutomationControlled")
-options.add_argument("--no-sandbox")
-options.add_argument("--disable-dev-shm-usage")
-options.add_argument("--start-maximized")
-options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                    "AppleWebKit/537.36 (KHTML, like Gecko) "
-                    "Chrome/114.0.0.0 Safari/537.36")
-options.add_argument("--disable-blink-features=AutomationControlled")
-options.add_experimental_option("excludeSwitches", ["enable-automation"])
-options.add_experimental_option("useAutomationExtension", False)
-
-driver = ""
-actor_bullshit = []
-critic_bullshit = []
-actor_word = "Initializing..."
-
-def get_driver(options):
-    """Attempts to get a driver for Chrome, then Firefox, then Safari."""
-    # Try Chrome
-    try:
-        return webdriver.Chrome(options=options)
-    except Exception as e:
-        print(f"Chrome not available: {e}")
-
-    # Try Firefox
-    try:
-        options = webdriver.FirefoxOptions()
-        return webdriver.Firefox(options=options)
-    except Exception as e:
-        print(f"Firefox not available: {e}")
+class BulkApplyRequest(BaseModel):
+    urls: List[str]
+    user: str = DEFAULT_USER
+    browser: Literal["interactive", "throughput"] = BULK_PROFILE
 
-    # Try Safari (macOS only)
-    if sys.platform == "darwin":
-        try:
-            return webdriver.Safari()
-        except Exception as e:
-            print(f"Safari not available: {e}")
+URL_RE = re.compile(r"https?://[^\s,;\"'<>]+")
 
-    raise Exception("No supported browser driver found.")
+actor_word = "Initializing..."
 
 def pad_numbers(x):
     x = str(x)
@@ -135,6 +123,8 @@ def pad_numbers(x):
     return x
 
 def prune_tree_by_keyword(soup, keyword):
+    from bs4 import Tag, NavigableString
+
     keyword = keyword.lower().strip()
 
     nodes_to_delete = []
@@ -171,28 +161,75 @@ def prune_tree_by_keyword(soup, keyword):
 
     return soup
         
-def strip_code_fences(text: str) -> str:
-    text = text.strip()
-
-    if text.startswith("```"):
-        lines = text.splitlines()
-
-        # Remove first line (```python or ```)
-        lines = lines[1:]
-
-        # Remove last line if it's closing ```
-        if lines and lines[-1].strip().startswith("```"):
-            lines = lines[:-1]
-
-        return "\n".join(lines).strip()
-
-    return text
-
-def upload_file(input_element, type):
-    global driver
+# text that shows up when a site is throttling us rather than showing the form
+THROTTLE_MARKERS = (
+    "too many requests", "rate limit exceeded", "unusual traffic",
+    "are you a robot", "cf-challenge", "challenge-platform",
+)
+SUBMIT_WORDS = ("submit", "next", "continue", "apply", "save", "sign in", "log in", "create account")
+
+def looks_throttled(html):
+    lowered = html.lower()
+    return any(marker in lowered for marker in THROTTLE_MARKERS)
+
+def looks_like_submit(action, cmds):
+    """Whether this step probably sends the form to the server."""
+    action = action.lower()
+    return ".submit()" in cmds or (
+        "click" in action and any(word in action for word in SUBMIT_WORDS)
+    )
+
+def select_html(html, keyword, page=None):
+    """Parses the page and keeps only the part the actor needs for keyword.
+
+    Normally that's the few interactive elements ranked closest to keyword;
+    the keyword-pruned tree is the fallback when nothing matches. Returns
+    the text for the actor, the @node ids it may use (see find_node) and
+    the ranked (score, Element) pairs, empty when it wasn't ranked. Pass
+    the frame's locate.Page if it was already parsed; the fallback prunes
+    its soup in place.
+    """
+    page = page or locate.Page(html)
+
+    if keyword.lower().strip() == "cookies":
+        log.debug("cookie mode - using full soup")
+        # selectors come from the whole page, even for the part we send
+        compacted = domcompact.compact(page.soup, page.locators)
+        return compacted.text, compacted.nodes, []
+
+    if locate.MODE == "rank":
+        results = page.index.search(keyword)
+        if results:
+            return (*locate.render(results, keyword), results)
+        log.debug("no ranked candidates - falling back to pruning")
+
+    with tracing.span("prune", keyword=keyword) as sp:
+        compacted = domcompact.compact(prune_tree_by_keyword(page.soup, keyword), page.locators)
+        sp["bytes"] = len(compacted.text)
+
+    return compacted.text, compacted.nodes, []
+
+def find_node(node_id, driver=None, nodes=None):
+    """The live element for an @node id, switching into its iframe if it has one."""
+    node_id = node_id.lstrip("@")
+    if node_id not in nodes:
+        raise KeyError(f"unknown node id {node_id!r}")
+    return capture.find(driver, nodes[node_id])
+
+def choose_node(node_id, value, driver=None, nodes=None):
+    """Picks value in the dropdown or combobox with this @node id, in one round trip."""
+    node_id = node_id.lstrip("@")
+    if node_id not in nodes:
+        raise KeyError(f"unknown node id {node_id!r}")
+    result = dropdowns.choose(driver, nodes[node_id], value)
+    if not result["ok"]:
+        raise ValueError(f"could not choose {value!r}: {result['error']}")
+    return result["option"]
+
+def upload_file(input_element, type, driver=None):
     if type == "resume":
         abs_path = os.path.abspath("resumes/resume.pdf")
-        print(abs_path)
+        log.debug(f"uploading {abs_path}")
         input_element.send_keys(abs_path)
     if type == "cv":
         abs_path = os.path.abspath("cvs/cv.pdf")
@@ -209,186 +246,496 @@ def upload_file(input_element, type):
             
         pass
 
+@app.get("/metrics")
+def get_metrics():
+    """Per-stage timing histograms in Prometheus text format."""
+    return PlainTextResponse(tracing.metrics.render())
+
+@app.get("/actor_tiers")
+def get_actor_tiers():
+    """How often each actor tier answered, and how often its code ran cleanly."""
+    return actors.router.status()
+
+@app.get("/rate_limits")
+def get_rate_limits():
+    """Current backoff factor, load time and error rate per domain."""
+    return limiter.status()
+
 @app.get("/similar")
 async def get_similar():
     """Returns the current actor_word for the neural graph."""
     global actor_word
-    await manager.broadcast(actor_word)
+    await manager.broadcast(actor_word, coalesce_key="actor_word")
     return {"status": "sent"}
 
+def history_response(registry, request, run, since, limit):
+    etag, body = history.page(registry, run, since, limit)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(body(), headers={"ETag": etag})
+
 @app.get("/get_actor")
-def get_actor():
-    global actor_bullshit
-    return actor_bullshit
+def get_actor(request: Request, run: Optional[str] = None, since: int = 0, limit: int = 100):
+    """Actor lines for a run (latest run by default), paged with ?since=<seq>."""
+    return history_response(history.actor_history, request, run, since, limit)
 
 @app.get("/get_critic")
-def get_critic():
-    global critic_bullshit
-    return critic_bullshit
+def get_critic(request: Request, run: Optional[str] = None, since: int = 0, limit: int = 100):
+    """Selenium lines for a run (latest run by default), paged with ?since=<seq>."""
+    return history_response(history.critic_history, request, run, since, limit)
+
+@app.post("/save_profile")
+def save_profile(profile: profiles.Profile, user: str = DEFAULT_USER):
+    """Validates and stores an applicant profile; runs pick it up immediately."""
+    try:
+        profiles.store.save(user, profile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "ok", "user": user}
+
+@app.get("/profile")
+def get_profile(user: str = DEFAULT_USER):
+    try:
+        return profiles.store.get(user).data
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=404, detail=f"no profile for user {user!r}: {e}")
+
+@app.get("/profiles")
+def list_profiles():
+    return {"users": profiles.store.users()}
 
 @app.post("/apply")
 def apply(req: ApplyRequest):
-    url = req.url
-    t = threading.Thread(target=startApp, args=(url,))
-    t.daemon = True
-    t.start()
+    url, user, checkpoint = req.url, req.user, None
+    if req.resume:
+        checkpoint = checkpoints.load(pad_numbers(req.resume))
+        if checkpoint is None:
+            raise HTTPException(status_code=404, detail=f"no checkpoint for run {req.resume!r}")
+        url, user = checkpoint["start_url"], checkpoint["user"]
+
+    try:
+        profiles.store.get(user)
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=404, detail=f"no profile for user {user!r}: {e}")
+
+    # a resumed run keeps its number, so its screenshots and events carry on where they stopped
+    run_number = int(req.resume) if checkpoint else next_run_number()
+    # ...which two workers can't share
+    if not claim_run(run_number):
+        raise HTTPException(status_code=409, detail=f"run {pad_numbers(run_number)} is still running")
+    try:
+        # recorded like a bulk task, so bulk jobs don't apply to this url again
+        application_id = get_store().add_applications(applicant_id_for(user), [{"url": normalize_url(url), "status": "running"}])[0]
+        t = threading.Thread(target=run_single, args=(url, run_number, user, application_id),
+                             kwargs={"checkpoint": checkpoint, "browser": req.browser})
+        t.daemon = True
+        t.start()
+    except Exception:
+        release_run(run_number)
+        raise
 
     # instantly returns something
     return {
         "status": "ok",
         "message": "job started",
-        "url": req.url
+        "url": url,
+        "run": pad_numbers(run_number),
+        "resumed_at_frame": checkpoint["frame_number"] if checkpoint else None
     }
 
-def startApp(url):
-    global driver
-    global actor_bullshit
-    global critic_bullshit
-    global actor_word
-    driver = get_driver(options)
+def applicant_id_for(user):
+    """The datastore applicant matching a profile, created on first use."""
+    profile = profiles.get_profile(user)
+    legal = profile["personal_information"]["legal_name"]
+    name = f"{legal['first_name']} {legal['last_name']}".strip() or user
+    email = profile["contact_information"]["email"] or f"{user}@localhost"
+    return get_store().upsert_applicant(name, email)
+
+def run_single(url, run_number, user, application_id, **kwargs):
+    """startApp for /apply, recording how it went against its application."""
+    status = "failed"
+    try:
+        status = startApp(url, run_number, user, **kwargs)
+    except Exception as e:
+        log.error(f"run failed to start: {type(e).__name__}: {e}", exc_info=True)
+    finally:
+        release_run(run_number)
+        get_store().add_result(application_id, status, {"run": pad_numbers(run_number)})
+    return status
+
+def publish_bulk_progress(job):
+    progress = job.progress()
+    progress.pop("tasks")
+    manager.publish(f"bulk-{job.id}", {"type": "bulk_progress", **progress}, coalesce=True)
+
+def run_bulk_task(task):
+    run_number = next_run_number()
+    claim_run(run_number)
+    task.run = pad_numbers(run_number)
+    publish_bulk_progress(task.job)
+
+    # startApp can raise before its run starts (no browser driver, say); the
+    # row still has to leave "queued" or applied_urls would skip it for good
+    status = "failed"
+    try:
+        status = startApp(task.url, run_number, task.job.user, interactive=False, browser=task.job.browser)
+    except Exception as e:
+        log.error(f"bulk run failed to start: {type(e).__name__}: {e}", exc_info=True)
+    finally:
+        release_run(run_number)
+        # the scheduler sets the final status once we return
+        task.status = status
+        get_store().add_result(task.application_id, status, {"run": task.run})
+        publish_bulk_progress(task.job)
+    return status
+
+bulk_scheduler = Scheduler(run_bulk_task)
+
+def start_bulk(urls, user, browser=BULK_PROFILE):
+    try:
+        profiles.store.get(user)
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=404, detail=f"no profile for user {user!r}: {e}")
+
+    unique, seen = [], set()
+    for url in urls:
+        url = normalize_url(url)
+        if url.startswith(("http://", "https://")) and url not in seen:
+            seen.add(url)
+            unique.append(url)
+    if not unique:
+        raise HTTPException(status_code=400, detail="no job URLs found")
+
+    store = get_store()
+    applicant_id = applicant_id_for(user)
+    already = store.applied_urls(applicant_id, unique)
+
+    job = BulkJob(user, [u for u in unique if u not in already], skipped=sorted(already), browser=browser)
+    ids = store.add_applications(applicant_id, [{"url": t.url, "status": "queued"} for t in job.tasks])
+    for task, application_id in zip(job.tasks, ids):
+        task.application_id = application_id
+
+    bulk_scheduler.submit(job)
+    publish_bulk_progress(job)
+
+    progress = job.progress()
+    # duplicates within the request and anything that isn't an http(s) URL
+    progress["ignored"] = len(urls) - len(unique)
+    return progress
+
+@app.post("/apply_bulk")
+def apply_bulk(req: BulkApplyRequest):
+    """Queues many postings at once, skipping ones this user already applied to."""
+    return start_bulk(req.urls, req.user, req.browser)
+
+@app.post("/apply_bulk/upload")
+async def apply_bulk_upload(request: Request, user: str = DEFAULT_USER,
+                            browser: Literal["interactive", "throughput"] = BULK_PROFILE):
+    """Same as /apply_bulk, but takes a pasted or uploaded text/CSV body of URLs."""
+    text = (await request.body()).decode("utf-8", errors="ignore")
+    return await asyncio.to_thread(start_bulk, URL_RE.findall(text), user, browser)
+
+@app.get("/apply_bulk/{job_id}")
+def bulk_progress(job_id: str):
+    job = bulk_scheduler.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="unknown bulk job")
+    return job.progress()
+
+run_number_lock = threading.Lock()
+
+def next_run_number():
+    """Reserves the next screenshots/run_XXXXX folder number."""
+    with run_number_lock:
+        with open("./screenshots/run_number.txt", "r") as f:
+            run_number = int(f.read())
+
+        with open("./screenshots/run_number.txt", "w") as f:
+            f.write(str(run_number + 1))
 
-    run_number = 0
+    return run_number
 
-    print("HELLO")
+# run numbers with a worker thread on them right now
+active_runs = set()
+active_runs_lock = threading.Lock()
 
-    with open("./screenshots/run_number.txt", "r") as f:
-        run_number = int(f.read())
+def claim_run(run_number):
+    """Marks a run as having a worker; False if it already has one."""
+    with active_runs_lock:
+        if run_number in active_runs:
+            return False
+        active_runs.add(run_number)
+        return True
 
-    with open("./screenshots/run_number.txt", "w") as f:
-            f.write(str(run_number + 1))
+def release_run(run_number):
+    with active_runs_lock:
+        active_runs.discard(run_number)
 
-    os.makedirs(f"./screenshots/run_{pad_numbers(run_number)}")
+def startApp(url, run_number, user=DEFAULT_USER, interactive=True, checkpoint=None, browser="interactive"):
+    """Runs one application and returns "done", "incomplete", "stalled" or "failed".
 
-    try:
-        print(f"Opening {url}")
-        driver.get(url)
+    "stalled" means the run gave up early after making no progress.
+    Interactive runs leave the browser open for the user afterwards; bulk
+    runs close it so the next job can have the slot. Given a checkpoint,
+    the run restores that browser session and continues from its frame.
+    browser is the profile from browser.PROFILES to launch.
+    """
+    run_id = pad_numbers(run_number)
+
+    with tracing.bind(run=run_id):
+        log.info("starting run", extra={"fields": {"url": url}})
+
+        with tracing.span("driver_start", profile=browser):
+            driver = get_driver(profile=browser)
+
+        os.makedirs(f"./screenshots/run_{pad_numbers(run_number)}", exist_ok=checkpoint is not None)
 
-        WebDriverWait(driver, timeout=15).until(
-            lambda d: d.execute_script("return document.readyState") == "complete"
-        )
+        try:
+            status = run_loop(driver, url, run_number, user, checkpoint)
+        except Exception as e:
+            log.error(f"run failed: {type(e).__name__}: {e}", exc_info=True)
+            status = "failed"
+
+        if interactive:
+            log.info("Done. User free to roam.")
+            time.sleep(60)
+        else:
+            driver.quit()
+
+        return status
+
+def run_loop(driver, url, run_number, user=DEFAULT_USER, checkpoint=None):
+    global actor_word
 
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.common.action_chains import ActionChains
+    from selenium.webdriver.common.keys import Keys
+
+    run_id = pad_numbers(run_number)
+    history.run_started(run_id)
+    page_url = checkpoint["url"] if checkpoint else url
+
+    # politeness: one token per page load on this domain
+    limiter.acquire(page_url)
+    load_start = time.perf_counter()
+    try:
+        with tracing.span("page_load", url=page_url, resumed=checkpoint is not None):
+            if checkpoint:
+                checkpoints.restore(driver, checkpoint)
+            else:
+                driver.get(url)
+
+                WebDriverWait(driver, timeout=15).until(
+                    lambda d: d.execute_script("return document.readyState") == "complete"
+                )
+                if cdp.active(driver):
+                    # SPAs keep fetching the form after readyState says complete
+                    cdp.wait_network_idle(driver)
+    except Exception:
+        limiter.report(page_url, error=True)
+        raise
+    limiter.report(page_url, load_ms=(time.perf_counter() - load_start) * 1000)
+
+    # most banners are up by now; clearing them here saves the first frames
+    consent.dismiss(driver)
+
+    if checkpoint:
+        log.info(f"resuming from frame {checkpoint['frame_number']}")
+        frame_number = checkpoint["frame_number"]
+        past_commands = checkpoint["past_commands"]
+        past_wants = deque(checkpoint["past_wants"])
+        # keywords of fields the actor has already filled without an error
+        filled = set(checkpoint["filled"])
+    else:
         frame_number = 0
         past_commands = ""
         past_wants = deque()
+        filled = set()
+
+    detector = stall.StallDetector()
+    # dropdowns answered from the profile (or tried and left to the critic)
+    autofilled = set()
+
+    while frame_number < stall.MAX_FRAMES:
+        with tracing.bind(frame=frame_number), tracing.span("frame"):
+            log.debug(f"=== FRAME {frame_number} ===")
+
+            if checkpoints.EVERY and frame_number % checkpoints.EVERY == 0:
+                try:
+                    checkpoints.save(driver, run_id, {
+                        "start_url": url,
+                        "user": user,
+                        "frame_number": frame_number,
+                        "past_commands": past_commands,
+                        "past_wants": list(past_wants),
+                        "filled": sorted(filled),
+                    })
+                except Exception as e:
+                    log.warning(f"checkpoint failed: {type(e).__name__}: {e}")
+
+            # one script call for the page plus its iframes and shadow roots
+            html = capture.page_source(driver)
+            # late banners, and ones that came back after a navigation
+            if consent.likely(html) and consent.dismiss(driver):
+                html = capture.page_source(driver)
+
+            if looks_throttled(html):
+                log.warning("page looks throttled or CAPTCHA-gated")
+                limiter.report(driver.current_url, error=True)
+
+            # escalate before spending a critic call on a page that isn't moving
+            hint = ""
+            step = detector.observe(*stall.form_state(driver, html))
+            if step == "abort":
+                log.warning("no progress after every escalation - giving up")
+                return "stalled"
+            elif step == "scroll":
+                driver.execute_script("window.scrollBy(0, 1000);")
+                frame_number += 1
+                continue
+            elif step == "reset":
+                # close whatever dropdown or popup has focus and start again from the top
+                ActionChains(driver).send_keys(Keys.ESCAPE).perform()
+                driver.execute_script("document.activeElement && document.activeElement.blur(); window.scrollTo(0, 0);")
+                frame_number += 1
+                continue
+            elif step == "nudge":
+                hint = ("Your recent actions have not changed the page at all. "
+                        "Do not repeat them; pick a different element or a different way of filling it in. ")
+                if past_wants:
+                    hint += f"The action that keeps failing is: {past_wants[-1]} "
+
+            # dropdowns the profile can answer don't need the models at all
+            # parsed once per frame, here or by select_html, and shared
+            page = None
+            if dropdowns.AUTOFILL and ("<select" in html or 'role="combobox"' in html):
+                try:
+                    page = locate.Page(html)
+                    index = page.index
+                    profile = profiles.get_profile(user)
+                    for el in dropdowns.fill_selects(driver, index, profile, autofilled):
+                        autofilled.add(el.locator)
+                        filled.add(el.fields["label"] or el.locator)
+                    for el in dropdowns.fill_comboboxes(driver, index, profile, autofilled):
+                        autofilled.add(el.locator)
+                except Exception as e:
+                    log.warning(f"filling dropdowns failed: {type(e).__name__}: {e}")
+                    driver.switch_to.default_content()
 
-        while frame_number < 100:
-            print(f"\n{'='*60}")
-            print(f"[DEBUG] === FRAME {frame_number} ===")
-            print(f"{'='*60}")
-            
             screenshot_path = f"./screenshots/run_{pad_numbers(run_number)}/current_{pad_numbers(frame_number)}.png"
-            print(f"[DEBUG] Saving screenshot to: {screenshot_path}")
-            driver.save_screenshot(screenshot_path)
-            
-            print(f"[DEBUG] Calling want_actions (Critic)...")
-            print(f"[DEBUG] Past wants: {list(past_wants)}")
-            gb = want_actions(screenshot_path, past_wants)
+            with tracing.span("screenshot") as sp:
+                capture.screenshot(driver, screenshot_path)
+                sp["bytes"] = os.path.getsize(screenshot_path)
 
-            print(f"[DEBUG] Critic raw response:\n---\n{gb}\n---")
-            html = driver.page_source
-            print(f"[DEBUG] Page source length: {len(html)} chars")
+            log.debug("calling critic", extra={"fields": {"past_wants": list(past_wants)}})
+            gb = want_actions(screenshot_path, past_wants, user, hint)
+            log.debug("critic response", extra={"fields": {"response": gb}})
 
             if gb == "Done":
-                print(f"[DEBUG] Critic returned 'Done' - application complete!")
-                break
+                log.info("critic returned Done - application complete")
+                return "done"
             elif gb == "Scroll":
-                print(f"[DEBUG] Critic returned 'Scroll' - scrolling page...")
+                log.debug("critic returned Scroll - scrolling page")
+                detector.want(gb)
                 driver.execute_script("window.scrollBy(0, 1000);")
             else:
-                print(f"[DEBUG] Critic returned action - parsing...")
-                gb = gb.split("\n")
-                gb[:] = [item for item in gb if item != '']
-                print(f"[DEBUG] Parsed lines ({len(gb)} total): {gb}")
-                
-                if len(gb) < 2:
-                    print(f"[WARN] Expected 2 lines (action + keyword), got {len(gb)}. Raw: {gb}")
+                plan = parse_plan(gb)
+                if not plan:
+                    log.warning("expected action + keyword lines", extra={"fields": {"lines": gb.split("\n")}})
                     frame_number += 1
                     continue
+                log.debug(f"critic planned {len(plan)} action(s)")
+                tracing.metrics.incr("plan_actions_total", len(plan))
 
-                past_commands = gb[0]
-                keywords = gb[1]
-                
-                print(f"[DEBUG] Action requested: '{past_commands}'")
-                print(f"[DEBUG] Keyword to search: '{keywords}'")
+                # the batch runs back to back; the next screenshot comes after it, or after the first failure
+                for step, (past_commands, keywords) in enumerate(plan):
+                    if step > 0:
+                        # the frame's capture is stale once the first action ran
+                        html = capture.page_source(driver)
+                        page = None
+                    detector.want(past_commands)
 
-                actor_bullshit.append((datetime.now(timezone.utc).isoformat(), past_commands))
-                
-                # Broadcast the new actor line (critic's action request) to terminals
-                try:
-                    manager.broadcast_sync(json.dumps({
-                        "type": "actor_line", 
-                        "ts": datetime.now(timezone.utc).isoformat(), 
+                    log.debug("action requested", extra={"fields": {"action": past_commands, "keyword": keywords, "step": step}})
+
+                    history.actor_history.get(run_id).append({
+                        "ts": datetime.now(timezone.utc).isoformat(),
                         "text": past_commands
-                    }))
-                except Exception as e:
-                    print(f"[ERROR] WebSocket actor_line broadcast failed: {e}")
-
-                past_wants.append(past_commands)
-                if len(past_wants) > 10:
-                    past_wants.popleft()
-
-                soup = BeautifulSoup(html, "html.parser")
-                print(f"[DEBUG] Pruning HTML tree by keyword: '{keywords}'")
-                pruned_soup = prune_tree_by_keyword(soup, keywords)
-
-                if keywords.lower().strip() == "cookies":
-                    print(f"[DEBUG] Cookie mode - using full soup")
-                    pruned_soup = soup
-                
-                pruned_html = str(pruned_soup)
-                print(f"[DEBUG] Pruned HTML length: {len(pruned_html)} chars")
-                
-                with open(f"./screenshots/run_{pad_numbers(run_number)}/current_{pad_numbers(frame_number)}_soup.txt", "w", encoding="utf-8") as f:
-                    f.write(pruned_html)
-
-                print(f"[DEBUG] Calling execute_actions (Actor)...")
-                actor_response = strip_code_fences(execute_actions(pruned_html, past_commands))
-                print(f"[DEBUG] Actor raw response:\n---\n{actor_response}\n---")
-                
-                actor_response = actor_response.split("\n")
-                if len(actor_response) < 2:
-                    print(f"[WARN] Actor response has < 2 lines. Skipping execution.")
-                    frame_number += 1
-                    continue
-                    
-                actor_word, cmds = actor_response[0], "\n".join(actor_response[1:])
-                print(f"[DEBUG] Actor word: '{actor_word}'")
-                print(f"[DEBUG] Generated Selenium commands ({len(cmds)} chars):")
-                for i, line in enumerate(cmds.split("\n")):
-                    print(f"  [{i}] {line}")
-
-                # Broadcast the actor_word to all connected WebSocket clients
-                try:
-                    manager.broadcast_sync(json.dumps({"type": "actor_word", "word": actor_word}))
-                    print(f"[DEBUG] WebSocket broadcast sent: {actor_word}")
-                except Exception as e:
-                    print(f"[ERROR] WebSocket broadcast failed: {e}")
+                    })
 
-                for cmd in cmds.split("\n"):
-                    critic_bullshit.append(cmd)
-                    # Broadcast each critic line (selenium command) to terminals
+                    # Broadcast the new actor line (critic's action request) to terminals
                     try:
-                        manager.broadcast_sync(json.dumps({"type": "critic_line", "line": cmd}))
+                        manager.publish(run_id, {
+                            "type": "actor_line",
+                            "ts": datetime.now(timezone.utc).isoformat(),
+                            "text": past_commands
+                        })
                     except Exception as e:
-                        print(f"[ERROR] WebSocket critic_line broadcast failed: {e}")
-
-                print(f"[DEBUG] Executing Selenium commands...")
-                try:
-                    exec(cmds)
-                    print(f"[DEBUG] Execution completed successfully")
-                except Exception as e:
-                    print(f"[ERROR] Execution failed: {type(e).__name__}: {e}")
-                    import traceback
-                    traceback.print_exc()
+                        log.error(f"WebSocket actor_line broadcast failed: {e}")
+
+                    past_wants.append(past_commands)
+                    if len(past_wants) > 10:
+                        past_wants.popleft()
+
+                    # a popup the consent detector knows needs no actor call or full-page prompt
+                    if keywords.lower().strip() == "cookies" and consent.dismiss(driver):
+                        continue
+
+                    pruned_html, nodes, ranked = select_html(html, keywords, page)
+
+                    soup_path = f"./screenshots/run_{pad_numbers(run_number)}/current_{pad_numbers(frame_number)}"
+                    with open(soup_path + (f"_{step}" if step else "") + "_soup.txt", "w", encoding="utf-8") as f:
+                        f.write(pruned_html)
+
+                    # templates, then the local model, then the remote one; a tier whose code fails hands over to the next
+                    done = submit_token = False
+                    for answer in actors.router.answers(past_commands, keywords, pruned_html, ranked, nodes, user):
+                        actor_word, cmds = answer.word, answer.code
+                        log.debug("actor answer", extra={"fields": {"tier": answer.tier, "code": cmds}})
+
+                        # Broadcast the actor_word to all connected WebSocket clients
+                        try:
+                            manager.publish(run_id, {"type": "actor_word", "word": actor_word}, coalesce=True)
+                        except Exception as e:
+                            log.error(f"WebSocket broadcast failed: {e}")
+
+                        for cmd in cmds.split("\n"):
+                            history.critic_history.get(run_id).append({"line": cmd})
+                            # Broadcast each critic line (selenium command) to terminals
+                            try:
+                                manager.publish(run_id, {"type": "critic_line", "line": cmd})
+                            except Exception as e:
+                                log.error(f"WebSocket critic_line broadcast failed: {e}")
+
+                        # one submit token per planned step, however many tiers try it
+                        if not submit_token and looks_like_submit(past_commands, cmds):
+                            limiter.acquire(driver.current_url, "submit")
+                            submit_token = True
+
+                        try:
+                            with tracing.span("exec", lines=len(cmds.split("\n")), tier=answer.tier):
+                                exec(cmds, exec_namespace(driver, upload_file=partial(upload_file, driver=driver), safe_click=safe_click,
+                                                            node=partial(find_node, driver=driver, nodes=nodes),
+                                                            choose=partial(choose_node, driver=driver, nodes=nodes)))
+                            limiter.report(driver.current_url)
+                            actors.router.record(answer, True)
+                            filled.add(keywords)
+                            done = True
+                            break
+                        except Exception as e:
+                            # bad generated code or a stale locator says nothing about the domain,
+                            # so it isn't reported to the limiter
+                            log.error(f"execution failed ({answer.tier}): {type(e).__name__}: {e}", exc_info=True)
+                            actors.router.record(answer, False)
+
+                    if not done:
+                        if step + 1 < len(plan):
+                            log.info(f"dropping the remaining {len(plan) - step - 1} planned action(s)")
+                            tracing.metrics.incr("plan_actions_dropped_total", len(plan) - step - 1)
+                        break
 
             frame_number += 1
-        
-        print("Done. User free to roam.")
 
-        time.sleep(60)
-        
-    except Exception as e:
-        print(e)
+    return "incomplete"
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,17 +1,51 @@
+from functools import lru_cache
+from collections import Counter
+import asyncio
 import os
-from dotenv import load_dotenv
-from moorcheh_sdk import MoorchehClient
+import re
 import base64
-from openai import OpenAI
 import random
 
-load_dotenv()
+import tracing
+from profiles import DEFAULT_USER, get_profile_prompt
 
-api = os.getenv("OPENAI_API_KEY")
-moor_api = os.getenv("api_key")
-client = OpenAI()
-moor_client = MoorchehClient(api_key=moor_api)
-profile = open("info.json", "r", encoding="utf-8").read()
+log = tracing.get_logger("look_actions")
+
+CRITIC_MODEL = "gpt-4.1-mini"
+# critic calls per frame; above 1 they run concurrently and vote
+CRITIC_ENSEMBLE = int(os.getenv("AUTOJOB_CRITIC_ENSEMBLE", "1"))
+# matching answers needed to accept before the rest are back
+CRITIC_QUORUM = int(os.getenv("AUTOJOB_CRITIC_QUORUM", "2"))
+# most actions the critic may plan from one screenshot; 1 is the classic one-action frame
+PLAN_BATCH = int(os.getenv("AUTOJOB_PLAN_BATCH", "1"))
+# (press_enter, suggest_scroll, temperature) per ensemble member, steadiest first
+CRITIC_VARIANTS = [
+    (False, False, None),
+    (True, False, None),
+    (False, False, 0.7),
+    (True, False, 0.7),
+    (False, True, 1.0),
+]
+
+# The API clients are created on first use, so importing this module never
+# needs credentials or the network SDKs.
+
+@lru_cache(maxsize=None)
+def load_env():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+@lru_cache(maxsize=None)
+def get_client():
+    from openai import OpenAI
+    load_env()
+    return OpenAI()
+
+@lru_cache(maxsize=None)
+def get_moor_client():
+    from moorcheh_sdk import MoorchehClient
+    load_env()
+    return MoorchehClient(api_key=os.getenv("api_key"))
 
 def encode_image(path):
     with open(path, "rb") as f:
@@ -26,13 +60,8 @@ def sanitize(text: str) -> str:
 
 # alternate between wanting and executing
 
-def want_actions(screenshot, past_wants=[]):
-    print(f"[CRITIC] Starting want_actions...")
-    print(f"[CRITIC] Screenshot: {screenshot}")
-    print(f"[CRITIC] Past wants count: {len(past_wants)}")
-
-    image_b64 = encode_image(screenshot)
-
+def build_critic_prompt(past_wants=[], user=DEFAULT_USER, hint="", press_enter=None, suggest_scroll=None,
+                        max_actions=PLAN_BATCH):
     prompt = """You are the critic, an clever agent that finds the next best action to navigate a job application website.
     Take a deep breath and think about this problem step by step. 
     Below, I've sent a screenshot with all the important parts of this website. 
@@ -70,47 +99,201 @@ def want_actions(screenshot, past_wants=[]):
         prompt += "Here is a list of the past 10 actions you wanted to do. If you ever seem to be trying to do the same action over and over again, try something else. \
             Instead of just asking to click on the input, you might consider asking to click on the input AND typing, or asking to click on the input AND typing AND pressing Enter in sequence." + '\n'.join(past_wants)
 
-    prompt += "This is the profile of the applicant. Be sure to be constantly refer back to the profile while filling the form. If there is any missing information, fill it with a generic educated guess." + profile
+    prompt += "This is the profile of the applicant. Be sure to be constantly refer back to the profile while filling the form. If there is any missing information, fill it with a generic educated guess." + get_profile_prompt(user)
 
-    if random.randint(1, 2) == 2:
+    if hint:
+        prompt += hint
+
+    if max_actions > 1:
+        prompt += f"""BATCH MODE (this overrides the two-line rule above): plan up to {max_actions} actions at once,
+    covering the fields you can see in this screenshot from top to bottom. Write them as pairs of lines: an action sentence,
+    then its keyword on the next line, then the next action sentence and its keyword, and so on, with nothing else.
+    Only plan actions that don't depend on seeing the result of an earlier one; an action that opens a dropdown or
+    a new page must be the last one. Done and Scroll are still a single line on their own. """
+
+    # left as None, the extra nudges are a coin toss like they always were
+    if press_enter is None:
+        press_enter = random.randint(1, 2) == 2
+    if suggest_scroll is None:
+        suggest_scroll = random.randint(1, 10) == 10
+
+    if press_enter:
         prompt += "This time, make sure to ask specifically to press Enter at the end of your action."
 
-    if random.randint(1, 10) == 10:
+    if suggest_scroll:
         prompt += "If you look at your past actions and realize that you've been trying the same thing for a while, try scrolling down."
 
-    print(f"[CRITIC] Sending request to GPT-4.1-mini...")
-    print(f"[CRITIC] Prompt length: {len(prompt)} chars")
-    
-    response = client.responses.create(
-        model="gpt-4.1-mini",
-        input=[{
-            "role": "user",
-            "content": [
-                {"type": "input_text", "text": prompt},
-                {
-                    "type": "input_image",
-                    "image_url": f"data:image/png;base64,{image_b64}"
-                }
-            ]
-        }]
-    )
+    return prompt
+
+def _critic_input(prompt, image_b64):
+    return [{
+        "role": "user",
+        "content": [
+            {"type": "input_text", "text": prompt},
+            {
+                "type": "input_image",
+                "image_url": f"data:image/png;base64,{image_b64}"
+            }
+        ]
+    }]
+
+def _record_critic_usage(sp, response):
+    sp["response_chars"] = len(response.output_text)
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        sp["input_tokens"] = getattr(usage, "input_tokens", None)
+        sp["output_tokens"] = getattr(usage, "output_tokens", None)
+        tracing.metrics.incr("critic_input_tokens_total", sp["input_tokens"] or 0)
+        tracing.metrics.incr("critic_output_tokens_total", sp["output_tokens"] or 0)
 
-    output = response.output_text
-    print(f"[CRITIC] Response received - length: {len(output)} chars")
-    print(f"[CRITIC] Response content: {output[:200]}..." if len(output) > 200 else f"[CRITIC] Response content: {output}")
+def want_actions(screenshot, past_wants=[], user=DEFAULT_USER, hint=""):
+    image_b64 = encode_image(screenshot)
+    if CRITIC_ENSEMBLE > 1:
+        return want_actions_ensemble(image_b64, past_wants, user, hint)
+
+    prompt = build_critic_prompt(past_wants, user, hint)
+
+    with tracing.span("critic_call", model=CRITIC_MODEL, prompt_chars=len(prompt), image_b64_bytes=len(image_b64)) as sp:
+        response = get_client().responses.create(
+            model=CRITIC_MODEL,
+            input=_critic_input(prompt, image_b64)
+        )
+
+        output = response.output_text
+        _record_critic_usage(sp, response)
+
+    log.debug("critic response received", extra={"fields": {"preview": output[:200]}})
 
     return output
 
+def parse_plan(output, limit=PLAN_BATCH):
+    """The critic's (action, keyword) pairs, in order, at most limit of them.
+
+    A dangling last line (a cut-off answer) is dropped.
+    """
+    lines = [line.strip() for line in output.split("\n") if line.strip()]
+    return list(zip(lines[0::2], lines[1::2]))[:max(limit, 1)]
+
+def critic_vote(output):
+    """What an answer votes for: Done, Scroll, or the element it wants to act on.
+
+    The action sentences of two agreeing answers rarely match word for
+    word, so answers agree when they name the same target.
+    """
+    lines = [line.strip() for line in output.split("\n") if line.strip()]
+    if not lines:
+        return ""
+    if len(lines) == 1:
+        return lines[0].strip(".").lower()
+    return re.sub(r"[^a-z0-9 ]+", "", lines[1].lower()).strip()
+
+async def _critic_call_async(client, prompt, image_b64, variant):
+    kwargs = {} if variant[2] is None else {"temperature": variant[2]}
+    with tracing.span("critic_call", model=CRITIC_MODEL, prompt_chars=len(prompt), variant=variant) as sp:
+        response = await client.responses.create(
+            model=CRITIC_MODEL,
+            input=_critic_input(prompt, image_b64),
+            **kwargs
+        )
+        _record_critic_usage(sp, response)
+    return response.output_text
+
+async def _run_ensemble(call, prompts, quorum):
+    """Runs call(prompt, variant) for every (prompt, variant) and stops at quorum.
+
+    Returns (winner or None, [(vote, output)] in arrival order, errors,
+    number of calls cancelled).
+    """
+    tasks = [asyncio.create_task(call(prompt, variant)) for prompt, variant in prompts]
+    votes, answers, errors, winner = Counter(), [], [], None
+    for finished in asyncio.as_completed(tasks):
+        try:
+            output = await finished
+        except Exception as e:
+            errors.append(e)
+            continue
+        vote = critic_vote(output)
+        votes[vote] += 1
+        answers.append((vote, output))
+        if votes[vote] >= quorum:
+            winner = output
+            break
+
+    # the HTTP requests behind these are aborted, not just ignored
+    pending = [t for t in tasks if not t.done()]
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    return winner, answers, errors, len(pending)
+
+def want_actions_ensemble(image_b64, past_wants=[], user=DEFAULT_USER, hint="", n=None, quorum=None):
+    """Asks CRITIC_ENSEMBLE critics at once and takes the first answer a quorum agrees on.
+
+    Each member gets a different prompt variant or temperature. Whatever is
+    still running once the quorum is reached is cancelled. Without a
+    quorum the most common answer wins, the earliest one on a tie.
+    """
+    from openai import AsyncOpenAI
+
+    n = n or CRITIC_ENSEMBLE
+    quorum = min(quorum or CRITIC_QUORUM, n)
+    variants = [CRITIC_VARIANTS[i % len(CRITIC_VARIANTS)] for i in range(n)]
+    prompts = [(build_critic_prompt(past_wants, user, hint, press_enter=v[0], suggest_scroll=v[1]), v) for v in variants]
+
+    async def run():
+        load_env()
+        async with AsyncOpenAI() as client:
+            async def call(prompt, variant):
+                return await _critic_call_async(client, prompt, image_b64, variant)
+            return await _run_ensemble(call, prompts, quorum)
+
+    with tracing.span("critic_ensemble", n=n, quorum=quorum) as sp:
+        winner, answers, errors, cancelled = asyncio.run(run())
+        if not answers:
+            raise errors[0]
+
+        reached = winner is not None
+        # short-circuited: accepted while some members were still thinking
+        early = reached and cancelled > 0
+        if not reached:
+            counts = Counter(vote for vote, _ in answers)
+            top = max(counts.values())
+            winner = next(output for vote, output in answers if counts[vote] == top)
+        sp.update(answered=len(answers), failed=len(errors), cancelled=cancelled,
+                  quorum_reached=reached, early=early)
+
+    tracing.metrics.incr("critic_ensemble_total")
+    tracing.metrics.incr("critic_ensemble_cancelled_total", cancelled)
+    tracing.metrics.incr("critic_quorum_reached_total" if reached else "critic_quorum_missed_total")
+    if early:
+        tracing.metrics.incr("critic_quorum_early_total")
+
+    log.debug("critic ensemble settled", extra={"fields": {
+        "votes": [vote for vote, _ in answers], "cancelled": cancelled, "early": early,
+    }})
+    return winner
+
 
     
-# takes a screenshot path
-def execute_actions(html_body, past_command=""):
-    print(f"[ACTOR] Starting execute_actions...")
-    print(f"[ACTOR] Past command: '{past_command}'")
-    print(f"[ACTOR] HTML body length: {len(html_body)} chars")
-    html_body = sanitize(html_body)
-    print(f"[ACTOR] Sanitized HTML length: {len(html_body)} chars")
+def strip_code_fences(text: str) -> str:
+    text = text.strip()
+
+    if text.startswith("```"):
+        lines = text.splitlines()
+
+        # Remove first line (```python or ```)
+        lines = lines[1:]
+
+        # Remove last line if it's closing ```
+        if lines and lines[-1].strip().startswith("```"):
+            lines = lines[:-1]
 
+        return "\n".join(lines).strip()
+
+    return text
+
+# takes a screenshot path
+def build_actor_prompt(html_body, past_command="", user=DEFAULT_USER):
     prompt = f"You are the actor, a clever agent that is best at writing Selenium code to progress through job application websites. \
     Take a deep breath and think about this problem step by step. \
     YOUR TASK: Given the past command I wanted to do, write Selenium code to accomplish the task \
@@ -123,27 +306,35 @@ def execute_actions(html_body, past_command=""):
     When uploading a resume or cover letter, use the custom function  **upload_file(input_element, str)**) \
         - Where input_element is the actual <input> element, and **str is either \"resume\" or \"cover_letter\"**. \
     Attached below is a simplified subset of the HTML webpage, and it should contain enough context for you to reference objects in Selenium. \
+    Elements tagged with a short id such as @k3f2 can be fetched directly with **node(\"k3f2\")**, which returns the WebElement. \
+    To pick an option in a dropdown or combobox tagged with an id, call **choose(\"k3f2\", \"Canada\")**; it opens, searches and selects in one step. \
     {html_body}"
 
-    max_info = open("./test_info.json", "r", encoding="utf-8").read()
-
-    prompt += "This is the profile of the applicant. Be sure to be constantly refer back to the profile while filling the form. If there is any missing information, fill it with a generic educated guess." + profile
+    prompt += "This is the profile of the applicant. Be sure to be constantly refer back to the profile while filling the form. If there is any missing information, fill it with a generic educated guess." + get_profile_prompt(user)
 
     prompt += "At the very beginning of your output, start it with a single line of an English word or phrase, followed by a newline character, corresponding to \
     relevant answer being used to accomplish your task. For example, if the task was related to filling in the school, the phrase could be University of Waterloo. \
     The second line and onwards should be runnable Selenium code."
 
-    print(f"[ACTOR] Sending request to Moorcheh (Claude Opus)...")
-    print(f"[ACTOR] Prompt length: {len(prompt)} chars")
-    
-    response = moor_client.answer.generate(
-        namespace="autojob", 
-        query=prompt,
-        ai_model="anthropic.claude-opus-4-5-20251101-v1:0"
-    )
-    
-    answer = response["answer"]
-    print(f"[ACTOR] Response received - length: {len(answer)} chars")
-    print(f"[ACTOR] Response preview: {answer[:300]}..." if len(answer) > 300 else f"[ACTOR] Response: {answer}")
-    
-    return answer
\ No newline at end of file
+    return prompt
+
+def execute_actions(html_body, past_command="", user=DEFAULT_USER):
+    html_body = sanitize(html_body)
+    prompt = build_actor_prompt(html_body, past_command, user)
+
+    with tracing.span("actor_call", model="claude-opus-4-5", prompt_chars=len(prompt), html_bytes=len(html_body)) as sp:
+        response = get_moor_client().answer.generate(
+            namespace="autojob", 
+            query=prompt,
+            ai_model="anthropic.claude-opus-4-5-20251101-v1:0"
+        )
+
+        answer = response["answer"]
+        sp["response_chars"] = len(answer)
+        # Moorcheh doesn't report usage, so estimate at ~4 chars per token
+        sp["approx_input_tokens"] = len(prompt) // 4
+        tracing.metrics.incr("actor_approx_input_tokens_total", sp["approx_input_tokens"])
+
+    log.debug("actor response received", extra={"fields": {"preview": answer[:300]}})
+
+    return answer
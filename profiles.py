@@ -0,0 +1,237 @@
+from pydantic import BaseModel, ConfigDict
+from typing import List
+import threading
+import json
+import os
+import re
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# the original single-applicant profile written by input.py
+DEFAULT_USER = "default"
+DEFAULT_PATH = os.path.join(ROOT, "info.json")
+# everyone else gets profiles/<user>.json
+PROFILE_DIR = os.path.join(ROOT, "profiles")
+
+USER_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+# ---------------------------
+# Schema (mirrors the structure input.py writes)
+# ---------------------------
+
+class _Section(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+
+class LegalName(_Section):
+    first_name: str = ""
+    middle_name: str = ""
+    last_name: str = ""
+    prefix: str = ""
+
+
+class PreferredName(_Section):
+    first_name: str = ""
+    last_name: str = ""
+
+
+class PersonalInformation(_Section):
+    legal_name: LegalName = LegalName()
+    preferred_name: PreferredName = PreferredName()
+    date_of_birth: str = ""
+
+
+class Address(_Section):
+    street: str = ""
+    city: str = ""
+    province: str = ""
+    country: str = ""
+    postal_code: str = ""
+
+
+class Phone(_Section):
+    device_type: str = "Mobile"
+    country_code: str = "Canada (+1)"
+    phone_number: str = ""
+
+
+class ContactInformation(_Section):
+    address: Address = Address()
+    email: str = ""
+    phone: Phone = Phone()
+
+
+class ResidenceStatus(_Section):
+    citizenships: str = ""
+    visa_status: str = ""
+    sponsorship: str = ""
+
+
+class Diversity(_Section):
+    sex: str = ""
+    identity: str = ""
+    lgbtq: str = ""
+    disability: str = ""
+    race: str = ""
+
+
+class WorkExperience(_Section):
+    job_title: str = ""
+    company: str = ""
+    location: str = ""
+    start_date: str = ""
+    end_date: str = ""
+    description: str = ""
+
+
+class Proficiency(_Section):
+    comprehension: str = ""
+    reading: str = ""
+    speaking: str = ""
+    writing: str = ""
+
+
+class Language(_Section):
+    language: str = ""
+    is_fluent: str = ""
+    proficiency: Proficiency = Proficiency()
+
+
+class Education(_Section):
+    university: str = ""
+    faculty: str = ""
+    major: str = ""
+    degree_type: str = ""
+    start_date: str = ""
+    end_date: str = ""
+    gpa: str = ""
+    current_year: str = ""
+
+
+class Skills(_Section):
+    programming_languages: List[str] = []
+    web_technologies: List[str] = []
+    data_science: List[str] = []
+    frameworks_tools: List[str] = []
+    operating_systems: List[str] = []
+
+
+class Socials(_Section):
+    website: str = ""
+    linkedin: str = ""
+    github: str = ""
+
+
+class ApplicationPreferences(_Section):
+    how_did_you_hear_about_us: str = "LinkedIn"
+    has_worked_for_company_before: str = ""
+
+
+class Profile(_Section):
+    personal_information: PersonalInformation = PersonalInformation()
+    contact_information: ContactInformation = ContactInformation()
+    residence_status: ResidenceStatus = ResidenceStatus()
+    diversity: Diversity = Diversity()
+    work_experience: List[WorkExperience] = []
+    languages: List[Language] = []
+    education: List[Education] = []
+    skills: Skills = Skills()
+    socials: Socials = Socials()
+    application_preferences: ApplicationPreferences = ApplicationPreferences()
+
+
+# ---------------------------
+# Cache
+# ---------------------------
+
+def _drop_empty(obj):
+    if isinstance(obj, dict):
+        out = {k: _drop_empty(v) for k, v in obj.items()}
+        return {k: v for k, v in out.items() if v not in ("", [], {})}
+    if isinstance(obj, list):
+        out = [_drop_empty(v) for v in obj]
+        return [v for v in out if v not in ("", [], {})]
+    return obj
+
+
+def render_prompt(profile: Profile) -> str:
+    """Compact JSON for prompts: no indentation and no empty fields.
+
+    The prompts already tell the models to guess anything that's missing.
+    """
+    return json.dumps(_drop_empty(profile.model_dump()), separators=(",", ":"), ensure_ascii=False)
+
+
+class CachedProfile:
+    def __init__(self, profile: Profile, mtime_ns: int):
+        self.profile = profile
+        self.data = profile.model_dump()
+        self.prompt = render_prompt(profile)
+        self.mtime_ns = mtime_ns
+
+
+class ProfileStore:
+    """Parsed, validated applicant profiles keyed by user.
+
+    Each profile is parsed once and reused until its file's mtime changes or
+    it is replaced through save().
+    """
+
+    def __init__(self):
+        self.cache: dict[str, CachedProfile] = {}
+        self.lock = threading.Lock()
+
+    def path(self, user: str = DEFAULT_USER) -> str:
+        if user == DEFAULT_USER:
+            return DEFAULT_PATH
+        if not USER_RE.match(user):
+            raise ValueError(f"invalid user id: {user!r}")
+        return os.path.join(PROFILE_DIR, f"{user}.json")
+
+    def get(self, user: str = DEFAULT_USER) -> CachedProfile:
+        path = self.path(user)
+        mtime_ns = os.stat(path).st_mtime_ns
+
+        with self.lock:
+            cached = self.cache.get(user)
+            if cached is not None and cached.mtime_ns == mtime_ns:
+                return cached
+
+        with open(path, "r", encoding="utf-8") as f:
+            profile = Profile.model_validate_json(f.read())
+
+        cached = CachedProfile(profile, mtime_ns)
+        with self.lock:
+            self.cache[user] = cached
+        return cached
+
+    def save(self, user: str, profile: Profile) -> CachedProfile:
+        path = self.path(user)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(profile.model_dump_json(indent=2))
+        os.replace(tmp, path)
+
+        cached = CachedProfile(profile, os.stat(path).st_mtime_ns)
+        with self.lock:
+            self.cache[user] = cached
+        return cached
+
+    def users(self) -> list[str]:
+        users = [DEFAULT_USER] if os.path.exists(DEFAULT_PATH) else []
+        if os.path.isdir(PROFILE_DIR):
+            users += sorted(f[:-5] for f in os.listdir(PROFILE_DIR) if f.endswith(".json"))
+        return users
+
+
+store = ProfileStore()
+
+
+def get_profile(user: str = DEFAULT_USER) -> dict:
+    return store.get(user).data
+
+
+def get_profile_prompt(user: str = DEFAULT_USER) -> str:
+    return store.get(user).prompt
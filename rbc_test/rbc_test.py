@@ -13,6 +13,7 @@ from selenium.webdriver.common.action_chains import ActionChains
 # Add parent directory to path to import modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from extraction import safe_click
+from profiles import get_profile
 
 def upload_file(element, file_type):
     """Custom upload function from the main codebase"""
@@ -42,8 +43,7 @@ def fill_rbc_application(driver):
     """Fill the RBC job application with hardcoded data"""
     
     # Load test data
-    with open('info.json', 'r') as f:
-        data = json.load(f)
+    data = get_profile()
     
     wait = WebDriverWait(driver, 10)
     
@@ -0,0 +1,246 @@
+from collections import deque, Counter
+from urllib.parse import urlsplit, urlunsplit
+from datetime import datetime, timezone
+import threading
+import time
+import uuid
+import os
+
+import tracing
+
+log = tracing.get_logger("scheduler")
+
+# browsers (and so runs) allowed at once across every bulk job
+MAX_BROWSERS = int(os.getenv("AUTOJOB_MAX_BROWSERS", "3"))
+# runs allowed at once against the same registered domain
+PER_DOMAIN = int(os.getenv("AUTOJOB_PER_DOMAIN", "1"))
+
+# politeness limits per registered domain: page loads / form submits per minute
+NAV_PER_MINUTE = float(os.getenv("AUTOJOB_NAV_PER_MINUTE", "12"))
+SUBMIT_PER_MINUTE = float(os.getenv("AUTOJOB_SUBMIT_PER_MINUTE", "6"))
+BURST = float(os.getenv("AUTOJOB_RATE_BURST", "2"))
+# per-domain overrides of the navigation rate, e.g. "rbc.com=4,greenhouse.io=30"
+RATE_OVERRIDES = os.getenv("AUTOJOB_RATE_OVERRIDES", "")
+# page loads slower than this, or more than this share of errors, slow a domain down
+SLOW_LOAD_MS = float(os.getenv("AUTOJOB_SLOW_LOAD_MS", "8000"))
+ERROR_RATE = float(os.getenv("AUTOJOB_ERROR_RATE", "0.3"))
+MAX_BACKOFF = 16.0
+
+# second-level labels that belong to the public suffix, e.g. example.co.uk
+_SECOND_LEVEL = {"co", "com", "org", "net", "ac", "gov", "edu"}
+
+
+def registered_domain(url: str) -> str:
+    """Best-effort registrable domain: jobs.rbc.com -> rbc.com."""
+    host = (urlsplit(url).hostname or "").lower()
+    labels = host.split(".")
+    if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in _SECOND_LEVEL:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+def normalize_url(url: str) -> str:
+    """Drops fragments and trailing slashes so pasted duplicates compare equal."""
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ""))
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float, burst: float):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, burst)
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+
+    def _refill(self, slowdown: float):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate / slowdown)
+        self.last = now
+
+    def take(self, slowdown: float = 1.0) -> float:
+        """Takes a token if one is available, else returns seconds to wait."""
+        self._refill(slowdown)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) * slowdown / self.rate
+
+
+class DomainHealth:
+    """Moving averages of load time and error rate for one domain."""
+
+    def __init__(self):
+        self.load_ms = None
+        self.error_rate = 0.0
+        self.slowdown = 1.0
+
+    def observe(self, load_ms=None, error=False):
+        if load_ms is not None:
+            self.load_ms = load_ms if self.load_ms is None else 0.8 * self.load_ms + 0.2 * load_ms
+        self.error_rate = 0.8 * self.error_rate + 0.2 * (1.0 if error else 0.0)
+
+        # only a fresh load time says anything about load times; a success
+        # report without one shouldn't keep re-reading the last slow average
+        slow = load_ms is not None and self.load_ms > SLOW_LOAD_MS
+        if error or slow or self.error_rate > ERROR_RATE:
+            self.slowdown = min(MAX_BACKOFF, self.slowdown * 2)
+        else:
+            self.slowdown = max(1.0, self.slowdown * 0.8)
+
+
+class DomainLimiter:
+    """Token buckets per (registered domain, action) with adaptive backoff.
+
+    Every driver.get and form submission takes a token first. Slow page loads,
+    errors and CAPTCHAs double the domain's slowdown factor (up to 16x); healthy
+    observations let it decay back to 1.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets: dict[tuple, TokenBucket] = {}
+        self.health: dict[str, DomainHealth] = {}
+        self.overrides = {}
+        for item in filter(None, (x.strip() for x in RATE_OVERRIDES.split(","))):
+            domain, rate = item.split("=", 1)
+            self.overrides[domain.strip()] = float(rate)
+
+    def _limits(self, domain, kind):
+        if kind == "submit":
+            return SUBMIT_PER_MINUTE, BURST
+        return self.overrides.get(domain, NAV_PER_MINUTE), BURST
+
+    def acquire(self, url: str, kind: str = "navigate") -> float:
+        """Blocks until url's domain may be hit again; returns seconds waited."""
+        domain = registered_domain(url)
+        waited = 0.0
+        while True:
+            with self.lock:
+                bucket = self.buckets.get((domain, kind))
+                if bucket is None:
+                    bucket = self.buckets[(domain, kind)] = TokenBucket(*self._limits(domain, kind))
+                health = self.health.setdefault(domain, DomainHealth())
+                delay = bucket.take(health.slowdown)
+            if delay <= 0:
+                if waited:
+                    tracing.metrics.incr("rate_limit_wait_seconds_total", waited)
+                return waited
+            log.debug(f"rate limiting {domain} ({kind}) for {delay:.1f}s")
+            time.sleep(delay)
+            waited += delay
+
+    def report(self, url: str, load_ms=None, error=False):
+        domain = registered_domain(url)
+        with self.lock:
+            health = self.health.setdefault(domain, DomainHealth())
+            health.observe(load_ms, error)
+            if health.slowdown > 1:
+                log.info(f"backing off {domain}", extra={"fields": {"slowdown": health.slowdown}})
+
+    def status(self) -> dict:
+        with self.lock:
+            return {
+                domain: {"slowdown": h.slowdown, "load_ms": h.load_ms, "error_rate": round(h.error_rate, 3)}
+                for domain, h in self.health.items()
+            }
+
+
+limiter = DomainLimiter()
+
+
+class Task:
+    def __init__(self, job, url):
+        self.job = job
+        self.url = url
+        self.domain = registered_domain(url)
+        self.status = "queued"
+        self.run = None
+        self.application_id = None
+
+
+class BulkJob:
+    def __init__(self, user, urls, skipped, browser="throughput"):
+        self.id = uuid.uuid4().hex[:12]
+        self.user = user
+        self.browser = browser
+        self.created_at = datetime.now(timezone.utc).isoformat()
+        self.tasks = [Task(self, url) for url in urls]
+        self.skipped = skipped
+
+    def progress(self) -> dict:
+        counts = Counter(task.status for task in self.tasks)
+        finished = sum(counts[s] for s in ("done", "incomplete", "stalled", "failed"))
+        return {
+            "id": self.id,
+            "user": self.user,
+            "browser": self.browser,
+            "created_at": self.created_at,
+            "total": len(self.tasks),
+            "finished": finished,
+            "counts": dict(counts),
+            "skipped": self.skipped,
+            "tasks": [
+                {"url": t.url, "status": t.status, "run": t.run, "application_id": t.application_id}
+                for t in self.tasks
+            ],
+        }
+
+
+class Scheduler:
+    """Spreads queued runs over a fixed pool of browser slots.
+
+    A worker takes the oldest task whose domain is under its concurrency
+    limit, so one ATS with 40 postings can't starve the other sites.
+    """
+
+    def __init__(self, run_task, max_browsers=MAX_BROWSERS, per_domain=PER_DOMAIN):
+        self.run_task = run_task
+        self.max_browsers = max_browsers
+        self.per_domain = per_domain
+        self.pending = deque()
+        self.active = Counter()
+        self.cond = threading.Condition()
+        self.jobs: dict[str, BulkJob] = {}
+        self.workers = []
+
+    def _ensure_workers(self):
+        while len(self.workers) < self.max_browsers:
+            t = threading.Thread(target=self._worker, daemon=True)
+            t.start()
+            self.workers.append(t)
+
+    def submit(self, job: BulkJob) -> BulkJob:
+        with self.cond:
+            self.jobs[job.id] = job
+            self.pending.extend(job.tasks)
+            self._ensure_workers()
+            self.cond.notify_all()
+        return job
+
+    def _next(self) -> Task:
+        with self.cond:
+            while True:
+                for i, task in enumerate(self.pending):
+                    if self.active[task.domain] < self.per_domain:
+                        del self.pending[i]
+                        self.active[task.domain] += 1
+                        task.status = "running"
+                        return task
+                self.cond.wait()
+
+    def _worker(self):
+        while True:
+            task = self._next()
+            try:
+                task.status = self.run_task(task) or "done"
+            except Exception as e:
+                log.error(f"bulk task failed: {type(e).__name__}: {e}", exc_info=True)
+                task.status = "failed"
+            finally:
+                with self.cond:
+                    self.active[task.domain] -= 1
+                    self.cond.notify_all()
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
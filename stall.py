@@ -0,0 +1,98 @@
+from collections import deque
+import hashlib
+import os
+
+import tracing
+
+log = tracing.get_logger("stall")
+
+# hard cap on frames per run, however much progress is being made
+MAX_FRAMES = int(os.getenv("AUTOJOB_MAX_FRAMES", "100"))
+# frames without progress before escalating to the next step
+PATIENCE = int(os.getenv("AUTOJOB_STALL_PATIENCE", "3"))
+# the same want this many times in a row counts as no progress, even if the DOM moves
+REPEAT_LIMIT = int(os.getenv("AUTOJOB_STALL_REPEATS", "3"))
+
+# what to try, in order, each time PATIENCE more frames pass without progress
+LADDER = ("scroll", "reset", "nudge", "abort")
+
+# one round trip: how many fields hold a value, and what those values are
+FORM_STATE = """
+var filled = 0, values = [];
+var fields = document.querySelectorAll("input, textarea, select");
+for (var i = 0; i < fields.length; i++) {
+    var el = fields[i], type = (el.type || "").toLowerCase();
+    if (type === "hidden" || type === "submit" || type === "button") continue;
+    var value = (type === "checkbox" || type === "radio") ? (el.checked ? el.value || "on" : "") : el.value;
+    if (value) { filled++; values.push(value); }
+}
+return [filled, location.href, values.join("\\u0001")];
+"""
+
+
+def form_state(driver, html):
+    """(fingerprint, filled field count) for the page as it is right now.
+
+    page_source doesn't include what has been typed into fields, so the
+    live values are folded into the fingerprint alongside the markup.
+    """
+    try:
+        filled, href, values = driver.execute_script(FORM_STATE)
+    except Exception:
+        filled, href, values = 0, "", ""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (href, html, values):
+        digest.update(part.encode("utf-8", errors="ignore"))
+        digest.update(b"\0")
+    return digest.hexdigest(), filled
+
+
+class StallDetector:
+    """Decides, frame by frame, whether a run is still getting anywhere.
+
+    A frame counts as progress when the DOM fingerprint is new or more
+    fields are filled than ever before, unless the critic keeps asking for
+    the same thing. Stalled frames walk up LADDER one step every PATIENCE
+    frames; any progress drops back to the bottom.
+    """
+
+    def __init__(self, patience=PATIENCE, repeat_limit=REPEAT_LIMIT):
+        self.patience = patience
+        self.repeat_limit = repeat_limit
+        self.seen = set()
+        self.best_filled = 0
+        self.stalled = 0
+        self.level = 0
+        self.wants = deque(maxlen=repeat_limit)
+
+    def _repeating(self) -> bool:
+        return len(self.wants) == self.repeat_limit and len(set(self.wants)) == 1
+
+    def want(self, text: str):
+        """Records what the critic asked for this frame."""
+        self.wants.append(" ".join(text.lower().split()))
+
+    def observe(self, fingerprint: str, filled: int):
+        """Takes this frame's page state; returns a LADDER step or None to carry on."""
+        progressed = (fingerprint not in self.seen or filled > self.best_filled) and not self._repeating()
+        self.seen.add(fingerprint)
+        self.best_filled = max(self.best_filled, filled)
+
+        if progressed:
+            self.stalled = 0
+            self.level = 0
+            return None
+
+        self.stalled += 1
+        if self.stalled < self.patience:
+            return None
+
+        step = LADDER[min(self.level, len(LADDER) - 1)]
+        self.level += 1
+        self.stalled = 0
+        # a fresh look at the page after escalating
+        self.wants.clear()
+        tracing.metrics.incr(f"stall_{step}_total")
+        log.info(f"no progress for {self.patience} frames, escalating: {step}",
+                 extra={"fields": {"filled": filled, "escalations": self.level}})
+        return step
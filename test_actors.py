@@ -0,0 +1,76 @@
+"""
+Runs template-tier answers the way look.run_loop does, against a stub driver.
+
+Checks that the generated code calls the helpers in the exec namespace with
+the arguments they actually take, so a template click can't fail with a
+TypeError and quietly fall through to the remote model.
+
+Usage:
+    python test_actors.py
+    python -m pytest -q test_actors.py
+"""
+
+import inspect
+from functools import partial
+
+import actors
+import locate
+from browser import exec_namespace
+from extraction import safe_click
+from look import upload_file
+
+PAGE = """
+<form>
+  <label for="terms">I agree to the terms</label>
+  <input type="checkbox" id="terms" name="terms">
+  <button type="submit" id="go">Submit application</button>
+</form>
+"""
+
+
+class StubDriver:
+    pass
+
+
+def run_template(action, keyword):
+    ranked = locate.ElementIndex.from_html(PAGE).search(keyword)
+    nodes = locate.NodeMap()
+    answer = actors.template(action, keyword, PAGE, ranked, nodes, user=None)
+    assert answer is not None, f"template declined {action!r}"
+    assert actors.check_code(answer.code, nodes) is None
+
+    driver, calls = StubDriver(), []
+
+    def record(fn):
+        # binds like the real helper would, then records instead of touching a browser
+        def stub(*args, **kwargs):
+            inspect.signature(fn).bind(*args, **kwargs)
+            calls.append((fn.__name__, args))
+        return stub
+
+    namespace = exec_namespace(
+        driver,
+        upload_file=partial(record(upload_file), driver=driver),
+        safe_click=record(safe_click),
+        node=lambda nid: ("element", nodes[nid.lstrip("@")]),
+        choose=lambda nid, value: calls.append(("choose", (nid, value))),
+    )
+    exec(answer.code, namespace)
+    return calls
+
+
+def test_template_click():
+    calls = run_template("Click the Submit application button", "Submit application")
+    assert [name for name, _ in calls] == ["safe_click"]
+    assert calls[0][1][0].__class__ is StubDriver
+
+
+def test_template_checkbox():
+    calls = run_template("Check the I agree to the terms checkbox", "I agree to the terms")
+    assert [name for name, _ in calls] == ["safe_click"]
+
+
+if __name__ == "__main__":
+    test_template_click()
+    test_template_checkbox()
+    print("ok")
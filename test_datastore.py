@@ -0,0 +1,78 @@
+"""
+Batched writes, row-by-row recovery from a bad row, and keyset paging.
+
+Each test uses its own SQLite file in a temp directory.
+
+Usage:
+    python test_datastore.py
+    python -m pytest -q test_datastore.py
+"""
+
+import os
+import tempfile
+
+from datastore import Datastore
+
+
+def make_store(tmp):
+    store = Datastore(os.path.join(tmp, "autojob.db"))
+    return store, store.upsert_applicant("Ada Lovelace", "ada@example.com")
+
+
+def test_writes_persist_after_flush():
+    with tempfile.TemporaryDirectory() as tmp:
+        store, applicant = make_store(tmp)
+        ids = store.add_applications(applicant, [{"url": f"https://jobs.example.com/{i}"} for i in range(3)])
+        store.add_result(ids[0], "done", {"run": "00001"})
+        assert store.flush()
+
+        statuses = {a["url"]: a["status"] for a in store.list_applications(applicant)["items"]}
+        assert statuses == {
+            "https://jobs.example.com/0": "done",
+            "https://jobs.example.com/1": "queued",
+            "https://jobs.example.com/2": "queued",
+        }
+        assert [r["status"] for r in store.results_for(ids[0])] == ["done"]
+
+
+def test_bad_row_only_drops_itself():
+    with tempfile.TemporaryDirectory() as tmp:
+        store, applicant = make_store(tmp)
+        good = store.add_applications(applicant, [{"url": "https://a.example.com/1"}])
+        # breaks the foreign key, in the same batch as the good writes around it
+        store.add_result("no-such-application", "done")
+        more = store.add_applications(applicant, [{"url": "https://b.example.com/1"}])
+        store.add_result(good[0], "failed")
+        assert store.flush()
+
+        urls = {a["url"]: a["status"] for a in store.list_applications(applicant)["items"]}
+        assert urls == {"https://a.example.com/1": "failed", "https://b.example.com/1": "queued"}
+        assert store.results_for("no-such-application") == []
+        assert more[0] in {a["id"] for a in store.list_applications(applicant)["items"]}
+
+
+def test_keyset_paging():
+    with tempfile.TemporaryDirectory() as tmp:
+        store, applicant = make_store(tmp)
+        for i in range(7):
+            # separate batches give separate created_at values as well as ids
+            store.add_applications(applicant, [{"url": f"https://jobs.example.com/{i}"}])
+        store.flush()
+
+        seen, cursor = [], None
+        while True:
+            page = store.list_applications(applicant, cursor=cursor, limit=3)
+            seen += [a["id"] for a in page["items"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        everything = store.list_applications(applicant, limit=100)["items"]
+        assert seen == [a["id"] for a in everything]
+        assert len(set(seen)) == 7
+
+
+if __name__ == "__main__":
+    test_writes_persist_after_flush()
+    test_bad_row_only_drops_itself()
+    test_keyset_paging()
+    print("ok")
@@ -0,0 +1,84 @@
+"""
+Label -> profile field mapping and option matching for dropdown autofill.
+
+Usage:
+    python test_dropdowns.py
+    python -m pytest -q test_dropdowns.py
+"""
+
+import actors
+import dropdowns
+
+PROFILE = {
+    "personal_information": {
+        "legal_name": {"prefix": "Mr.", "first_name": "Ada", "middle_name": "", "last_name": "Lovelace"},
+        "preferred_name": {"first_name": "Ada"},
+        "date_of_birth": "1990-12-10",
+    },
+    "contact_information": {
+        "email": "ada@example.com",
+        "phone": {"device_type": "Mobile", "country_code": "Canada (+1)", "phone_number": "519-555-0101"},
+        "address": {"street": "1 King St", "city": "Waterloo", "province": "Ontario",
+                    "country": "Canada", "postal_code": "N2L 3G1"},
+    },
+    "residence_status": {"citizenships": "Canadian", "visa_status": "Citizen", "sponsorship": "No"},
+    "diversity": {"sex": "Female", "identity": "Woman", "lgbtq": "No", "disability": "No", "race": "White"},
+    "education": [{"degree_type": "Bachelor", "university": "University of Waterloo", "major": "Computer Science",
+                   "end_date": "2027-04", "current_year": "3", "gpa": "3.9"}],
+    "application_preferences": {"how_did_you_hear_about_us": "LinkedIn", "has_worked_for_company_before": "No"},
+    "socials": {"linkedin": "", "github": "", "website": ""},
+}
+
+# label -> the answer it should get (None: the profile doesn't answer it)
+LABELS = {
+    "Ethnicity": "White",
+    "Race/Ethnicity": "White",
+    "Are you legally authorized to work in the United States?": "Citizen",
+    "Will you now or in the future require visa sponsorship?": "No",
+    "Personal statement": None,
+    "Sexual orientation": "No",
+    "Gender identity": "Woman",
+    "Sex": "Female",
+    "Resource type": None,
+    "How did you hear about us?": "LinkedIn",
+    "State/Province": "Ontario",
+    "City": "Waterloo",
+    "Country": "Canada",
+    "Country code": "Canada (+1)",
+    "Expected graduation date": "2027-04",
+}
+
+
+def test_profile_value():
+    for label, expected in LABELS.items():
+        assert dropdowns.profile_value(PROFILE, label) == expected, label
+
+
+def test_text_value():
+    assert actors.text_value(PROFILE, "Ethnicity") == "White"
+    assert actors.text_value(PROFILE, "Town") == "Waterloo"
+    assert actors.text_value(PROFILE, "Email address") == "ada@example.com"
+    assert actors.text_value(PROFILE, "Doberman name") is None
+
+
+def test_best_option():
+    def pick(value, texts):
+        i = dropdowns.best_option(value, [(t, False) for t in texts])
+        return None if i is None else texts[i]
+
+    assert pick("Ontario", ["Select...", "Alberta", "ON", "Quebec"]) == "ON"
+    assert pick("Canada", ["Please select", "United States", "Canada", "Mexico"]) == "Canada"
+    assert pick("White", ["Asian", "Black", "Caucasian", "Hispanic or Latino"]) == "Caucasian"
+    assert pick("No", ["Yes", "No, I will not require sponsorship"]) == "No, I will not require sponsorship"
+    assert pick("2027-04", ["2025", "2026", "2027 or later"]) == "2027 or later"
+    # nothing close enough: leave it to the critic
+    assert pick("Waterloo", ["Toronto", "Ottawa"]) is None
+    # placeholders and disabled options are never picked
+    assert dropdowns.best_option("Canada", [("Select one", False), ("Canada", True)]) is None
+
+
+if __name__ == "__main__":
+    test_profile_value()
+    test_text_value()
+    test_best_option()
+    print("ok")
@@ -0,0 +1,77 @@
+"""
+History paging for /get_actor and /get_critic: default run, since/limit, ETags.
+
+Usage:
+    python test_history.py
+    python -m pytest -q test_history.py
+"""
+
+import history
+from history import RingLog, RingRegistry
+
+
+def test_ring_keeps_counting():
+    ring = RingLog(maxlen=3)
+    for i in range(5):
+        ring.append({"i": i})
+    assert [e["seq"] for e in ring.since()] == [3, 4, 5]
+    assert [e["seq"] for e in ring.since(4)] == [5]
+    assert ring.since(1, limit=2) == ring.since()[:2]
+    assert ring.last_seq == 5
+
+
+def test_page_since_and_limit():
+    registry = RingRegistry(maxlen=100, max_runs=5)
+    for i in range(7):
+        registry.get("00001").append({"line": i})
+
+    _, body = history.page(registry, "00001", since=0, limit=3)
+    first = body()
+    assert [e["seq"] for e in first["items"]] == [1, 2, 3]
+    assert first["next_since"] == 3 and first["last_seq"] == 7
+
+    _, body = history.page(registry, "00001", since=first["next_since"], limit=100)
+    assert [e["seq"] for e in body()["items"]] == [4, 5, 6, 7]
+
+    # caught up: no items, and the cursor stays put
+    _, body = history.page(registry, "00001", since=7)
+    assert body()["items"] == [] and body()["next_since"] == 7
+
+    # limit is clamped to 1..MAX_PAGE
+    _, body = history.page(registry, "00001", limit=0)
+    assert len(body()["items"]) == 1
+
+
+def test_etag():
+    registry = RingRegistry(maxlen=100, max_runs=5)
+    registry.get("00001").append({"line": "a"})
+    etag, _ = history.page(registry, "00001")
+    assert history.page(registry, "00001")[0] == etag
+    # a new entry, another cursor or another page size each change it
+    assert history.page(registry, "00001", since=1)[0] != etag
+    assert history.page(registry, "00001", limit=5)[0] != etag
+    registry.get("00001").append({"line": "b"})
+    assert history.page(registry, "00001")[0] != etag
+
+
+def test_default_run_is_the_one_started_last():
+    registry = RingRegistry(maxlen=100, max_runs=5)
+    history.run_started("00002")
+    registry.get("00002").append({"line": "new"})
+    # a line from an older run whose ring only gets created now
+    registry.get("00001").append({"line": "late"})
+    _, body = history.page(registry)
+    assert body()["run"] == "00002"
+
+    # a run with nothing logged yet gives an empty page, not another run's
+    history.run_started("00003")
+    _, body = history.page(registry)
+    assert body()["run"] == "00003" and body()["items"] == []
+
+
+if __name__ == "__main__":
+    test_ring_keeps_counting()
+    test_page_since_and_limit()
+    test_etag()
+    test_default_run_is_the_one_started_last()
+    print("ok")
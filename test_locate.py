@@ -0,0 +1,78 @@
+"""
+Element ranking (BM25 + trigrams), unique locators and stable @node ids.
+
+Usage:
+    python test_locate.py
+    python -m pytest -q test_locate.py
+"""
+
+import locate
+
+PAGE = """
+<form>
+  <label for="country">Country</label>
+  <select id="country"><option>Canada</option></select>
+  <label for="county">County of residence</label>
+  <input id="county" type="text">
+  <label for="fname">First name</label>
+  <input id="fname" type="text">
+  <label for="pname">Preferred first name</label>
+  <input id="pname" type="text">
+  <div><button type="button">Next</button></div>
+  <div><button type="button">Next</button></div>
+</form>
+"""
+
+
+def index():
+    return locate.ElementIndex.from_html(PAGE)
+
+
+def test_exact_label_beats_fuzzy():
+    results = index().search("Country")
+    assert results[0][1].locator == "#country"
+    # "County" shares trigrams with "Country" but mustn't outrank it
+    scores = {el.locator: score for score, el in results}
+    assert scores["#country"] > scores.get("#county", 0)
+
+
+def test_fewer_extra_words_ranks_higher():
+    results = index().search("First name")
+    assert [el.locator for _, el in results[:2]] == ["#fname", "#pname"]
+
+
+def test_no_match():
+    assert index().search("Upload your transcript") == []
+
+
+def test_locators_are_unique():
+    locators = [el.locator for el in index().elements]
+    assert len(locators) == len(set(locators))
+    # the two identical buttons still get told apart
+    assert sum("button" in loc for loc in locators) == 2
+
+
+def test_node_ids_are_stable():
+    a, b = locate.NodeMap(), locate.NodeMap()
+    ids = [a.add(el.locator) for el in index().elements]
+    # same locator, same id, in another frame or another order
+    assert [b.add(el.locator) for el in reversed(index().elements)] == list(reversed(ids))
+    assert len(set(ids)) == len(ids)
+    assert all(a[nid] == el.locator for nid, el in zip(ids, index().elements))
+
+
+def test_render_lists_best_first():
+    results = index().search("Country")
+    text, nodes = locate.render(results, "Country")
+    first = text.split("\n")[1]
+    assert first.startswith("<select @") and nodes[first.split("@")[1].split()[0]] == "#country"
+
+
+if __name__ == "__main__":
+    test_exact_label_beats_fuzzy()
+    test_fewer_extra_words_ranks_higher()
+    test_no_match()
+    test_locators_are_unique()
+    test_node_ids_are_stable()
+    test_render_lists_best_first()
+    print("ok")
@@ -0,0 +1,107 @@
+"""
+Per-domain politeness: token refill, backoff on bad signals and recovery.
+
+Runs on a fake clock, so nothing actually sleeps.
+
+Usage:
+    python test_scheduler.py
+    python -m pytest -q test_scheduler.py
+"""
+
+import contextlib
+
+import scheduler
+from scheduler import DomainHealth, DomainLimiter, TokenBucket, registered_domain
+
+
+@contextlib.contextmanager
+def fake_clock():
+    clock = {"now": 1000.0, "slept": []}
+
+    def sleep(seconds):
+        clock["slept"].append(seconds)
+        clock["now"] += seconds
+
+    real = scheduler.time.monotonic, scheduler.time.sleep
+    scheduler.time.monotonic, scheduler.time.sleep = (lambda: clock["now"]), sleep
+    try:
+        yield clock
+    finally:
+        scheduler.time.monotonic, scheduler.time.sleep = real
+
+
+def test_bucket_refill():
+    with fake_clock() as clock:
+        bucket = TokenBucket(per_minute=6, burst=2)
+        # the burst is free, then one token every 10 s
+        assert bucket.take() == 0 and bucket.take() == 0
+        assert abs(bucket.take() - 10) < 1e-9
+        clock["now"] += 5
+        assert abs(bucket.take() - 5) < 1e-9
+        clock["now"] += 5
+        assert bucket.take() == 0
+        # a slowed-down domain refills that much slower
+        clock["now"] += 10
+        assert abs(bucket.take(slowdown=4) - 30) < 1e-9
+        # and never beyond its burst
+        clock["now"] += 3600
+        assert bucket.take() == 0 and bucket.take() == 0 and bucket.take() > 0
+
+
+def test_backoff_and_recovery():
+    health = DomainHealth()
+    health.observe(error=True)
+    health.observe(error=True)
+    assert health.slowdown == 4
+    for _ in range(30):
+        health.observe()
+    assert health.slowdown == 1
+
+
+def test_backoff_is_capped():
+    health = DomainHealth()
+    for _ in range(10):
+        health.observe(error=True)
+    assert health.slowdown == scheduler.MAX_BACKOFF
+
+
+def test_slow_load_recovers():
+    # one slow load backs off once; later success reports without a load time decay it
+    health = DomainHealth()
+    health.observe(load_ms=scheduler.SLOW_LOAD_MS + 1000)
+    assert health.slowdown == 2
+    for _ in range(5):
+        health.observe()
+    assert health.slowdown == 1
+
+
+def test_limiter_waits_and_backs_off():
+    with fake_clock() as clock:
+        limiter = DomainLimiter()
+        url = "https://jobs.example.com/posting/1"
+        for _ in range(int(scheduler.BURST)):
+            assert limiter.acquire(url) == 0
+        waited = limiter.acquire(url)
+        assert abs(waited - 60 / scheduler.NAV_PER_MINUTE) < 1e-6
+        assert clock["slept"]
+
+        limiter.report("https://careers.example.com/", error=True)
+        assert limiter.status()["example.com"]["slowdown"] == 2
+        # another domain is untouched
+        assert limiter.acquire("https://other.org/") == 0
+        assert "other.org" not in limiter.status() or limiter.status()["other.org"]["slowdown"] == 1
+
+
+def test_registered_domain():
+    assert registered_domain("https://jobs.rbc.com/ca/en/job/1") == "rbc.com"
+    assert registered_domain("https://careers.example.co.uk/x") == "example.co.uk"
+
+
+if __name__ == "__main__":
+    test_bucket_refill()
+    test_backoff_and_recovery()
+    test_backoff_is_capped()
+    test_slow_load_recovers()
+    test_limiter_waits_and_backs_off()
+    test_registered_domain()
+    print("ok")
@@ -0,0 +1,56 @@
+"""
+The stall ladder: escalation order, and dropping back down on progress.
+
+Usage:
+    python test_stall.py
+    python -m pytest -q test_stall.py
+"""
+
+from stall import LADDER, StallDetector
+
+
+def stalled_frames(detector, n, fingerprint="same", filled=0):
+    return [detector.observe(fingerprint, filled) for _ in range(n)]
+
+
+def test_escalation_order():
+    detector = StallDetector(patience=2, repeat_limit=3)
+    assert detector.observe("same", 0) is None  # a new page is progress
+    steps = stalled_frames(detector, 2 * len(LADDER))
+    assert [s for s in steps if s] == list(LADDER)
+    # one step every patience frames
+    assert steps == [None, "scroll", None, "reset", None, "nudge", None, "abort"]
+
+
+def test_progress_resets_the_ladder():
+    detector = StallDetector(patience=2, repeat_limit=3)
+    detector.observe("a", 0)
+    assert stalled_frames(detector, 4, "a") == [None, "scroll", None, "reset"]
+
+    # a field got filled: back to the bottom
+    assert detector.observe("a", 1) is None
+    assert stalled_frames(detector, 2, "a", 1) == [None, "scroll"]
+
+    # so does a page it hasn't seen before
+    assert detector.observe("b", 1) is None
+    assert stalled_frames(detector, 2, "b", 1) == [None, "scroll"]
+
+
+def test_repeated_wants_are_not_progress():
+    detector = StallDetector(patience=2, repeat_limit=2)
+    detector.observe("a", 0)
+    # the DOM keeps changing, but the critic keeps asking for the same click
+    steps = []
+    for i in range(4):
+        detector.want("Click  the Next button")
+        steps.append(detector.observe(f"page-{i}", 0))
+    # repeating from the second frame on; escalating clears the wants, so
+    # the next new page counts again
+    assert steps == [None, None, "scroll", None]
+
+
+if __name__ == "__main__":
+    test_escalation_order()
+    test_progress_resets_the_ladder()
+    test_repeated_wants_are_not_progress()
+    print("ok")
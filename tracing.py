@@ -0,0 +1,179 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+import threading
+import asyncio
+import logging
+import time
+import json
+import sys
+import os
+
+# DEBUG brings back the old per-frame chatter, WARNING keeps only problems
+LOG_LEVEL = os.getenv("AUTOJOB_LOG_LEVEL", "INFO").upper()
+# "json" for one structured record per line, "text" for a human readable log
+LOG_FORMAT = os.getenv("AUTOJOB_LOG_FORMAT", "json")
+# level of the one-record-per-span timings; DEBUG hides them at the default
+# log level, WARNING hides them for good
+SPAN_LEVEL = os.getenv("AUTOJOB_SPAN_LEVEL", "INFO").upper()
+
+# histogram buckets, in milliseconds
+BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+# fields (run, frame, ...) attached to every span and log line in this thread
+_bound = ContextVar("autojob_bound", default={})
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        out = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        out.update(_bound.get())
+        out.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, default=str)
+
+
+def _configure():
+    root = logging.getLogger("autojob")
+    if root.handlers:
+        return root
+    handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("[%(levelname)s] %(name)s: %(message)s"))
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+    root.propagate = False
+    return root
+
+
+def get_logger(name: str) -> logging.Logger:
+    _configure()
+    return logging.getLogger(f"autojob.{name}")
+
+
+def set_level(level: str):
+    _configure().setLevel(level.upper())
+
+
+@contextmanager
+def bind(**fields):
+    """Attach fields like run=... or frame=... to everything logged inside."""
+    token = _bound.set({**_bound.get(), **fields})
+    try:
+        yield
+    finally:
+        _bound.reset(token)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.n = 0
+
+    def observe(self, ms: float):
+        for i, bound in enumerate(BUCKETS):
+            if ms <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += ms
+        self.n += 1
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms: dict[str, Histogram] = {}
+        self.counters: dict[str, float] = {}
+
+    def observe(self, name: str, ms: float):
+        with self.lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram()
+            hist.observe(ms)
+
+    def incr(self, name: str, amount: float = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def summary(self) -> dict:
+        """Count, mean and total per span, plus counters. Used by bench scripts."""
+        with self.lock:
+            spans = {
+                name: {"count": h.n, "mean_ms": h.total / h.n if h.n else 0.0, "total_ms": h.total}
+                for name, h in self.histograms.items()
+            }
+            return {"spans": spans, "counters": dict(self.counters)}
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        lines = [
+            "# HELP autojob_span_ms Duration of startApp stages in milliseconds",
+            "# TYPE autojob_span_ms histogram",
+        ]
+        with self.lock:
+            for name, hist in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS, hist.counts):
+                    cumulative += count
+                    lines.append(f'autojob_span_ms_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'autojob_span_ms_bucket{{span="{name}",le="+Inf"}} {hist.n}')
+                lines.append(f'autojob_span_ms_sum{{span="{name}"}} {hist.total:.3f}')
+                lines.append(f'autojob_span_ms_count{{span="{name}"}} {hist.n}')
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE autojob_{name} counter")
+                lines.append(f"autojob_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Registry()
+_span_log = get_logger("span")
+_span_level = logging.getLevelName(SPAN_LEVEL) if isinstance(logging.getLevelName(SPAN_LEVEL), int) else logging.INFO
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Times the block, records it in the histogram and logs one record.
+
+    The yielded dict can be filled in by the block (token counts, byte sizes)
+    and ends up on the log record.
+    """
+    start = time.perf_counter()
+    failed = cancelled = False
+    try:
+        yield attrs
+    except asyncio.CancelledError:
+        # a task cancelled on purpose (an ensemble straggler, say) didn't fail
+        cancelled = True
+        raise
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        ms = (time.perf_counter() - start) * 1000
+        if cancelled:
+            # how long it ran before being cut off isn't how long the call takes
+            metrics.incr(f"{name}_cancelled_total")
+        else:
+            metrics.observe(name, ms)
+        if failed:
+            metrics.incr(f"{name}_errors_total")
+        fields = {"span": name, "ms": round(ms, 2), "error": failed, **attrs}
+        if cancelled:
+            fields["cancelled"] = True
+        _span_log.log(_span_level, name, extra={"fields": fields})